@@ -1,12 +1,13 @@
 from django.contrib import admin
-from .models import ConversionTask
+from .models import ConversionTask, UploadSession
 
 @admin.register(ConversionTask)
 class ConversionTaskAdmin(admin.ModelAdmin):
     list_display = ['id', 'ppt_filename', 'status', 'created_at', 'updated_at']
     list_filter = ['status', 'created_at']
     search_fields = ['id', 'ppt_file']
-    readonly_fields = ['id', 'created_at', 'updated_at']
+    readonly_fields = ['id', 'created_at', 'updated_at', 'output_manifest']
+    raw_id_fields = ['coalesced_with']
     ordering = ['-created_at']
     
     fieldsets = (
@@ -14,10 +15,33 @@ class ConversionTaskAdmin(admin.ModelAdmin):
             'fields': ('id', 'status', 'created_at', 'updated_at')
         }),
         ('文件信息', {
-            'fields': ('ppt_file', 'sketch_file')
+            'fields': ('ppt_file', 'sketch_file', 'sketch_hash', 'preview_file')
+        }),
+        ('输出清单', {
+            'fields': ('output_manifest',),
+            'classes': ('collapse',)
+        }),
+        ('预检信息', {
+            'fields': ('content_hash', 'slide_count', 'media_bytes', 'estimated_cost')
+        }),
+        ('队列信息', {
+            'fields': (
+                'priority', 'client_id', 'client_addr', 'coalesced_with',
+                'attempts', 'lease_owner', 'lease_expires_at', 'heartbeat_at',
+            ),
+            'classes': ('collapse',)
         }),
         ('错误信息', {
             'fields': ('error_message',),
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'filename', 'total_size', 'received_bytes', 'status', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['id', 'filename']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+    ordering = ['-created_at']
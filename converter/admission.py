@@ -0,0 +1,147 @@
+"""
+上传准入控制
+在接收上传之前检查队列深度、排队任务的预估成本、剩余磁盘空间和客户端并发数，
+超过上限时直接拒绝并给出 Retry-After，过载表现为明确的信号，而不是换页和超时：
+- 503：服务整体过载（队列过深、排队成本过高、磁盘不足）
+- 429：单个客户端进行中的任务过多
+队列状态取自数据库，多进程、多节点部署时同样有效
+"""
+
+import os
+import math
+import shutil
+import threading
+import time
+import logging
+from django.conf import settings
+from django.db.models import Count, Sum, Value
+from django.db.models.functions import Coalesce
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from .models import ConversionTask
+from .scheduler import get_scheduler_settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADMISSION = {
+    'MAX_QUEUED_TASKS': 500,          # 等待中的任务数上限
+    'MAX_QUEUED_COST': 600.0,         # 等待中任务的预估成本之和上限（约等于单核秒数）
+    'MIN_FREE_DISK_MB': 1024,         # 媒体目录所在磁盘接收上传后至少保留的空间
+    'MAX_ACTIVE_PER_CLIENT': 10,      # 单个客户端等待中和处理中的任务数上限
+    'MIN_RETRY_AFTER_SECONDS': 5,
+    'MAX_RETRY_AFTER_SECONDS': 300,
+    'SNAPSHOT_SECONDS': 1.0,          # 队列统计的缓存时间，突发流量下不必每个请求都聚合查询
+}
+
+QUEUE_DEPTH = 'queue_depth'
+QUEUED_COST = 'queued_cost'
+DISK_SPACE = 'disk_space'
+CLIENT_LIMIT = 'client_limit'
+
+
+def get_admission_settings():
+    """合并默认配置与 settings.CONVERTER_ADMISSION，值为 None 的检查被关闭"""
+    config = DEFAULT_ADMISSION.copy()
+    config.update(getattr(settings, 'CONVERTER_ADMISSION', {}))
+    return config
+
+
+class ServiceOverloaded(APIException):
+    """服务过载，DRF 根据 wait 写入 Retry-After"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = '服务繁忙，请稍后重试'
+    default_code = 'service_overloaded'
+
+    def __init__(self, detail=None, wait=None):
+        super().__init__(detail)
+        self.wait = wait
+
+
+class ClientLimitExceeded(Throttled):
+    """客户端进行中的任务过多（429）"""
+    default_detail = '进行中的任务过多，请等待已有任务完成后重试。'
+    extra_detail_singular = extra_detail_plural = '预计 {wait} 秒后可重试。'
+    default_code = 'client_limit_exceeded'
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def queue_snapshot(max_age=0.0):
+    """
+    等待中任务的数量与预估成本之和
+
+    Args:
+        max_age: 允许复用的缓存时间（秒）
+    """
+    global _snapshot
+    now = time.monotonic()
+    with _snapshot_lock:
+        if _snapshot and now - _snapshot[0] <= max_age:
+            return _snapshot[1]
+    default_cost = get_scheduler_settings()['DEFAULT_COST']
+    # 跟随任务不会单独转换，不计入队列
+    result = ConversionTask.objects.filter(status='pending', coalesced_with__isnull=True).aggregate(
+        tasks=Count('id'), cost=Coalesce(Sum(Coalesce('estimated_cost', Value(default_cost))), Value(0.0)),
+    )
+    with _snapshot_lock:
+        _snapshot = (now, result)
+    return result
+
+
+def _retry_after(cost, config):
+    """按排队成本除以工作线程数估算等待时间"""
+    workers = max(1, get_scheduler_settings()['WORKERS'])
+    seconds = math.ceil(cost / workers) if cost else 0
+    return min(max(seconds, config['MIN_RETRY_AFTER_SECONDS']), config['MAX_RETRY_AFTER_SECONDS'])
+
+
+def _reject(exc, reason, message):
+    metrics.ADMISSION_REJECTED.inc(reason=reason)
+    logger.warning(f"拒绝上传 ({reason}): {message}")
+    raise exc
+
+
+def check_admission(client_addr='', incoming_bytes=0):
+    """
+    检查是否接受新的上传，不接受时抛出 ServiceOverloaded（503）或 ClientLimitExceeded（429）
+
+    Args:
+        client_addr: 客户端来源地址；不使用 X-Client-Id，换一个请求头取值不能绕过上限
+        incoming_bytes: 即将写入磁盘的字节数
+    """
+    config = get_admission_settings()
+    snapshot = queue_snapshot(config['SNAPSHOT_SECONDS'] or 0.0)
+
+    max_tasks = config['MAX_QUEUED_TASKS']
+    if max_tasks is not None and snapshot['tasks'] >= max_tasks:
+        message = f"等待中的任务 {snapshot['tasks']} 个，达到上限 {max_tasks}"
+        _reject(ServiceOverloaded(wait=_retry_after(snapshot['cost'], config)), QUEUE_DEPTH, message)
+
+    max_cost = config['MAX_QUEUED_COST']
+    if max_cost is not None and snapshot['cost'] >= max_cost:
+        message = f"等待中任务的预估成本 {snapshot['cost']:.1f}，达到上限 {max_cost}"
+        _reject(ServiceOverloaded(wait=_retry_after(snapshot['cost'] - max_cost, config)), QUEUED_COST, message)
+
+    min_free_mb = config['MIN_FREE_DISK_MB']
+    if min_free_mb is not None:
+        media_root = str(settings.MEDIA_ROOT)
+        free = shutil.disk_usage(media_root if os.path.isdir(media_root) else str(settings.BASE_DIR)).free
+        if free - incoming_bytes < min_free_mb * 1024 * 1024:
+            message = f"剩余磁盘空间 {free // (1024 * 1024)}MB，上传 {incoming_bytes} 字节后低于 {min_free_mb}MB"
+            _reject(
+                ServiceOverloaded('存储空间不足，请稍后重试', wait=config['MAX_RETRY_AFTER_SECONDS']),
+                DISK_SPACE, message,
+            )
+
+    max_active = config['MAX_ACTIVE_PER_CLIENT']
+    if max_active is not None and client_addr:
+        active = ConversionTask.objects.filter(client_addr=client_addr, status__in=('pending', 'processing'))
+        if active.count() >= max_active:
+            cost = active.aggregate(
+                cost=Coalesce(Sum(Coalesce('estimated_cost', Value(get_scheduler_settings()['DEFAULT_COST']))), Value(0.0))
+            )['cost']
+            message = f"客户端 {client_addr} 进行中的任务达到上限 {max_active}"
+            _reject(ClientLimitExceeded(wait=_retry_after(cost, config)), CLIENT_LIMIT, message)
@@ -0,0 +1,260 @@
+"""
+离线批量转换
+不经过 HTTP 和数据库，多进程调用 PPTToSketchConverter 转换目录树或文件列表，
+跳过输出未过期的文件，并输出逐文件与汇总的吞吐量报告
+
+可独立运行，不需要 Django 配置：
+    python -m converter.batch decks/ -o sketches/ -j 8
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import multiprocessing
+
+# 旧版 python-pptx 在 3.10+ 上依赖 collections.abc 已被导入
+import collections.abc  # noqa: F401
+
+PPTX_SUFFIX = '.pptx'
+SKETCH_SUFFIX = '.sketch'
+# 输出目录中记录源文件哈希的清单，用于 --check hash
+MANIFEST_NAME = '.ppt_to_sketch_manifest.json'
+# 每个子进程转换多少个文件后重启，防止长时间运行的内存累积
+MAX_TASKS_PER_CHILD = 50
+# 每完成多少个文件写一次清单，中途中断时已完成的结果不会丢失
+MANIFEST_FLUSH_EVERY = 100
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BUFFER_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def discover_inputs(paths, output_dir=None):
+    """
+    展开输入路径为 (源文件, 输出文件) 列表
+
+    目录递归查找 .pptx，输出保持相对目录结构；未指定输出目录时输出到源文件旁边
+    """
+    jobs = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if not name.lower().endswith(PPTX_SUFFIX) or name.startswith('~$'):
+                        continue
+                    source = os.path.join(root, name)
+                    relative = os.path.relpath(source, path)
+                    base = os.path.join(output_dir, relative) if output_dir else source
+                    jobs.append((source, os.path.splitext(base)[0] + SKETCH_SUFFIX))
+        elif os.path.isfile(path):
+            base = os.path.join(output_dir, os.path.basename(path)) if output_dir else path
+            jobs.append((path, os.path.splitext(base)[0] + SKETCH_SUFFIX))
+        else:
+            raise FileNotFoundError(f"输入路径不存在: {path}")
+    return jobs
+
+
+def load_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def save_manifest(path, manifest):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def is_up_to_date(source, output, check='mtime', manifest=None):
+    """
+    判断输出是否仍然有效
+
+    Args:
+        check: mtime - 输出比源文件新即跳过；hash - 源文件内容哈希与上次转换时一致即跳过
+    """
+    if not os.path.exists(output):
+        return False
+    if check == 'hash':
+        entry = (manifest or {}).get(source)
+        if not entry:
+            return False
+        stat = os.stat(source)
+        # 大小和修改时间都没变时无需重新计算哈希
+        if entry.get('size') == stat.st_size and entry.get('mtime_ns') == stat.st_mtime_ns:
+            return True
+        if entry.get('sha256') != file_sha256(source):
+            return False
+        # 内容未变，只是被 touch 过：刷新记录，下次不必再计算哈希
+        entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        return True
+    return os.path.getmtime(output) >= os.path.getmtime(source)
+
+
+def convert_file(job):
+    """
+    在子进程中转换单个文件
+
+    Returns:
+        dict: source, output, status, seconds, slides, input_bytes, output_bytes, error
+    """
+    source, output, record_hash, fast_path = job
+    from .preflight import inspect_presentation
+    from .utils import PPTToSketchConverter
+
+    started_at = time.perf_counter()
+    result = {
+        'source': source, 'output': output, 'status': 'failed',
+        'seconds': 0.0, 'slides': 0, 'input_bytes': 0, 'output_bytes': 0, 'error': None,
+    }
+    temp_dir = None
+    try:
+        result['input_bytes'] = os.path.getsize(source)
+        result['slides'] = inspect_presentation(source)['slide_count']
+        output_dir = os.path.dirname(output) or '.'
+        os.makedirs(output_dir, exist_ok=True)
+        # 先写到同目录的临时位置再原子替换，中断时不会留下半个输出文件
+        temp_dir = tempfile.mkdtemp(prefix='.convert-', dir=output_dir)
+        converter = PPTToSketchConverter(
+            verbose=False, deterministic_ids=True, fast_path=fast_path, optimize_layers=True,
+        )
+        converted_path = converter.convert_ppt_to_sketch(source, temp_dir)
+        os.replace(converted_path, output)
+        result['output_bytes'] = os.path.getsize(output)
+        if record_hash:
+            stat = os.stat(source)
+            result['manifest'] = {
+                'sha256': file_sha256(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+            }
+        result['status'] = 'converted'
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if temp_dir:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        result['seconds'] = round(time.perf_counter() - started_at, 3)
+    return result
+
+
+def _format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f}{unit}" if unit != 'B' else f"{size}B"
+        size /= 1024
+
+
+def run_batch(paths, output_dir=None, processes=None, check='mtime', force=False, write=print, fast_path=True):
+    """
+    批量转换
+
+    Args:
+        paths: 文件或目录列表
+        output_dir: 输出根目录，缺省输出到源文件旁边
+        processes: 进程数，缺省为 CPU 核数
+        check: 跳过策略，mtime 或 hash
+        force: 忽略跳过策略全部重新转换
+        write: 报告输出函数
+        fast_path: 使用 OOXML 快速路径解析，False 时使用 python-pptx 参考路径
+
+    Returns:
+        dict: 汇总报告
+    """
+    started_at = time.perf_counter()
+    jobs = discover_inputs(paths, output_dir)
+    manifest_path = os.path.join(output_dir or os.getcwd(), MANIFEST_NAME)
+    manifest = load_manifest(manifest_path) if check == 'hash' else {}
+
+    pending = []
+    skipped = 0
+    for source, output in jobs:
+        if not force and is_up_to_date(source, output, check, manifest):
+            skipped += 1
+            write(f"[skip] {source}")
+        else:
+            pending.append((source, output, check == 'hash', fast_path))
+
+    report = {
+        'files': len(jobs), 'converted': 0, 'skipped': skipped, 'failed': 0,
+        'slides': 0, 'input_bytes': 0, 'output_bytes': 0, 'worker_seconds': 0.0,
+    }
+    processes = max(1, processes or os.cpu_count() or 1)
+    if pending:
+        with multiprocessing.Pool(min(processes, len(pending)), maxtasksperchild=MAX_TASKS_PER_CHILD) as pool:
+            for done, result in enumerate(pool.imap_unordered(convert_file, pending), start=1):
+                report['worker_seconds'] += result['seconds']
+                if result['status'] == 'converted':
+                    report['converted'] += 1
+                    report['slides'] += result['slides']
+                    report['input_bytes'] += result['input_bytes']
+                    report['output_bytes'] += result['output_bytes']
+                    if 'manifest' in result:
+                        manifest[result['source']] = result['manifest']
+                    write(
+                        f"[ok] {result['source']} -> {result['output']} "
+                        f"{result['slides']} 页 {_format_bytes(result['input_bytes'])} -> "
+                        f"{_format_bytes(result['output_bytes'])} {result['seconds']:.2f}s"
+                    )
+                else:
+                    report['failed'] += 1
+                    write(f"[fail] {result['source']} {result['error']} {result['seconds']:.2f}s")
+                if check == 'hash' and done % MANIFEST_FLUSH_EVERY == 0:
+                    save_manifest(manifest_path, manifest)
+
+    if check == 'hash' and jobs:
+        save_manifest(manifest_path, manifest)
+
+    elapsed = time.perf_counter() - started_at
+    report['seconds'] = round(elapsed, 3)
+    report['worker_seconds'] = round(report['worker_seconds'], 3)
+    report['processes'] = processes
+    write(
+        f"共 {report['files']} 个文件: 转换 {report['converted']}, 跳过 {report['skipped']}, 失败 {report['failed']}; "
+        f"{report['slides']} 页, {_format_bytes(report['input_bytes'])} -> {_format_bytes(report['output_bytes'])}; "
+        f"耗时 {elapsed:.2f}s ({processes} 进程), "
+        f"{report['converted'] / elapsed:.2f} 文件/s, {report['slides'] / elapsed:.1f} 页/s, "
+        f"{report['input_bytes'] / 1024 / 1024 / elapsed:.2f} MB/s"
+    )
+    return report
+
+
+def add_arguments(parser):
+    """命令行参数，独立入口与 manage.py convert_ppt 共用"""
+    parser.add_argument('paths', nargs='+', help='.pptx 文件或包含 .pptx 的目录')
+    parser.add_argument('-o', '--output-dir', default=None, help='输出根目录，缺省输出到源文件旁边')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='并行进程数，缺省为 CPU 核数')
+    parser.add_argument('--check', choices=('mtime', 'hash'), default='mtime',
+                        help='跳过策略: mtime 比较修改时间，hash 比较源文件内容哈希')
+    parser.add_argument('--force', action='store_true', help='忽略跳过策略，全部重新转换')
+    parser.add_argument('--reference-parser', action='store_true',
+                        help='使用 python-pptx 参考路径解析，不走 OOXML 快速路径')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='批量将 .pptx 转换为 .sketch')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    report = run_batch(
+        args.paths, output_dir=args.output_dir, processes=args.processes,
+        check=args.check, force=args.force, fast_path=not args.reference_parser,
+    )
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
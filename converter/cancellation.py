@@ -0,0 +1,154 @@
+"""
+转换任务取消与超时
+转换器在幻灯片和形状之间调用 CancelToken.check()，
+取消请求、墙钟超时和 CPU 超时都会在下一个检查点中止转换
+"""
+
+import time
+import threading
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_LIMITS = {
+    'WALL_TIMEOUT_SECONDS': 600,     # 单个任务最长运行时间
+    'CPU_TIMEOUT_SECONDS': 300,      # 单个任务最多占用的 CPU 时间
+    'HARD_KILL_GRACE_SECONDS': 30,   # 超时后仍未停止时，再等待多久由运行时强制回收
+    'CANCEL_POLL_SECONDS': 0.5,      # 检查数据库取消标记的最小间隔
+}
+
+CANCELLED_MESSAGE = '任务已取消'
+LEASE_LOST_MESSAGE = '租约已失效，任务已由其他节点接管'
+
+
+def get_job_limits():
+    """合并默认配置与 settings.CONVERTER_JOB_LIMITS"""
+    config = DEFAULT_JOB_LIMITS.copy()
+    config.update(getattr(settings, 'CONVERTER_JOB_LIMITS', {}))
+    return config
+
+
+class ConversionCancelled(Exception):
+    """转换被取消或超时"""
+
+    def __init__(self, reason=CANCELLED_MESSAGE):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConversionTimeout(ConversionCancelled):
+    """转换超过墙钟或 CPU 时间限制"""
+
+
+class CancelToken:
+    """
+    协作式取消令牌
+
+    取消来源：同进程内的 cancel() 调用、数据库中的 cancel_requested 标记（跨进程）、
+    以及墙钟 / CPU 时间限制。设置 lease_owner 时，轮询数据库还会检查租约是否仍由该工作进程持有，
+    租约被接管的任务按已回收处理（abandoned），不再写回任务状态
+    """
+
+    def __init__(self, task_id=None, wall_timeout=None, cpu_timeout=None, poll_interval=0.5, lease_owner=None):
+        self.task_id = task_id
+        self.lease_owner = lease_owner
+        self.wall_timeout = wall_timeout
+        self.cpu_timeout = cpu_timeout
+        self.poll_interval = poll_interval
+        self.reason = None
+        self.abandoned = False
+        self._cancelled = threading.Event()
+        self._started_at = None
+        self._cpu_started_at = None
+        self._next_poll_at = 0.0
+
+    @classmethod
+    def for_task(cls, task_id, lease_owner=None):
+        """按配置的时间限制为任务创建令牌"""
+        limits = get_job_limits()
+        return cls(
+            task_id=task_id,
+            wall_timeout=limits['WALL_TIMEOUT_SECONDS'],
+            cpu_timeout=limits['CPU_TIMEOUT_SECONDS'],
+            poll_interval=limits['CANCEL_POLL_SECONDS'],
+            lease_owner=lease_owner,
+        )
+
+    def start(self):
+        """在执行转换的线程中调用，记录起始时间"""
+        self._started_at = time.monotonic()
+        self._cpu_started_at = time.thread_time()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self, reason=CANCELLED_MESSAGE):
+        if not self._cancelled.is_set():
+            self.reason = reason
+            self._cancelled.set()
+
+    def _poll_database(self):
+        """读取数据库取消标记，任务被删除也视为取消；租约已不属于本工作进程时按已回收处理"""
+        from .models import ConversionTask
+
+        row = ConversionTask.objects.filter(pk=self.task_id).values_list(
+            'cancel_requested', 'status', 'lease_owner'
+        ).first()
+        if row is None:
+            self.cancel('任务已删除')
+            return
+        flag, status, owner = row
+        if self.lease_owner and (owner != self.lease_owner or status != 'processing'):
+            self.abandoned = True
+            self.cancel(LEASE_LOST_MESSAGE)
+        elif flag:
+            self.cancel()
+
+    def check(self):
+        """检查点：需要中止时抛出 ConversionCancelled"""
+        if self._started_at is not None:
+            if self.wall_timeout and time.monotonic() - self._started_at > self.wall_timeout:
+                raise ConversionTimeout(f"转换超时: 运行超过 {self.wall_timeout} 秒")
+            if self.cpu_timeout and time.thread_time() - self._cpu_started_at > self.cpu_timeout:
+                raise ConversionTimeout(f"转换超时: CPU 时间超过 {self.cpu_timeout} 秒")
+
+        if not self._cancelled.is_set() and self.task_id is not None:
+            now = time.monotonic()
+            if now >= self._next_poll_at:
+                self._next_poll_at = now + self.poll_interval
+                self._poll_database()
+
+        if self._cancelled.is_set():
+            raise ConversionCancelled(self.reason or CANCELLED_MESSAGE)
+
+
+# 本进程内正在执行的任务令牌
+_active_tokens = {}
+_active_tokens_lock = threading.Lock()
+
+
+def register_token(task_id, token):
+    with _active_tokens_lock:
+        _active_tokens[str(task_id)] = token
+
+
+def unregister_token(task_id, token=None):
+    with _active_tokens_lock:
+        if token is None or _active_tokens.get(str(task_id)) is token:
+            _active_tokens.pop(str(task_id), None)
+
+
+def get_active_token(task_id):
+    with _active_tokens_lock:
+        return _active_tokens.get(str(task_id))
+
+
+def cancel_running(task_id, reason=CANCELLED_MESSAGE):
+    """立即通知本进程内正在执行的任务停止，返回是否找到该任务"""
+    token = get_active_token(task_id)
+    if token:
+        token.cancel(reason)
+        return True
+    return False
@@ -0,0 +1,179 @@
+"""
+相同上传的合并转换（single-flight）
+内容哈希与某个等待中或处理中的任务相同的上传不再单独转换，而是作为跟随任务挂到该任务（主任务）上：
+- 跟随任务不进入调度器或数据库队列，状态随主任务变化
+- 主任务完成后，跟随任务共享同一份输出文件和预览图，一起变为完成
+- 主任务转换失败时跟随任务以相同错误结束（输入相同，重试结果也相同）
+- 主任务被取消或删除时，最早的跟随任务升级为主任务重新转换，其余跟随任务改挂到它上面
+跟随任务单独取消只影响自己。输出文件由多个任务共享，删除时由 retention 检查引用
+"""
+
+import logging
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ConversionTask
+from .cancellation import CANCELLED_MESSAGE
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ('pending', 'processing')
+
+
+def coalescing_enabled():
+    return getattr(settings, 'CONVERTER_COALESCE_UPLOADS', True)
+
+
+def find_leader(task):
+    """
+    查找可以合并到的主任务：内容哈希相同、尚未结束、未请求取消、本身不是跟随任务，
+    并且比当前任务更早创建。两个上传同时创建时后者合并到前者，不会互相等待
+    """
+    if not task.content_hash:
+        return None
+    earlier = Q(created_at__lt=task.created_at) | Q(created_at=task.created_at, pk__lt=task.pk)
+    return (
+        ConversionTask.objects.filter(
+            earlier,
+            content_hash=task.content_hash,
+            status__in=ACTIVE_STATUSES,
+            cancel_requested=False,
+            coalesced_with__isnull=True,
+        )
+        .exclude(pk=task.pk)
+        .order_by('created_at', 'pk')
+        .first()
+    )
+
+
+def submit_conversion(task):
+    """将转换任务交给调度器；使用数据库队列时任务保持 pending，由工作进程领取"""
+    from .task_queue import uses_database_queue
+    from .scheduler import get_scheduler
+
+    if uses_database_queue():
+        logger.info(f"任务已入队（数据库队列）: {task.id}")
+        return
+    get_scheduler().submit(
+        task.id,
+        cost=task.estimated_cost,
+        priority=task.priority,
+        client_id=task.client_id,
+    )
+
+
+def start_conversion(task):
+    """
+    启动转换：有相同内容的任务正在转换时挂到该任务上，否则交给调度器
+
+    Returns:
+        ConversionTask 或 None: 合并到的主任务
+    """
+    leader = find_leader(task) if coalescing_enabled() else None
+    if leader is None:
+        submit_conversion(task)
+        return None
+
+    task.coalesced_with = leader
+    task.status = leader.status
+    ConversionTask.objects.filter(pk=task.pk).update(
+        coalesced_with=leader, status=leader.status, updated_at=timezone.now()
+    )
+    metrics.COALESCED_UPLOADS.inc()
+    logger.info(f"任务 {task.id} 与正在转换的任务 {leader.id} 内容相同，合并转换")
+    # 主任务可能在查找之后、挂靠之前结束，此时由这里补做同步
+    settle_followers(leader.pk)
+    task.refresh_from_db()
+    return leader
+
+
+def _active_followers(leader_id):
+    return ConversionTask.objects.filter(coalesced_with_id=leader_id, status__in=ACTIVE_STATUSES)
+
+
+def promote_follower(leader_id):
+    """主任务被取消或删除：最早的未取消跟随任务升级为主任务，返回新的主任务"""
+    with transaction.atomic():
+        candidate = (
+            _active_followers(leader_id).filter(cancel_requested=False)
+            .order_by('created_at', 'pk').first()
+        )
+        if candidate is None:
+            return None
+        now = timezone.now()
+        ConversionTask.objects.filter(pk=candidate.pk).update(
+            coalesced_with=None, status='pending', updated_at=now
+        )
+        _active_followers(leader_id).exclude(pk=candidate.pk).update(
+            coalesced_with=candidate.pk, status='pending', updated_at=now
+        )
+        candidate.coalesced_with = None
+        candidate.status = 'pending'
+    logger.info(f"主任务 {leader_id} 已取消，任务 {candidate.id} 接替转换")
+    transaction.on_commit(lambda: submit_conversion(candidate))
+    return candidate
+
+
+def settle_followers(leader_id):
+    """
+    按主任务的当前状态更新跟随任务，可重复调用
+
+    Returns:
+        int: 更新的跟随任务数
+    """
+    leader = (
+        ConversionTask.objects.filter(pk=leader_id)
+        .only(
+            'id', 'status', 'error_message', 'cancel_requested',
+            'sketch_file', 'preview_file', 'sketch_hash', 'output_manifest',
+        )
+        .first()
+    )
+    if leader is None:
+        return 0
+    followers = _active_followers(leader_id)
+    now = timezone.now()
+    if leader.status == 'processing':
+        return followers.filter(status='pending').update(status='processing', updated_at=now)
+    if leader.status == 'completed':
+        updated = followers.update(
+            status='completed',
+            sketch_file=leader.sketch_file.name,
+            preview_file=leader.preview_file.name if leader.preview_file else None,
+            sketch_hash=leader.sketch_hash,
+            output_manifest=leader.output_manifest,
+            error_message=None,
+            updated_at=now,
+        )
+        if updated:
+            logger.info(f"任务 {leader_id} 完成，{updated} 个合并的任务共享转换结果")
+        return updated
+    if leader.status == 'failed':
+        if leader.cancel_requested or leader.error_message == CANCELLED_MESSAGE:
+            return 1 if promote_follower(leader_id) else 0
+        return followers.update(status='failed', error_message=leader.error_message, updated_at=now)
+    return 0
+
+
+def settle_stale_followers():
+    """
+    同步主任务已结束、但跟随任务仍在等待的情况（主任务由其他进程的看门狗或过期租约回收时不会通知跟随任务）
+
+    Returns:
+        int: 更新的跟随任务数
+    """
+    leader_ids = set(
+        ConversionTask.objects.filter(status__in=ACTIVE_STATUSES, coalesced_with__isnull=False)
+        .exclude(coalesced_with__status__in=ACTIVE_STATUSES)
+        .values_list('coalesced_with_id', flat=True)
+    )
+    return sum(settle_followers(leader_id) for leader_id in leader_ids)
+
+
+def cancel_follower(task):
+    """单独取消跟随任务，不影响主任务的转换"""
+    ConversionTask.objects.filter(pk=task.pk, status__in=ACTIVE_STATUSES).update(
+        cancel_requested=True, status='failed', error_message=CANCELLED_MESSAGE, updated_at=timezone.now()
+    )
@@ -12,17 +12,22 @@ from pathlib import Path
 from pptx import Presentation
 from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
+from pptx.enum.dml import MSO_FILL
 from pptx.enum.shapes import MSO_SHAPE_TYPE
+from .shape_handlers import SHAPE_REGISTRY, GROUP, PICTURE, TEXT, SHAPE, LABELLED
+from .presets import preset_path
+from .layer_optimizer import LayerTreeOptimizer
 from PIL import Image
 import io
 import logging
+from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
 class EnhancedPPTToSketchConverter:
     """增强的 PPT 转 Sketch 转换器"""
     
-    def __init__(self, artboard_width=1080, artboard_height=1920, verbose=False):
+    def __init__(self, artboard_width=1080, artboard_height=1920, verbose=False, optimize_layers=None):
         """
         初始化增强转换器
         
@@ -30,12 +35,25 @@ class EnhancedPPTToSketchConverter:
             artboard_width: 默认画板宽度（适合移动设备）
             artboard_height: 默认画板高度
             verbose: 详细日志
+            optimize_layers: 序列化前优化图层树，None 时按 settings.CONVERTER_OPTIMIZE_LAYERS
         """
         self.artboard_width = artboard_width
         self.artboard_height = artboard_height
         self.verbose = verbose
         self.image_dict = {}
         self.layer_counter = 0
+        # 与 PPTToSketchConverter 共用形状分派表
+        self.shape_handlers = {
+            GROUP: self.create_enhanced_group_layer,
+            PICTURE: self.create_enhanced_image_layer,
+            TEXT: self.create_enhanced_text_layer,
+            SHAPE: self.create_enhanced_shape_layer,
+            LABELLED: self.create_enhanced_labelled_layer,
+        }
+        self.handler_stats = {}
+        if optimize_layers is None:
+            optimize_layers = getattr(settings, 'CONVERTER_OPTIMIZE_LAYERS', True)
+        self.optimizer = LayerTreeOptimizer() if optimize_layers else None
         
     def log(self, message, level='info'):
         """日志记录"""
@@ -113,28 +131,30 @@ class EnhancedPPTToSketchConverter:
             self.log(f"图片优化失败: {str(e)}", 'warning')
             return image_blob
     
+    def shape_frame(self, shape):
+        """提取位置、尺寸和旋转角度，尺寸太小时放大到合适的画板尺寸"""
+        x = shape.left / 914400 if hasattr(shape, 'left') else 0
+        y = shape.top / 914400 if hasattr(shape, 'top') else 0
+        width = shape.width / 914400 if hasattr(shape, 'width') else 100
+        height = shape.height / 914400 if hasattr(shape, 'height') else 100
+        
+        if width < 10:  # 太小的尺寸
+            scale_factor = max(self.artboard_width / width / 10, self.artboard_height / height / 10)
+            x *= scale_factor
+            y *= scale_factor
+            width *= scale_factor
+            height *= scale_factor
+        
+        rotation = 0
+        if hasattr(shape, 'rotation'):
+            rotation = -shape.rotation
+        return x, y, width, height, rotation
+    
     def create_enhanced_image_layer(self, shape, layer_name):
         """创建增强的图片图层"""
         try:
             self.layer_counter += 1
-            
-            # 提取位置和尺寸
-            x = shape.left / 914400 if hasattr(shape, 'left') else 0
-            y = shape.top / 914400 if hasattr(shape, 'top') else 0
-            width = shape.width / 914400 if hasattr(shape, 'width') else 100
-            height = shape.height / 914400 if hasattr(shape, 'height') else 100
-            
-            # 缩放到合适的画板尺寸
-            if width < 10:  # 太小的尺寸
-                scale_factor = max(self.artboard_width / width / 10, self.artboard_height / height / 10)
-                x *= scale_factor
-                y *= scale_factor
-                width *= scale_factor
-                height *= scale_factor
-            
-            rotation = 0
-            if hasattr(shape, 'rotation'):
-                rotation = -shape.rotation
+            x, y, width, height, rotation = self.shape_frame(shape)
             
             # 处理图片数据
             image_id = str(uuid.uuid4())
@@ -194,28 +214,184 @@ class EnhancedPPTToSketchConverter:
             self.log(f"创建图片图层失败: {str(e)}", 'error')
             return None
     
-    def create_enhanced_group_layer(self, shape, layer_name):
-        """创建增强的组图层"""
+    def create_enhanced_text_layer(self, shape, layer_name):
+        """创建增强的文本图层"""
         try:
             self.layer_counter += 1
+            x, y, width, height, rotation = self.shape_frame(shape)
+            
+            text_content = shape.text_frame.text if hasattr(shape, 'text_frame') else ""
+            font_name = "Arial"
+            font_size = 12
+            text_color = self.extract_color((0, 0, 0))
+            alignment = 0
+            align_map = {PP_ALIGN.LEFT: 0, PP_ALIGN.CENTER: 2, PP_ALIGN.RIGHT: 1, PP_ALIGN.JUSTIFY: 3}
+            if hasattr(shape, 'text_frame'):
+                # 取第一个设置了字号的文本段作为图层样式
+                for paragraph in shape.text_frame.paragraphs:
+                    alignment = align_map.get(paragraph.alignment, alignment)
+                    run = next((run for run in paragraph.runs if run.font.size), None)
+                    if run is None:
+                        continue
+                    font_size = run.font.size.pt
+                    font_name = run.font.name or font_name
+                    try:
+                        text_color = self.extract_color(run.font.color.rgb)
+                    except AttributeError:
+                        pass  # 主题色或未设置颜色时使用默认黑色
+                    break
             
-            # 提取位置和尺寸
-            x = shape.left / 914400 if hasattr(shape, 'left') else 0
-            y = shape.top / 914400 if hasattr(shape, 'top') else 0
-            width = shape.width / 914400 if hasattr(shape, 'width') else 100
-            height = shape.height / 914400 if hasattr(shape, 'height') else 100
+            layer = {
+                "_class": "text",
+                "do_objectID": str(uuid.uuid4()),
+                "name": layer_name,
+                "frame": {
+                    "_class": "rect",
+                    "constrainProportions": False,
+                    "height": height,
+                    "width": width,
+                    "x": x,
+                    "y": y
+                },
+                "rotation": rotation,
+                "isVisible": True,
+                "isLocked": False,
+                "attributedString": {
+                    "_class": "attributedString",
+                    "string": text_content,
+                    "attributes": [{
+                        "_class": "stringAttribute",
+                        "location": 0,
+                        "length": len(text_content),
+                        "attributes": {
+                            "MSAttributedStringFontAttribute": {
+                                "_class": "fontDescriptor",
+                                "attributes": {"name": font_name, "size": font_size}
+                            },
+                            "MSAttributedStringColorAttribute": text_color,
+                            "paragraphStyle": {"_class": "paragraphStyle", "alignment": alignment}
+                        }
+                    }]
+                },
+                "style": {
+                    "_class": "style",
+                    "endDecorationType": 0,
+                    "miterLimit": 10,
+                    "startDecorationType": 0,
+                    "windingRule": 1
+                }
+            }
             
-            # 缩放处理
-            if width < 10:
-                scale_factor = max(self.artboard_width / width / 10, self.artboard_height / height / 10)
-                x *= scale_factor
-                y *= scale_factor
-                width *= scale_factor
-                height *= scale_factor
+            self.log(f"创建增强文本图层: {layer_name}")
+            return layer
             
-            rotation = 0
-            if hasattr(shape, 'rotation'):
-                rotation = -shape.rotation
+        except Exception as e:
+            self.log(f"创建文本图层失败: {str(e)}", 'error')
+            return None
+    
+    def create_enhanced_shape_layer(self, shape, layer_name):
+        """创建增强的形状图层，预设几何与 PPTToSketchConverter 共用路径缓存"""
+        try:
+            self.layer_counter += 1
+            x, y, width, height, rotation = self.shape_frame(shape)
+            
+            # 与 PPTToSketchConverter.create_shape_layer 相同：继承或主题填充用默认灰色，
+            # 只有显式无填充或未设置填充的文本框不填充
+            fill_color = self.extract_color((128, 128, 128))
+            fill_type = shape.fill.type if hasattr(shape, 'fill') else None
+            if fill_type == MSO_FILL.SOLID:
+                fill_color = self.extract_color(shape.fill.fore_color)
+            elif fill_type == MSO_FILL.BACKGROUND or (fill_type is None and shape.shape_type == MSO_SHAPE_TYPE.TEXT_BOX):
+                fill_color = None
+            fills = []
+            if fill_color:
+                fills.append({
+                    "_class": "fill",
+                    "isEnabled": True,
+                    "color": fill_color,
+                    "fillType": 0
+                })
+            
+            path_points = preset_path(shape, width, height)
+            layer_class = "shapePath"
+            if path_points is None:
+                layer_class = "rectangle"
+                path_points = [
+                    {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": f"{{{px}, {py}}}", "curveTo": f"{{{px}, {py}}}",
+                     "hasCurveFrom": False, "hasCurveTo": False, "point": f"{{{px}, {py}}}"}
+                    for px, py in ((0, 0), (1, 0), (1, 1), (0, 1))
+                ]
+            
+            layer = {
+                "_class": layer_class,
+                "do_objectID": str(uuid.uuid4()),
+                "name": layer_name,
+                "frame": {
+                    "_class": "rect",
+                    "constrainProportions": False,
+                    "height": height,
+                    "width": width,
+                    "x": x,
+                    "y": y
+                },
+                "rotation": rotation,
+                "isVisible": True,
+                "isLocked": False,
+                "path": {"_class": "path", "isClosed": True, "pointRadiusBehaviour": 1, "points": list(path_points)},
+                "style": {
+                    "_class": "style",
+                    "endMarkerType": 0,
+                    "miterLimit": 10,
+                    "startMarkerType": 0,
+                    "windingRule": 1,
+                    "fills": fills
+                }
+            }
+            
+            self.log(f"创建增强形状图层: {layer_name}")
+            return layer
+            
+        except Exception as e:
+            self.log(f"创建形状图层失败: {str(e)}", 'error')
+            return None
+    
+    def create_enhanced_labelled_layer(self, shape, layer_name):
+        """创建带文字的自选图形：形状图层与文本图层放在同框的组中"""
+        shape_layer = self.create_enhanced_shape_layer(shape, f"{layer_name}_shape")
+        text_layer = self.create_enhanced_text_layer(shape, f"{layer_name}_text")
+        if shape_layer is None or text_layer is None:
+            return shape_layer or text_layer
+        
+        frame, rotation = dict(shape_layer["frame"]), shape_layer["rotation"]
+        for child in (shape_layer, text_layer):
+            child["frame"].update(x=0, y=0)
+            child["rotation"] = 0
+        return {
+            "_class": "group",
+            "do_objectID": str(uuid.uuid4()),
+            "name": layer_name,
+            "frame": frame,
+            "rotation": rotation,
+            "isVisible": True,
+            "isLocked": False,
+            "hasClippingMask": False,
+            "clippingMaskMode": 0,
+            "userInfo": None,
+            "layers": [shape_layer, text_layer],
+            "style": {
+                "_class": "style",
+                "endDecorationType": 0,
+                "miterLimit": 10,
+                "startDecorationType": 0,
+                "windingRule": 1
+            }
+        }
+    
+    def create_enhanced_group_layer(self, shape, layer_name):
+        """创建增强的组图层"""
+        try:
+            self.layer_counter += 1
+            x, y, width, height, rotation = self.shape_frame(shape)
             
             # 处理组内子形状
             sub_layers = []
@@ -229,34 +405,10 @@ class EnhancedPPTToSketchConverter:
                             sub_layer['frame']['y'] -= y
                         sub_layers.append(sub_layer)
             
-            # 如果组为空，创建一个占位矩形
+            # 空组不生成图层，不再插入占位矩形
             if not sub_layers:
-                placeholder = {
-                    "_class": "rectangle",
-                    "do_objectID": str(uuid.uuid4()),
-                    "name": "Placeholder",
-                    "frame": {
-                        "_class": "rect",
-                        "constrainProportions": False,
-                        "height": height,
-                        "width": width,
-                        "x": 0,
-                        "y": 0
-                    },
-                    "rotation": 0,
-                    "isVisible": True,
-                    "isLocked": False,
-                    "style": {
-                        "_class": "style",
-                        "fills": [{
-                            "_class": "fill",
-                            "isEnabled": True,
-                            "color": self.extract_color((200, 200, 200)),
-                            "fillType": 0
-                        }]
-                    }
-                }
-                sub_layers.append(placeholder)
+                self.log(f"跳过空组: {layer_name}")
+                return None
             
             # 创建组图层
             layer = {
@@ -297,16 +449,10 @@ class EnhancedPPTToSketchConverter:
     def process_shape_enhanced(self, shape, layer_name):
         """增强的形状处理"""
         try:
-            shape_type = shape.shape_type
-            
-            if shape_type == MSO_SHAPE_TYPE.PICTURE:
-                return self.create_enhanced_image_layer(shape, layer_name)
-            elif shape_type == MSO_SHAPE_TYPE.GROUP:
-                return self.create_enhanced_group_layer(shape, layer_name)
-            else:
-                # 其他类型暂时跳过
-                self.log(f"跳过不支持的形状类型: {shape_type}", 'warning')
-                return None
+            kind, layer = SHAPE_REGISTRY.dispatch(shape, layer_name, self.shape_handlers, self.handler_stats)
+            if kind and kind not in self.shape_handlers:
+                self.log(f"跳过不支持的形状类别: {layer_name} ({kind})", 'warning')
+            return layer
                 
         except Exception as e:
             self.log(f"处理形状失败: {str(e)}", 'error')
@@ -344,6 +490,8 @@ class EnhancedPPTToSketchConverter:
             
             if not artboards:
                 raise Exception("没有成功转换任何幻灯片")
+            if self.optimizer:
+                self._finish_optimization(artboards)
             
             # 创建Sketch数据结构
             sketch_data = self.create_enhanced_sketch_document(artboards)
@@ -440,14 +588,22 @@ class EnhancedPPTToSketchConverter:
                     "windingRule": 1
                 }
             }
+            # 白色背景矩形与画板背景色重复，由优化器并入背景
+            if self.optimizer:
+                self.optimizer.optimize_artboard(artboard)
             
-            self.log(f"转换幻灯片 {slide_index + 1}: {len(layers)} 个图层")
+            self.log(f"转换幻灯片 {slide_index + 1}: {len(artboard['layers'])} 个图层")
             return artboard
             
         except Exception as e:
             self.log(f"转换幻灯片失败: {str(e)}", 'error')
             return None
     
+    def _finish_optimization(self, artboards):
+        """不再保存只被已删除图层引用的图片（base64 字符串）"""
+        self.optimizer.prune_images(artboards, self.image_dict, size=lambda image: len(image) * 3 // 4)
+        self.log(self.optimizer.summary())
+    
     def create_enhanced_sketch_document(self, artboards):
         """创建增强的Sketch文档"""
         
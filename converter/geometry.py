@@ -0,0 +1,173 @@
+"""
+幻灯片几何计算
+每张幻灯片（或母版 / 版式）转换前，把所有形状（含各级组内子形状）的变换收集到 NumPy 数组，
+按层级批量计算：
+- 相对父组的图层框：组的子形状坐标位于子坐标空间，按 (a:off - a:chOff) * a:ext / a:chExt 映射，嵌套组逐级累乘缩放
+- 幻灯片坐标系下的仿射变换，由此得到绝对包围盒与绝对旋转角（组的旋转和翻转作用于全部子形状）
+图层构建函数只读取计算结果
+"""
+
+import numpy as np
+from .ooxml_reader import ShapeRecord
+
+EMU_PER_PT = 12700.0
+
+
+def _geometry_key(shape):
+    """python-pptx 每次遍历都会新建形状代理对象，以底层 XML 元素作为键；快速路径记录本身即为键"""
+    return shape if isinstance(shape, ShapeRecord) else shape._element
+
+
+def _flips_and_child_space(shape):
+    """返回 (flipH, flipV, chOff, chExt)，子坐标空间只有组才有"""
+    if isinstance(shape, ShapeRecord):
+        return shape.flip_h, shape.flip_v, shape.child_offset, shape.child_extent
+    xfrm = getattr(shape._element, 'xfrm', None)
+    if xfrm is None:
+        return False, False, None, None
+    child_offset = child_extent = None
+    ch_off = getattr(xfrm, 'chOff', None)
+    ch_ext = getattr(xfrm, 'chExt', None)
+    if ch_off is not None:
+        child_offset = (ch_off.x, ch_off.y)
+    if ch_ext is not None:
+        child_extent = (ch_ext.cx, ch_ext.cy)
+    return xfrm.get('flipH') in ('1', 'true'), xfrm.get('flipV') in ('1', 'true'), child_offset, child_extent
+
+
+def _length(value):
+    return int(value) if value else 0
+
+
+class SlideGeometry:
+    """
+    一组顶层形状及其全部子形状的几何结果
+
+    frame(shape) 返回相对父组的 (x, y, width, height) 与旋转角，单位为点；
+    bounds(shape) 返回幻灯片坐标系下的包围盒 (x0, y0, x1, y1)
+    """
+
+    def __init__(self, shapes):
+        self._index = {}
+        offsets, extents, child_offsets, child_extents = [], [], [], []
+        rotations, flips, parents, depths = [], [], [], []
+
+        # 深度优先收集，父节点总在子节点之前
+        pending = [(shape, -1, 0) for shape in reversed(list(shapes))]
+        while pending:
+            shape, parent, depth = pending.pop()
+            key = _geometry_key(shape)
+            if key in self._index:
+                continue
+            index = len(parents)
+            self._index[key] = index
+            try:
+                flip_h, flip_v, child_offset, child_extent = _flips_and_child_space(shape)
+                offset = (_length(shape.left), _length(shape.top))
+                extent = (_length(shape.width), _length(shape.height))
+                rotation = getattr(shape, 'rotation', 0.0) or 0.0
+                children = list(shape.shapes) if hasattr(shape, 'shapes') else []
+            except Exception:
+                # 读取失败的形状按零尺寸处理，构建图层时会被跳过
+                flip_h = flip_v = False
+                child_offset = child_extent = None
+                offset = extent = (0, 0)
+                rotation = 0.0
+                children = []
+            offsets.append(offset)
+            extents.append(extent)
+            child_offsets.append(child_offset or (0, 0))
+            # 未声明子坐标空间时子坐标与组坐标一致
+            child_extents.append(child_extent if child_extent and all(child_extent) else extent)
+            rotations.append(rotation)
+            flips.append((flip_h, flip_v))
+            parents.append(parent)
+            depths.append(depth)
+            pending.extend((child, index, depth + 1) for child in reversed(children))
+
+        self.count = len(parents)
+        if not self.count:
+            return
+        self._compute(
+            np.array(offsets, dtype=float), np.array(extents, dtype=float),
+            np.array(child_offsets, dtype=float), np.array(child_extents, dtype=float),
+            np.array(rotations, dtype=float), np.array(flips, dtype=bool),
+            np.array(parents, dtype=int), np.array(depths, dtype=int),
+        )
+
+    def _compute(self, offsets, extents, child_offsets, child_extents, rotations, flips, parents, depths):
+        count = self.count
+        # 子形状所在坐标空间到点的缩放：父组的外部缩放乘以父组自身的 ext / chExt
+        outer_scale = np.ones((count, 2))
+        inner_scale = np.ones((count, 2))
+        parent_child_offset = np.zeros((count, 2))
+        transforms = np.tile(np.eye(3), (count, 1, 1))
+        positions = np.zeros((count, 2))
+        sizes = np.zeros((count, 2))
+
+        local_scale = np.divide(extents, child_extents, out=np.ones_like(extents), where=child_extents != 0)
+        radians = np.radians(rotations)
+        cos, sin = np.cos(radians), np.sin(radians)
+
+        for depth in range(depths.max() + 1):
+            level = np.flatnonzero(depths == depth)
+            parent = parents[level]
+            if depth:
+                outer_scale[level] = inner_scale[parent]
+                parent_child_offset[level] = child_offsets[parent]
+            inner_scale[level] = outer_scale[level] * local_scale[level]
+
+            position = (offsets[level] - parent_child_offset[level]) * outer_scale[level] / EMU_PER_PT
+            size = extents[level] * outer_scale[level] / EMU_PER_PT
+            half = size / 2
+            sign = np.where(flips[level], -1.0, 1.0)
+
+            # 局部变换：平移到框中心，旋转，翻转，再移回左上角
+            local = np.zeros((len(level), 3, 3))
+            local[:, 0, 0] = cos[level] * sign[:, 0]
+            local[:, 0, 1] = -sin[level] * sign[:, 1]
+            local[:, 1, 0] = sin[level] * sign[:, 0]
+            local[:, 1, 1] = cos[level] * sign[:, 1]
+            local[:, 2, 2] = 1
+            center = position + half
+            local[:, :2, 2] = center - np.einsum('nij,nj->ni', local[:, :2, :2], half)
+
+            transforms[level] = transforms[parent] @ local if depth else local
+            positions[level] = position
+            sizes[level] = size
+
+        # 四个角点变换到幻灯片坐标系，取包围盒
+        corners = np.zeros((count, 4, 3))
+        corners[:, :, 2] = 1
+        corners[:, 1, 0] = corners[:, 3, 0] = sizes[:, 0]
+        corners[:, 2, 1] = corners[:, 3, 1] = sizes[:, 1]
+        absolute = np.einsum('nij,nkj->nki', transforms, corners)[:, :, :2]
+        bounds = np.concatenate([absolute.min(axis=1), absolute.max(axis=1)], axis=1)
+        absolute_rotations = np.degrees(np.arctan2(transforms[:, 1, 0], transforms[:, 0, 0])) % 360
+
+        # 一次性转为 Python 数值，构建图层时直接取用
+        self._frames = np.concatenate([positions, sizes], axis=1).tolist()
+        self._bounds = bounds.tolist()
+        self._absolute_rotations = absolute_rotations.tolist()
+        self._rotations = rotations.tolist()
+        self._flips = flips.tolist()
+
+    def __contains__(self, shape):
+        return _geometry_key(shape) in self._index
+
+    def frame(self, shape):
+        """
+        Returns:
+            tuple: ((x, y, width, height), 旋转角, flipH, flipV)，坐标相对父组，旋转角为 PPT 方向（顺时针）
+        """
+        index = self._index[_geometry_key(shape)]
+        flip_h, flip_v = self._flips[index]
+        return tuple(self._frames[index]), self._rotations[index], flip_h, flip_v
+
+    def bounds(self, shape):
+        """幻灯片坐标系下的包围盒 (x0, y0, x1, y1)，已计入各级组的缩放、旋转与翻转"""
+        return tuple(self._bounds[self._index[_geometry_key(shape)]])
+
+    def absolute_rotation(self, shape):
+        """幻灯片坐标系下的旋转角（顺时针，0-360）"""
+        return self._absolute_rotations[self._index[_geometry_key(shape)]]
@@ -9,14 +9,30 @@ import os
 from pathlib import Path
 import base64
 import logging
+from .output_manifest import build_manifest
 
 logger = logging.getLogger(__name__)
 
+# zip 条目使用固定时间戳和权限，相同内容生成逐字节相同的文件
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+ZIP_FILE_MODE = 0o644 << 16
+
+
+def write_entry(sketch_zip, name, data):
+    """以固定元数据写入 zip 条目"""
+    info = zipfile.ZipInfo(name, date_time=ZIP_TIMESTAMP)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = ZIP_FILE_MODE
+    sketch_zip.writestr(info, data)
+
 class JSONToSketchConverter:
     """JSON 到 Sketch 文件转换器"""
     
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, manifest_top_n=10):
         self.verbose = verbose
+        self.manifest_top_n = manifest_top_n
+        # 最近一次 to_file 生成的输出清单
+        self.manifest = None
     
     def log(self, message, level='info'):
         """记录日志"""
@@ -42,9 +58,12 @@ class JSONToSketchConverter:
                         "user": {...},
                         "workspace": {...}
                     },
-                    "imageDic": {...}
+                    "imageDic": {...},
+                    "preview": b"..."  # 可选，PNG 预览图
                 }
             output_path: 输出文件路径
+        
+        写入完成后 self.manifest 为各条目压缩前后的字节数清单（见 output_manifest.build_manifest）
         """
         
         try:
@@ -66,10 +85,7 @@ class JSONToSketchConverter:
                         page_json = json.dumps(page, indent=2)
                         page_id = page.get("do_objectID")
                         
-                        sketch_zip.writestr(
-                            f'pages/{page_id}.json',
-                            page_json.encode('utf-8')
-                        )
+                        write_entry(sketch_zip, f'pages/{page_id}.json', page_json.encode('utf-8'))
                         
                         # 生成页面引用
                         page_ref = {
@@ -84,12 +100,9 @@ class JSONToSketchConverter:
                 # 2. 写入工作空间数据
                 workspace_data = sketch_data.get("contents", {}).get("workspace", {})
                 
-                for key, workspace_item in workspace_data.items():
+                for key, workspace_item in sorted(workspace_data.items()):
                     workspace_json = json.dumps(workspace_item, indent=2)
-                    sketch_zip.writestr(
-                        f'workspace/{key}.json',
-                        workspace_json.encode('utf-8')
-                    )
+                    write_entry(sketch_zip, f'workspace/{key}.json', workspace_json.encode('utf-8'))
                     self.log(f"写入工作空间文件: workspace/{key}.json")
                 
                 # 3. 准备主要文件数据
@@ -108,13 +121,13 @@ class JSONToSketchConverter:
                 # 4. 写入主要 JSON 文件
                 for filename, data in main_files.items():
                     file_json = json.dumps(data, indent=2)
-                    sketch_zip.writestr(filename, file_json.encode('utf-8'))
+                    write_entry(sketch_zip, filename, file_json.encode('utf-8'))
                     self.log(f"写入主文件: {filename} ({len(file_json)} 字符)")
                 
                 # 5. 写入图片文件
                 image_dic = sketch_data.get("imageDic", {})
                 
-                for image_key, image_data in image_dic.items():
+                for image_key, image_data in sorted(image_dic.items()):
                     try:
                         # 处理不同格式的图片数据
                         if isinstance(image_data, str):
@@ -142,13 +155,25 @@ class JSONToSketchConverter:
                             self.log(f"不支持的图片数据格式: {type(image_data)}", 'warning')
                             continue
                         
-                        sketch_zip.writestr(image_key, image_bytes)
+                        write_entry(sketch_zip, image_key, image_bytes)
                         self.log(f"添加图片: {image_key} ({len(image_bytes)} bytes)")
                         
                     except Exception as img_e:
                         self.log(f"添加图片失败 {image_key}: {str(img_e)}", 'error')
                         continue
+                
+                # 6. 写入预览图
+                preview_data = sketch_data.get("preview")
+                if preview_data:
+                    write_entry(sketch_zip, 'previews/preview.png', preview_data)
+                    self.log(f"写入预览图: previews/preview.png ({len(preview_data)} bytes)")
+                
+                infolist = sketch_zip.infolist()
             
+            self.manifest = build_manifest(
+                infolist, pages_data if isinstance(pages_data, list) else [],
+                os.path.getsize(output_path), self.manifest_top_n,
+            )
             self.log(f"Sketch 文件生成完成: {output_path}")
             return True
             
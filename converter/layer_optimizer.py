@@ -0,0 +1,233 @@
+"""
+图层树优化
+序列化前对画板（和符号母版）的图层树做一次后处理：
+- 删除不可见图层：isVisible 为 False、零尺寸、填充与描边全部禁用或透明的形状、空文本
+  （没有填充也没有描边的形状保留：转换器不输出描边，空样式不代表源形状不可见）
+- 剔除完全位于画板之外的图层，旋转图层按旋转后的包围盒判断
+- 展平平凡组：删除空组，只有一个子图层且没有旋转和翻转的组由子图层替代
+- 合并背景：最上层覆盖整个画板的不透明矩形并入画板背景色，被它完全遮挡的下层图层一并删除
+删除的字节数按 json_to_sketch 的序列化格式估算
+"""
+
+import json
+import math
+from . import metrics
+
+INVISIBLE = 'invisible'
+OFF_CANVAS = 'off_canvas'
+EMPTY_GROUP = 'empty_group'
+FLATTENED_GROUP = 'flattened_group'
+COVERED = 'covered'
+BACKGROUND = 'background'
+REASONS = (INVISIBLE, OFF_CANVAS, EMPTY_GROUP, FLATTENED_GROUP, COVERED, BACKGROUND)
+
+SHAPE_CLASSES = {'rectangle', 'shapePath', 'oval', 'triangle', 'polygon', 'star'}
+
+
+def _json_size(obj):
+    return len(json.dumps(obj, indent=2).encode('utf-8'))
+
+
+def _iter_tree(layer):
+    yield layer
+    for child in layer.get('layers') or ():
+        yield from _iter_tree(child)
+
+
+def _alpha(paint):
+    return (paint.get('color') or {}).get('alpha', 1)
+
+
+def _is_unpainted(style):
+    """样式中有填充或描边，但全部禁用或透明"""
+    fills = style.get('fills') or ()
+    borders = style.get('borders') or ()
+    if not fills and not borders:
+        return False
+    for fill in fills:
+        if fill.get('isEnabled', True) and (fill.get('fillType', 0) != 0 or _alpha(fill) > 0):
+            return False
+    for border in borders:
+        if border.get('isEnabled', True) and border.get('thickness', 1) > 0 and _alpha(border) > 0:
+            return False
+    return True
+
+
+def _opacity(layer):
+    return ((layer.get('style') or {}).get('contextSettings') or {}).get('opacity', 1)
+
+
+def _is_invisible(layer):
+    if not layer.get('isVisible', True) or _opacity(layer) <= 0:
+        return True
+    layer_class = layer.get('_class')
+    frame = layer.get('frame') or {}
+    if layer_class != 'group' and (frame.get('width', 0) <= 0 or frame.get('height', 0) <= 0):
+        return True
+    if layer_class in SHAPE_CLASSES:
+        return _is_unpainted(layer.get('style') or {})
+    if layer_class == 'text':
+        return not (layer.get('attributedString') or {}).get('string', '').strip()
+    return False
+
+
+def _is_transformed(layer):
+    return bool(layer.get('rotation')) or layer.get('isFlippedHorizontal') or layer.get('isFlippedVertical')
+
+
+def _bounds(frame, rotation, origin_x, origin_y):
+    """图层在画板坐标系下的包围盒，旋转绕框中心"""
+    x, y = origin_x + frame.get('x', 0), origin_y + frame.get('y', 0)
+    width, height = frame.get('width', 0), frame.get('height', 0)
+    if not rotation:
+        return x, y, x + width, y + height
+    radians = math.radians(rotation)
+    half_w = (abs(width * math.cos(radians)) + abs(height * math.sin(radians))) / 2
+    half_h = (abs(width * math.sin(radians)) + abs(height * math.cos(radians))) / 2
+    cx, cy = x + width / 2, y + height / 2
+    return cx - half_w, cy - half_h, cx + half_w, cy + half_h
+
+
+def _covers_canvas(layer, width, height):
+    """不透明、未旋转、无描边的矩形完整覆盖画板"""
+    if layer.get('_class') != 'rectangle' or _is_transformed(layer) or _opacity(layer) < 1:
+        return None
+    frame = layer.get('frame') or {}
+    x, y = frame.get('x', 0), frame.get('y', 0)
+    if x > 0 or y > 0 or x + frame.get('width', 0) < width or y + frame.get('height', 0) < height:
+        return None
+    style = layer.get('style') or {}
+    if any(border.get('isEnabled', True) for border in style.get('borders') or ()):
+        return None
+    fills = [fill for fill in style.get('fills') or () if fill.get('isEnabled', True)]
+    if len(fills) != 1 or fills[0].get('fillType', 0) != 0 or _alpha(fills[0]) < 1:
+        return None
+    if any(point.get('cornerRadius') for point in (layer.get('path') or {}).get('points') or ()):
+        return None
+    return fills[0].get('color')
+
+
+class LayerTreeOptimizer:
+    """
+    图层树优化器，累计整个文档的删除统计
+
+    removed 保存被删除的图层（含子图层），调用方据此更新引用它们的数据（共享样式的使用次数、图片）
+    """
+
+    def __init__(self):
+        self.stats = dict.fromkeys(REASONS, 0)
+        self.bytes_removed = 0
+        # 只被已删除图层引用的图片，由 prune_images 统计
+        self.image_bytes_removed = 0
+        self.layers_before = 0
+        self.removed = []
+
+    @property
+    def layers_removed(self):
+        return sum(self.stats.values())
+
+    def _remove(self, layer, reason):
+        self.stats[reason] += 1
+        size = _json_size(layer)
+        self.bytes_removed += size
+        self.removed.extend(_iter_tree(layer))
+        metrics.OPTIMIZER_LAYERS_REMOVED.inc(reason=reason)
+        metrics.OPTIMIZER_BYTES_REMOVED.inc(size)
+
+    def _flatten(self, group, child):
+        """用唯一的子图层替代组，子图层坐标换算到组的父坐标系"""
+        wrapper = {key: value for key, value in group.items() if key != 'layers'}
+        wrapper['layers'] = []
+        size = _json_size(wrapper)
+        self.stats[FLATTENED_GROUP] += 1
+        self.bytes_removed += size
+        metrics.OPTIMIZER_LAYERS_REMOVED.inc(reason=FLATTENED_GROUP)
+        metrics.OPTIMIZER_BYTES_REMOVED.inc(size)
+        child_frame, group_frame = child['frame'], group['frame']
+        child_frame['x'] += group_frame.get('x', 0)
+        child_frame['y'] += group_frame.get('y', 0)
+        return child
+
+    def optimize_layers(self, layers, width, height, origin_x=0, origin_y=0, cull=True):
+        """
+        优化一组同级图层
+
+        Args:
+            width, height: 画板尺寸
+            origin_x, origin_y: 这组图层的坐标原点在画板中的位置
+            cull: 是否剔除画板外的图层；旋转或翻转的组内坐标不能直接换算，不做剔除
+        """
+        result = []
+        for layer in layers:
+            self.layers_before += 1
+            if _is_invisible(layer):
+                self._remove(layer, INVISIBLE)
+                continue
+            frame = layer.get('frame') or {}
+            is_group = layer.get('_class') == 'group'
+            if cull and (not is_group or _is_transformed(layer)):
+                x0, y0, x1, y1 = _bounds(frame, layer.get('rotation') or 0, origin_x, origin_y)
+                if x1 <= 0 or y1 <= 0 or x0 >= width or y0 >= height:
+                    self._remove(layer, OFF_CANVAS)
+                    continue
+            if is_group:
+                layer['layers'] = self.optimize_layers(
+                    layer.get('layers') or [], width, height,
+                    origin_x + frame.get('x', 0), origin_y + frame.get('y', 0),
+                    cull=cull and not _is_transformed(layer),
+                )
+                if not layer['layers']:
+                    self._remove(layer, EMPTY_GROUP)
+                    continue
+                if len(layer['layers']) == 1 and not _is_transformed(layer) and _opacity(layer) >= 1:
+                    layer = self._flatten(layer, layer['layers'][0])
+            result.append(layer)
+        return result
+
+    def optimize_artboard(self, artboard):
+        """优化画板图层树，并把覆盖整个画板的底层矩形并入背景色"""
+        frame = artboard['frame']
+        width, height = frame['width'], frame['height']
+        layers = self.optimize_layers(artboard.get('layers') or [], width, height)
+
+        for index in range(len(layers) - 1, -1, -1):
+            color = _covers_canvas(layers[index], width, height)
+            if color is None:
+                continue
+            for covered in layers[:index]:
+                self._remove(covered, COVERED)
+            self._remove(layers[index], BACKGROUND)
+            artboard['backgroundColor'] = color
+            artboard['hasBackgroundColor'] = True
+            layers = layers[index + 1:]
+            break
+
+        artboard['layers'] = layers
+        return artboard
+
+    def prune_images(self, roots, image_dict, size=len):
+        """
+        删除不再被任何位图图层引用的图片
+
+        Args:
+            roots: 优化后的画板（及符号母版）
+            image_dict: 图片引用 -> 图片数据，原地修改
+            size: 图片数据 -> 字节数
+        """
+        referenced = set()
+        stack = [layer for root in roots for layer in root.get('layers') or ()]
+        while stack:
+            layer = stack.pop()
+            if layer.get('_class') == 'bitmap':
+                referenced.add(layer['image']['_ref'])
+            stack.extend(layer.get('layers') or ())
+        for image_ref in [ref for ref in image_dict if ref not in referenced]:
+            self.image_bytes_removed += size(image_dict.pop(image_ref))
+
+    def summary(self):
+        details = ', '.join(f"{reason} {count}" for reason, count in self.stats.items() if count)
+        return (
+            f"图层优化: {self.layers_before} 个图层中删除 {self.layers_removed} 个"
+            f"{f' ({details})' if details else ''}，约 {self.bytes_removed} 字节 JSON"
+            f"{f'，{self.image_bytes_removed} 字节图片' if self.image_bytes_removed else ''}"
+        )
@@ -0,0 +1,53 @@
+import os
+import time
+import hashlib
+import tempfile
+from django.core.management.base import BaseCommand, CommandError
+from converter.utils import PPTToSketchConverter
+
+
+class Command(BaseCommand):
+    help = '对比 OOXML 快速路径与 python-pptx 参考路径的转换耗时，并校验两者输出逐字节一致'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help='.pptx 文件')
+        parser.add_argument('--repeat', type=int, default=3, help='每条路径重复次数，取最短耗时')
+
+    def _convert(self, path, fast_path, output_dir):
+        started_at = time.perf_counter()
+        converter = PPTToSketchConverter(deterministic_ids=True, fast_path=fast_path, optimize_layers=True)
+        output = converter.convert_ppt_to_sketch(path, output_dir)
+        seconds = time.perf_counter() - started_at
+        with open(output, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        os.remove(output)
+        return seconds, digest
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        totals = {False: 0.0, True: 0.0}
+        mismatches = []
+        with tempfile.TemporaryDirectory() as output_dir:
+            for path in options['paths']:
+                if not os.path.isfile(path):
+                    raise CommandError(f"文件不存在: {path}")
+                best = {}
+                digests = {}
+                for fast_path in (False, True):
+                    runs = [self._convert(path, fast_path, output_dir) for _ in range(repeat)]
+                    best[fast_path] = min(seconds for seconds, _ in runs)
+                    digests[fast_path] = {digest for _, digest in runs}
+                    totals[fast_path] += best[fast_path]
+                identical = digests[False] == digests[True] and len(digests[True]) == 1
+                if not identical:
+                    mismatches.append(path)
+                self.stdout.write(
+                    f"{path}: python-pptx {best[False] * 1000:.0f}ms, 快速路径 {best[True] * 1000:.0f}ms, "
+                    f"{best[False] / best[True]:.2f}x, 输出{'一致' if identical else '不一致'}"
+                )
+
+        self.stdout.write(
+            f"合计: python-pptx {totals[False]:.2f}s, 快速路径 {totals[True]:.2f}s, {totals[False] / totals[True]:.2f}x"
+        )
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} 个文件两条路径的输出不一致")
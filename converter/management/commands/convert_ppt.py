@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from converter.batch import add_arguments, run_batch
+
+
+class Command(BaseCommand):
+    help = '离线批量将 .pptx 转换为 .sketch，不经过 HTTP 和数据库'
+
+    def add_arguments(self, parser):
+        add_arguments(parser)
+
+    def handle(self, *args, **options):
+        try:
+            report = run_batch(
+                options['paths'], output_dir=options['output_dir'], processes=options['processes'],
+                check=options['check'], force=options['force'], write=self.stdout.write,
+                fast_path=not options['reference_parser'],
+            )
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        if report['failed']:
+            raise CommandError(f"{report['failed']} 个文件转换失败")
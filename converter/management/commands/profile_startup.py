@@ -0,0 +1,56 @@
+import sys
+import json
+import time
+import statistics
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# 在全新的解释器中加载各角色的入口，输出启动报告
+ROLE_SCRIPTS = {
+    'web': (
+        "import json, time; started_at = time.perf_counter()\n"
+        "import ppt_to_sketch_service.wsgi\n"
+        "from converter.roles import WEB, startup_report\n"
+        "print(json.dumps(startup_report(WEB, started_at)))\n"
+    ),
+    'worker': (
+        "import json, time; started_at = time.perf_counter()\n"
+        "from ppt_to_sketch_service import worker\n"
+        "worker.setup()\n"
+        "from converter.roles import WORKER, startup_report\n"
+        "print(json.dumps(startup_report(WORKER, started_at)))\n"
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = '分别测量 web 与 worker 进程的启动耗时、RSS 和已加载的转换依赖'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='每个角色启动次数，取中位数')
+
+    def _launch(self, role):
+        started_at = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', ROLE_SCRIPTS[role]],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+        )
+        seconds = time.perf_counter() - started_at
+        if result.returncode != 0:
+            raise CommandError(f"{role} 进程启动失败:\n{result.stderr}")
+        report = json.loads(result.stdout.strip().splitlines()[-1])
+        report['process_seconds'] = seconds
+        return report
+
+    def handle(self, *args, **options):
+        repeat = max(1, options['repeat'])
+        for role in ROLE_SCRIPTS:
+            reports = [self._launch(role) for _ in range(repeat)]
+            modules = reports[-1]['conversion_modules']
+            self.stdout.write(
+                f"{role}: 启动 {statistics.median(r['seconds'] for r in reports) * 1000:.0f}ms "
+                f"(含解释器 {statistics.median(r['process_seconds'] for r in reports) * 1000:.0f}ms), "
+                f"RSS {statistics.median(r['rss_bytes'] for r in reports) / 1024 / 1024:.1f}MB, "
+                f"转换依赖 {', '.join(modules) or '未加载'}"
+            )
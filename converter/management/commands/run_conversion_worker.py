@@ -0,0 +1,34 @@
+import time
+from django.core.management.base import BaseCommand
+from converter.roles import WORKER, preload_conversion_stack, startup_report
+from converter.task_queue import run_worker
+from converter.worker_pool import PreforkWorkerPool, get_pool_settings
+
+
+class Command(BaseCommand):
+    help = '预加载转换依赖后从数据库队列领取并执行转换任务，多个节点可同时运行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='工作线程数，缺省使用 CONVERTER_SCHEDULER["WORKERS"]')
+        parser.add_argument('--worker-id', default=None, help='租约持有者标识，缺省为主机名:进程号:随机后缀')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='预分叉子进程数，0 表示在本进程内用线程执行；缺省使用 CONVERTER_WORKER_POOL["PROCESSES"]')
+        parser.add_argument('--max-jobs-per-child', type=int, default=None, help='子进程完成多少个任务后回收')
+        parser.add_argument('--max-rss-mb', type=int, default=None, help='子进程 RSS 超过多少 MB 后回收')
+
+    def handle(self, *args, **options):
+        processes = options['processes']
+        if processes is None:
+            processes = get_pool_settings()['PROCESSES']
+        if processes:
+            PreforkWorkerPool(
+                processes=processes, max_jobs_per_child=options['max_jobs_per_child'],
+                max_rss_mb=options['max_rss_mb'], write=self.stdout.write,
+            ).run()
+            return
+
+        started_at = time.perf_counter()
+        preload_conversion_stack()
+        report = startup_report(WORKER, started_at)
+        self.stdout.write(f"转换依赖预加载完成: {report['seconds'] * 1000:.0f}ms, RSS {report['rss_bytes'] / 1024 / 1024:.1f}MB")
+        run_worker(workers=options['workers'], worker_id=options['worker_id'], write=self.stdout.write)
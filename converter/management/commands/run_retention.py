@@ -0,0 +1,25 @@
+import time
+from django.core.management.base import BaseCommand
+from converter.retention import run_retention, get_retention_settings
+
+
+class Command(BaseCommand):
+    help = '按保留策略清理过期任务、超额存储与孤儿文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='只统计，不实际删除')
+        parser.add_argument('--loop', action='store_true', help='作为后台任务循环运行')
+        parser.add_argument('--interval', type=int, default=None, help='循环间隔秒数')
+
+    def handle(self, *args, **options):
+        interval = options['interval'] or get_retention_settings()['INTERVAL_SECONDS']
+        while True:
+            report = run_retention(dry_run=options['dry_run'])
+            self.stdout.write(
+                f"删除任务 {report['tasks_deleted']} 个, 文件 {report['files_deleted']} 个, "
+                f"孤儿文件 {report['orphans_deleted']} 个, 过期上传 {report['upload_sessions_expired']} 个, 释放 {report['bytes_reclaimed']} 字节 "
+                f"({report['duration_seconds']}s)"
+            )
+            if not options['loop']:
+                break
+            time.sleep(interval)
@@ -0,0 +1,405 @@
+"""
+Prometheus 指标
+不依赖 prometheus_client，按文本暴露格式 0.0.4 输出；
+热路径上只有一次加锁的字典累加，队列与任务状态类指标在抓取时才计算。
+指标保存在各进程内存中；配置 MULTIPROCESS_DIR 后各进程定期把自己的快照写入该目录，
+任一进程的 /metrics 汇总同一主机上全部进程（Web 进程、工作进程、预分叉子进程）的指标
+"""
+
+import os
+import json
+import math
+import time
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+NAMESPACE = 'ppt_sketch'
+
+# 转换耗时分布（秒），覆盖从单页小文件到数百页大文件
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+DEFAULT_METRICS = {
+    'MULTIPROCESS_DIR': None,   # 各进程写入指标快照的共享目录（本机），None 表示只输出本进程的指标
+    'FLUSH_SECONDS': 5,         # 写入快照的间隔
+}
+
+
+def get_metrics_settings():
+    """合并默认配置与 settings.CONVERTER_METRICS"""
+    from django.conf import settings
+
+    config = DEFAULT_METRICS.copy()
+    config.update(getattr(settings, 'CONVERTER_METRICS', {}))
+    return config
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = list(zip(labelnames, labelvalues))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = f"{NAMESPACE}_{name}"
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} 需要标签 {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def collect(self, snapshots=()):
+        """输出本进程的值，加上其他进程的快照"""
+        lines = self._header()
+        with self._lock:
+            values = dict(self._values)
+        for snapshot in snapshots:
+            for key, value in snapshot:
+                values[tuple(key)] = values.get(tuple(key), 0) + value
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0]
+            counts = state[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(key), list(state[0]), state[1]] for key, state in self._values.items()]
+
+    def reset(self):
+        with self._lock:
+            self._values = {}
+
+    def collect(self, snapshots=()):
+        """输出本进程的值，加上其他进程的快照"""
+        lines = self._header()
+        with self._lock:
+            values = {key: (list(state[0]), state[1]) for key, state in self._values.items()}
+        for snapshot in snapshots:
+            for key, counts, total in snapshot:
+                key = tuple(key)
+                merged, merged_total = values.get(key, ([0] * len(self.buckets), 0.0))
+                values[key] = ([a + b for a, b in zip(merged, counts)], merged_total + total)
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ('le', _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    抓取时通过回调取值的仪表，回调返回 {标签值元组: 数值}
+
+    per_process 为 True 的仪表只反映本进程的状态，多进程汇总时把存活进程的快照相加；
+    为 False 的仪表（如直接查询数据库的任务数）在任一进程中取值都相同，不汇总
+    """
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None, per_process=True):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.per_process = per_process
+
+    def snapshot(self):
+        if not self.per_process:
+            return None
+        return [[list(key), value] for key, value in self.callback().items()]
+
+    def reset(self):
+        pass
+
+    def collect(self, snapshots=()):
+        lines = self._header()
+        values = dict(self.callback())
+        if self.per_process:
+            for snapshot in snapshots:
+                for key, value in snapshot:
+                    values[tuple(key)] = values.get(tuple(key), 0) + value
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+def _scheduler_stat(field):
+    def collect():
+        from .scheduler import process_stats
+        return {(): process_stats()[field]}
+    return collect
+
+
+def _task_status_counts():
+    from django.db.models import Count
+    from .models import ConversionTask
+
+    counts = {(value,): 0 for value, _ in ConversionTask.STATUS_CHOICES}
+    for row in ConversionTask.objects.values('status').annotate(total=Count('id')).order_by():
+        counts[(row['status'],)] = row['total']
+    return counts
+
+
+QUEUE_DEPTH = Gauge('queue_depth', '调度器中等待执行的任务数', callback=_scheduler_stat('queued'))
+QUEUED_COST = Gauge('queued_cost', '调度器中等待执行任务的预估成本之和', callback=_scheduler_stat('queued_cost'))
+JOBS_IN_FLIGHT = Gauge('jobs_in_flight', '正在执行的转换任务数', callback=_scheduler_stat('in_flight'))
+TASKS = Gauge('tasks', '数据库中各状态的任务数', ['status'], callback=_task_status_counts, per_process=False)
+
+CONVERSION_DURATION = Histogram('conversion_duration_seconds', '转换任务总耗时', ['outcome'])
+STAGE_DURATION = Histogram('conversion_stage_duration_seconds', '转换各阶段耗时', ['stage'])
+SLIDES_PROCESSED = Counter('slides_processed_total', '已转换的幻灯片数')
+IMAGES_PROCESSED = Counter('images_processed_total', '已转换的图片数')
+INPUT_BYTES = Counter('input_bytes_processed_total', '已转换的 PPTX 字节数')
+OUTPUT_BYTES = Counter('output_bytes_written_total', '已生成的 Sketch 文件字节数')
+OUTPUT_GROUP_BYTES = Counter('output_group_bytes_total', 'Sketch 文件中页面、图片和元数据条目的压缩后字节数', ['group'])
+OUTPUT_IMAGES_DOWNSAMPLED = Counter('output_images_downsampled_total', '为满足输出预算而缩小的图片数')
+SHAPE_HANDLER_CALLS = Counter('shape_handler_calls_total', '各类形状处理函数的调用次数', ['kind'])
+SHAPE_HANDLER_SECONDS = Counter('shape_handler_seconds_total', '各类形状处理函数的累计耗时（组包含子图层）', ['kind'])
+CONVERSION_FAILURES = Counter('conversion_failures_total', '按异常类型统计的转换失败次数', ['error_class'])
+DOWNLOAD_BYTES = Counter('download_bytes_total', '下载接口返回的 Sketch 文件字节数')
+ADMISSION_REJECTED = Counter('admission_rejected_total', '准入控制拒绝的上传请求数', ['reason'])
+COALESCED_UPLOADS = Counter('coalesced_uploads_total', '合并到相同内容正在转换任务上的上传数')
+OPTIMIZER_LAYERS_REMOVED = Counter('optimizer_layers_removed_total', '图层树优化按原因删除的图层数', ['reason'])
+OPTIMIZER_BYTES_REMOVED = Counter('optimizer_bytes_removed_total', '图层树优化减少的 JSON 字节数（估算）')
+HTTP_REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP 请求耗时', ['view', 'method', 'status'], buckets=REQUEST_BUCKETS
+)
+
+REGISTRY = [
+    QUEUE_DEPTH, QUEUED_COST, JOBS_IN_FLIGHT, TASKS,
+    CONVERSION_DURATION, STAGE_DURATION,
+    SLIDES_PROCESSED, IMAGES_PROCESSED, INPUT_BYTES, OUTPUT_BYTES,
+    SHAPE_HANDLER_CALLS, SHAPE_HANDLER_SECONDS,
+    CONVERSION_FAILURES, DOWNLOAD_BYTES, HTTP_REQUEST_DURATION,
+    OPTIMIZER_LAYERS_REMOVED, OPTIMIZER_BYTES_REMOVED, ADMISSION_REJECTED,
+    COALESCED_UPLOADS, OUTPUT_GROUP_BYTES, OUTPUT_IMAGES_DOWNSAMPLED,
+]
+
+
+def stage_timer(stage):
+    """记录一个转换阶段的耗时"""
+    return STAGE_DURATION.time(stage=stage)
+
+
+def record_output_manifest(manifest):
+    """按分组累计输出文件的压缩后字节数"""
+    for group, data in manifest['groups'].items():
+        OUTPUT_GROUP_BYTES.inc(data['compressed'], group=group)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_snapshot():
+    """
+    把本进程的指标写入共享目录（<pid>.json），未配置目录时不写入
+
+    Returns:
+        bool: 是否写入
+    """
+    directory = get_metrics_settings()['MULTIPROCESS_DIR']
+    if not directory:
+        return False
+    pid = os.getpid()
+    data = {'pid': pid, 'metrics': {}}
+    for metric in REGISTRY:
+        snapshot = metric.snapshot()
+        if snapshot:
+            data['metrics'][metric.name] = snapshot
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{pid}.json")
+    temp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+    return True
+
+
+def read_snapshots(directory):
+    """
+    读取其他进程的快照
+
+    已退出进程的计数器和直方图仍计入总数，保持单调递增；它们的 per_process 仪表不再计入
+
+    Returns:
+        dict: 指标名 -> [快照]
+    """
+    snapshots = {}
+    own = os.getpid()
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return snapshots
+    for name in names:
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取指标快照失败 {name}: {e}")
+            continue
+        if data.get('pid') == own:
+            continue
+        alive = _pid_alive(data['pid'])
+        for metric in REGISTRY:
+            snapshot = data['metrics'].get(metric.name)
+            if snapshot is None or (isinstance(metric, Gauge) and not alive):
+                continue
+            snapshots.setdefault(metric.name, []).append(snapshot)
+    return snapshots
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+_exit_hook = False
+
+
+def _flush_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_snapshot()
+        except Exception as e:
+            logger.error(f"写入指标快照失败: {e}", exc_info=True)
+
+
+def start_flusher():
+    """
+    配置了 MULTIPROCESS_DIR 时启动定期写入快照的后台线程，并在进程正常退出时再写一次，可重复调用。
+    fork 出的子进程清空继承的指标并重新启动线程（见 _after_fork）
+    """
+    global _flusher, _exit_hook
+    config = get_metrics_settings()
+    if not config['MULTIPROCESS_DIR']:
+        return False
+    with _flusher_lock:
+        if not _exit_hook:
+            atexit.register(write_snapshot)
+            _exit_hook = True
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(
+                target=_flush_loop, args=(config['FLUSH_SECONDS'],), name='metrics-flusher', daemon=True
+            )
+            _flusher.start()
+    return True
+
+
+def _after_fork():
+    """子进程继承了父进程的指标，父进程自己的快照已经计入，这里清空避免重复计数"""
+    global _flusher, _flusher_lock
+    for metric in REGISTRY:
+        # fork 时其他线程可能持有锁
+        metric._lock = threading.Lock()
+        metric.reset()
+    _flusher_lock = threading.Lock()
+    if _flusher is not None:
+        _flusher = None
+        start_flusher()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def render():
+    """按 Prometheus 文本格式输出全部指标；配置 MULTIPROCESS_DIR 时汇总其他进程的快照"""
+    directory = get_metrics_settings()['MULTIPROCESS_DIR']
+    snapshots = read_snapshots(directory) if directory else {}
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect(snapshots.get(metric.name, ())))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,42 @@
+"""
+请求指标中间件
+按路由名称记录请求耗时，未匹配路由的请求统一归为 unmatched，避免标签基数膨胀。
+同时支持同步和异步调用，ASGI 下不会让异步视图退化为线程池执行
+"""
+
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from . import metrics
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, start)
+        return response
+
+    def _observe(self, request, response, start):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unmatched'
+        if view != 'converter:metrics':
+            metrics.HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                view=view, method=request.method, status=response.status_code,
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='preview_file',
+            field=models.FileField(blank=True, null=True, upload_to='outputs/previews/', verbose_name='预览图'),
+        ),
+    ]
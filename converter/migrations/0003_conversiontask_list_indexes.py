@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0002_conversiontask_preview_file'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='conversiontask',
+            index=models.Index(fields=['-created_at'], name='task_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conversiontask',
+            index=models.Index(fields=['status', '-created_at'], name='task_status_created_idx'),
+        ),
+    ]
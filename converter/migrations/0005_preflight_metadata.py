@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:27
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0004_chunked_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='estimated_cost',
+            field=models.FloatField(blank=True, null=True, verbose_name='预估成本'),
+        ),
+        migrations.AddField(
+            model_name='conversiontask',
+            name='media_bytes',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='媒体字节数'),
+        ),
+        migrations.AddField(
+            model_name='conversiontask',
+            name='slide_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='幻灯片数量'),
+        ),
+        migrations.AlterField(
+            model_name='conversiontask',
+            name='ppt_file',
+            field=models.FileField(upload_to='uploads/ppt/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['pptx'])], verbose_name='PPT文件'),
+        ),
+    ]
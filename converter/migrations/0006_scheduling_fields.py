@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0005_preflight_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='client_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='客户端标识'),
+        ),
+        migrations.AddField(
+            model_name='conversiontask',
+            name='priority',
+            field=models.SmallIntegerField(default=0, verbose_name='优先级'),
+        ),
+    ]
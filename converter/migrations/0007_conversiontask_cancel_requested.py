@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0006_scheduling_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='cancel_requested',
+            field=models.BooleanField(default=False, verbose_name='已请求取消'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0007_conversiontask_cancel_requested'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='sketch_hash',
+            field=models.CharField(blank=True, max_length=64, verbose_name='输出文件哈希'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0008_conversiontask_sketch_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='领取次数'),
+        ),
+        migrations.AddField(
+            model_name='conversiontask',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='最近心跳'),
+        ),
+        migrations.AddField(
+            model_name='conversiontask',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='租约到期时间'),
+        ),
+        migrations.AddField(
+            model_name='conversiontask',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=128, verbose_name='租约持有者'),
+        ),
+        migrations.AddIndex(
+            model_name='conversiontask',
+            index=models.Index(fields=['status', '-priority', 'created_at'], name='task_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0009_conversiontask_leases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='coalesced_with',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='followers', to='converter.conversiontask', verbose_name='合并到任务'),
+        ),
+    ]
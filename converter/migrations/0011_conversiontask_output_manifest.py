@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0010_conversiontask_coalesced_with'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='output_manifest',
+            field=models.JSONField(blank=True, null=True, verbose_name='输出体积清单'),
+        ),
+    ]
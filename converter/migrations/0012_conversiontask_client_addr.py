@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0011_conversiontask_output_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversiontask',
+            name='client_addr',
+            field=models.CharField(blank=True, db_index=True, max_length=64, verbose_name='客户端地址'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 07:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('converter', '0012_conversiontask_client_addr'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('uploading', '上传中'), ('completing', '完成中'), ('completed', '已完成'), ('failed', '失败')], default='uploading', max_length=20, verbose_name='状态'),
+        ),
+    ]
@@ -3,6 +3,9 @@ from django.core.validators import FileExtensionValidator
 import uuid
 import os
 
+# 允许上传的演示文稿扩展名（python-pptx 无法读取旧版 .ppt）
+ALLOWED_PPT_EXTENSIONS = ['pptx']
+
 class ConversionTask(models.Model):
     STATUS_CHOICES = [
         ('pending', '等待中'),
@@ -14,7 +17,7 @@ class ConversionTask(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     ppt_file = models.FileField(
         upload_to='uploads/ppt/',
-        validators=[FileExtensionValidator(allowed_extensions=['ppt', 'pptx'])],
+        validators=[FileExtensionValidator(allowed_extensions=ALLOWED_PPT_EXTENSIONS)],
         verbose_name='PPT文件'
     )
     sketch_file = models.FileField(
@@ -23,6 +26,12 @@ class ConversionTask(models.Model):
         null=True,
         verbose_name='Sketch文件'
     )
+    preview_file = models.FileField(
+        upload_to='outputs/previews/',
+        blank=True,
+        null=True,
+        verbose_name='预览图'
+    )
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
@@ -32,11 +41,38 @@ class ConversionTask(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     error_message = models.TextField(blank=True, null=True, verbose_name='错误信息')
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='内容哈希')
+    sketch_hash = models.CharField(max_length=64, blank=True, verbose_name='输出文件哈希')
+    output_manifest = models.JSONField(blank=True, null=True, verbose_name='输出体积清单')
+    slide_count = models.PositiveIntegerField(blank=True, null=True, verbose_name='幻灯片数量')
+    media_bytes = models.BigIntegerField(blank=True, null=True, verbose_name='媒体字节数')
+    estimated_cost = models.FloatField(blank=True, null=True, verbose_name='预估成本')
+    priority = models.SmallIntegerField(default=0, verbose_name='优先级')
+    client_id = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='客户端标识')
+    client_addr = models.CharField(max_length=64, blank=True, db_index=True, verbose_name='客户端地址')
+    cancel_requested = models.BooleanField(default=False, verbose_name='已请求取消')
+    lease_owner = models.CharField(max_length=128, blank=True, verbose_name='租约持有者')
+    lease_expires_at = models.DateTimeField(blank=True, null=True, db_index=True, verbose_name='租约到期时间')
+    heartbeat_at = models.DateTimeField(blank=True, null=True, verbose_name='最近心跳')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='领取次数')
+    coalesced_with = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='followers',
+        verbose_name='合并到任务'
+    )
     
     class Meta:
         verbose_name = '转换任务'
         verbose_name_plural = '转换任务'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at'], name='task_created_idx'),
+            models.Index(fields=['status', '-created_at'], name='task_status_created_idx'),
+            models.Index(fields=['status', '-priority', 'created_at'], name='task_queue_idx'),
+        ]
     
     def __str__(self):
         return f"转换任务 {self.id} - {self.get_status_display()}"
@@ -52,3 +88,42 @@ class ConversionTask(models.Model):
         if self.sketch_file:
             return os.path.basename(self.sketch_file.name)
         return ""
+
+
+class UploadSession(models.Model):
+    """分块上传会话 - 分块直接写入磁盘，支持断点续传"""
+    STATUS_CHOICES = [
+        ('uploading', '上传中'),
+        ('completing', '完成中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField(max_length=255, verbose_name='文件名')
+    total_size = models.BigIntegerField(verbose_name='文件大小')
+    received_bytes = models.BigIntegerField(default=0, verbose_name='已接收字节')
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='uploading',
+        verbose_name='状态'
+    )
+    task = models.ForeignKey(
+        ConversionTask,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='upload_sessions',
+        verbose_name='转换任务'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
+    
+    class Meta:
+        verbose_name = '上传会话'
+        verbose_name_plural = '上传会话'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"上传会话 {self.id} - {self.filename}"
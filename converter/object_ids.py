@@ -0,0 +1,47 @@
+"""
+Sketch 对象 ID
+确定性模式下以源文件哈希派生命名空间，按对象在演示文稿中的路径（幻灯片、形状层级）生成 UUIDv5，
+相同输入总是得到相同的 ID；否则退回随机 UUID
+"""
+
+import uuid
+import hashlib
+
+# 本项目固定的根命名空间：uuid5(NAMESPACE_URL, 'https://github.com/MorningStar97/ppt_to_sketch/object-ids')
+ID_NAMESPACE = uuid.UUID('8a202251-8d9f-5133-b241-34d3a1a3b267')
+
+
+def file_sha256(path):
+    """计算文件 SHA-256，用于派生 ID 命名空间，也用作输出文件的 ETag"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+class ObjectIdFactory:
+    """
+    对象 ID 生成器
+
+    Args:
+        source_hash: 源文件 SHA-256，提供时启用确定性 ID
+    """
+
+    def __init__(self, source_hash=None):
+        self.namespace = uuid.uuid5(ID_NAMESPACE, source_hash) if source_hash else None
+        self._issued = {}
+
+    @property
+    def deterministic(self):
+        return self.namespace is not None
+
+    def new(self, path):
+        """为路径生成 ID；同一路径被重复使用时追加序号，保证 ID 不冲突"""
+        if self.namespace is None:
+            return str(uuid.uuid4()).upper()
+        count = self._issued.get(path, 0)
+        self._issued[path] = count + 1
+        if count:
+            path = f"{path}#{count}"
+        return str(uuid.uuid5(self.namespace, path)).upper()
@@ -0,0 +1,546 @@
+"""
+OOXML 快速读取
+绕过 python-pptx 对象模型，用 iterparse 流式解析幻灯片、版式和母版 XML，
+只提取转换需要的 a:xfrm、p:spPr、a:blip 与 a:t / a:rPr 数据，生成紧凑的形状记录。
+记录沿用 python-pptx 的属性名（left、fill、text_frame、shapes 等），直接交给现有的图层构建函数；
+python-pptx 仍是参考实现，快速路径解析失败时由调用方回退到它
+"""
+
+import posixpath
+import zipfile
+from lxml import etree
+from pptx.dml.color import RGBColor
+from pptx.enum.dml import MSO_FILL
+from pptx.enum.shapes import MSO_AUTO_SHAPE_TYPE, MSO_SHAPE_TYPE
+from pptx.enum.text import PP_ALIGN
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+from pptx.util import Centipoints, Emu
+
+P_SP, P_PIC, P_GRPSP = qn('p:sp'), qn('p:pic'), qn('p:grpSp')
+P_GRAPHIC_FRAME, P_CXNSP, P_CONTENT_PART = qn('p:graphicFrame'), qn('p:cxnSp'), qn('p:contentPart')
+SHAPE_TAGS = {P_SP, P_PIC, P_GRPSP, P_GRAPHIC_FRAME, P_CXNSP, P_CONTENT_PART}
+# 只有 spTree / grpSp 的直接子元素才是形状，与 python-pptx 的 iter_shape_elms 一致
+CONTAINER_TAGS = {qn('p:spTree'), P_GRPSP}
+ROOT_TAGS = {qn('p:sld'), qn('p:sldLayout'), qn('p:sldMaster')}
+
+P_CSLD, P_BG, P_BGPR = qn('p:cSld'), qn('p:bg'), qn('p:bgPr')
+P_CNVPR, P_CNVSPPR, P_NVPR, P_PH = qn('p:cNvPr'), qn('p:cNvSpPr'), qn('p:nvPr'), qn('p:ph')
+P_SPPR, P_GRPSPPR, P_XFRM = qn('p:spPr'), qn('p:grpSpPr'), qn('p:xfrm')
+P_BLIPFILL, P_TXBODY = qn('p:blipFill'), qn('p:txBody')
+NV_TAGS = {qn('p:nvSpPr'), qn('p:nvPicPr'), qn('p:nvGrpSpPr'), qn('p:nvGraphicFramePr'), qn('p:nvCxnSpPr')}
+
+A_XFRM, A_OFF, A_EXT, A_CHOFF, A_CHEXT = qn('a:xfrm'), qn('a:off'), qn('a:ext'), qn('a:chOff'), qn('a:chExt')
+A_PRSTGEOM, A_CUSTGEOM, A_AVLST, A_GD = qn('a:prstGeom'), qn('a:custGeom'), qn('a:avLst'), qn('a:gd')
+A_SOLIDFILL, A_SRGBCLR = qn('a:solidFill'), qn('a:srgbClr')
+A_BLIP, A_GRAPHIC_DATA, A_VIDEO_FILE = qn('a:blip'), qn('a:graphicData'), qn('a:videoFile')
+A_P, A_PPR, A_R, A_RPR, A_BR, A_FLD, A_T, A_LATIN = (
+    qn('a:p'), qn('a:pPr'), qn('a:r'), qn('a:rPr'), qn('a:br'), qn('a:fld'), qn('a:t'), qn('a:latin'),
+)
+R_ID, R_EMBED = qn('r:id'), qn('r:embed')
+P_OLE_OBJ, P_EMBED = qn('p:oleObj'), qn('p:embed')
+
+FILL_TYPES = {
+    qn('a:noFill'): MSO_FILL.BACKGROUND,
+    A_SOLIDFILL: MSO_FILL.SOLID,
+    qn('a:gradFill'): MSO_FILL.GRADIENT,
+    qn('a:blipFill'): MSO_FILL.PICTURE,
+    qn('a:pattFill'): MSO_FILL.PATTERNED,
+    qn('a:grpFill'): MSO_FILL.GROUP,
+}
+
+GRAPHIC_DATA_TYPES = {
+    'http://schemas.openxmlformats.org/drawingml/2006/chart': MSO_SHAPE_TYPE.CHART,
+    'http://schemas.openxmlformats.org/drawingml/2006/table': MSO_SHAPE_TYPE.TABLE,
+}
+GRAPHIC_DATA_URI_OLEOBJ = 'http://schemas.openxmlformats.org/presentationml/2006/ole'
+
+# 版式占位符从母版继承尺寸时的类型映射（同 python-pptx LayoutPlaceholder）
+MASTER_PLACEHOLDER_TYPES = {
+    'body': 'body', 'chart': 'body', 'clipArt': 'body', 'ctrTitle': 'title', 'dgm': 'body',
+    'dt': 'dt', 'ftr': 'ftr', 'media': 'body', 'obj': 'body', 'pic': 'body', 'sldNum': 'sldNum',
+    'subTitle': 'body', 'tbl': 'body', 'title': 'title',
+}
+GEOMETRY_ATTRS = ('left', 'top', 'width', 'height')
+
+
+class OOXMLError(ValueError):
+    """快速路径无法读取该文件"""
+
+
+def _bool_attr(value):
+    return value in ('1', 'true')
+
+
+def _rgb(fill_element):
+    """solidFill 下的 srgbClr；主题色等其他颜色与 python-pptx 一样没有 rgb"""
+    srgb = fill_element.find(A_SRGBCLR)
+    return RGBColor.from_string(srgb.get('val')) if srgb is not None else None
+
+
+class ImageRecord:
+    """图片引用，访问 blob 时才从 zip 读取"""
+    __slots__ = ('_package', '_target', 'rId')
+
+    def __init__(self, package, target, rId):
+        self._package = package
+        self._target = target
+        self.rId = rId
+
+    @property
+    def blob(self):
+        if self._target is None:
+            raise KeyError(f"图片关系不存在或为外部链接: {self.rId}")
+        return self._package.read(self._target)
+
+
+class FillRecord:
+    __slots__ = ('type', 'fore_color')
+
+    def __init__(self, fill_type=None, fore_color=None):
+        self.type = fill_type
+        self.fore_color = fore_color
+
+
+class BackgroundRecord:
+    __slots__ = ('fill',)
+
+    def __init__(self, fill):
+        self.fill = fill
+
+
+class ColorRecord:
+    __slots__ = ('rgb',)
+
+    def __init__(self, rgb):
+        self.rgb = rgb
+
+
+class FontRecord:
+    __slots__ = ('size', 'name', 'color')
+
+    def __init__(self, size=None, name=None, color=None):
+        self.size = size
+        self.name = name
+        self.color = color
+
+
+class RunRecord:
+    __slots__ = ('text', 'font')
+
+    def __init__(self, text, font):
+        self.text = text
+        self.font = font
+
+
+class ParagraphRecord:
+    __slots__ = ('text', 'alignment', 'runs')
+
+    def __init__(self, text, alignment, runs):
+        self.text = text
+        self.alignment = alignment
+        self.runs = runs
+
+
+class TextFrameRecord:
+    __slots__ = ('paragraphs',)
+
+    def __init__(self, paragraphs):
+        self.paragraphs = paragraphs
+
+    @property
+    def text(self):
+        return '\n'.join(paragraph.text for paragraph in self.paragraphs)
+
+
+class ShapeRecord:
+    """
+    形状记录
+
+    image、fill、text_frame、shapes 只在对应形状上设置，未设置时访问抛出 AttributeError，
+    与 python-pptx 中这些属性按形状类别存在的行为一致（构建函数用 hasattr 判断）
+    """
+    __slots__ = (
+        'tag', 'shape_id', 'name', 'shape_type', 'is_placeholder', 'placeholder_type', 'placeholder_idx',
+        'left', 'top', 'width', 'height', 'rotation', 'flip_h', 'flip_v', 'child_offset', 'child_extent',
+        'prst', 'adjustments', 'auto_shape_type', 'custom_geometry', 'text_box', 'text_present', 'is_movie',
+        'graphic_data_type', 'image', 'fill', 'text_frame', 'shapes',
+    )
+
+    def __init__(self, tag):
+        self.tag = tag
+        self.shape_id = 0
+        self.name = ''
+        self.shape_type = None
+        self.is_placeholder = False
+        self.placeholder_type = None
+        self.placeholder_idx = 0
+        self.left = self.top = self.width = self.height = None
+        self.rotation = 0.0
+        self.flip_h = self.flip_v = False
+        self.child_offset = self.child_extent = None
+        self.prst = None
+        self.adjustments = {}
+        self.auto_shape_type = None
+        self.custom_geometry = False
+        self.text_box = False
+        self.text_present = False
+        self.is_movie = False
+        self.graphic_data_type = None
+        if tag == P_GRPSP:
+            self.shapes = []
+        elif tag == P_SP:
+            self.fill = FillRecord()
+
+    def finish(self):
+        """确定形状类型；python-pptx 无法识别的形状返回 None"""
+        tag = self.tag
+        if tag == P_SP:
+            if self.is_placeholder:
+                self.shape_type = MSO_SHAPE_TYPE.PLACEHOLDER
+            elif self.custom_geometry:
+                self.shape_type = MSO_SHAPE_TYPE.FREEFORM
+            elif self.prst is not None and not self.text_box:
+                self.shape_type = MSO_SHAPE_TYPE.AUTO_SHAPE
+                try:
+                    self.auto_shape_type = MSO_AUTO_SHAPE_TYPE.from_xml(self.prst)
+                except (KeyError, ValueError):
+                    self.auto_shape_type = None
+            elif self.text_box:
+                self.shape_type = MSO_SHAPE_TYPE.TEXT_BOX
+            else:
+                return None
+        elif tag == P_PIC:
+            if self.is_movie and not self.is_placeholder:
+                self.shape_type = MSO_SHAPE_TYPE.MEDIA
+            else:
+                self.shape_type = MSO_SHAPE_TYPE.PLACEHOLDER if self.is_placeholder else MSO_SHAPE_TYPE.PICTURE
+        elif tag == P_GRPSP:
+            self.shape_type = MSO_SHAPE_TYPE.GROUP
+        elif tag == P_GRAPHIC_FRAME:
+            self.shape_type = MSO_SHAPE_TYPE.PLACEHOLDER if self.is_placeholder else self.graphic_data_type
+        elif tag == P_CXNSP:
+            self.shape_type = MSO_SHAPE_TYPE.LINE
+        else:
+            return None
+        return self
+
+
+class PartRecord:
+    """幻灯片、版式或母版"""
+
+    def __init__(self, partname):
+        self.partname = partname
+        self.name = ''
+        self.show_master_shapes = True
+        self.shapes = []
+        self.background = BackgroundRecord(FillRecord())
+        self.slide_layout = None
+        self.slide_master = None
+
+    def placeholder(self, idx=None, ph_type=None):
+        """按 idx 或类型查找顶层占位符，同 python-pptx 的 placeholders.get()"""
+        for shape in self.shapes:
+            if not shape.is_placeholder:
+                continue
+            if (idx is not None and shape.placeholder_idx == idx) or (ph_type is not None and shape.placeholder_type == ph_type):
+                return shape
+        return None
+
+
+def _read_xfrm(record, xfrm):
+    for child in xfrm:
+        tag = child.tag
+        if tag == A_OFF:
+            record.left, record.top = Emu(int(child.get('x'))), Emu(int(child.get('y')))
+        elif tag == A_EXT:
+            record.width, record.height = Emu(int(child.get('cx'))), Emu(int(child.get('cy')))
+        elif tag == A_CHOFF:
+            record.child_offset = (int(child.get('x')), int(child.get('y')))
+        elif tag == A_CHEXT:
+            record.child_extent = (int(child.get('cx')), int(child.get('cy')))
+    rot = xfrm.get('rot')
+    if rot:
+        record.rotation = (int(rot) % 21600000) / 60000.0
+    record.flip_h = _bool_attr(xfrm.get('flipH'))
+    record.flip_v = _bool_attr(xfrm.get('flipV'))
+
+
+def _read_fill(properties):
+    for child in properties:
+        fill_type = FILL_TYPES.get(child.tag)
+        if fill_type is not None:
+            return FillRecord(fill_type, _rgb(child) if fill_type == MSO_FILL.SOLID else None)
+    return FillRecord()
+
+
+def _read_nv_properties(record, nv):
+    for child in nv:
+        tag = child.tag
+        if tag == P_CNVPR:
+            record.shape_id = int(child.get('id', 0))
+            record.name = child.get('name', '')
+        elif tag == P_CNVSPPR:
+            record.text_box = _bool_attr(child.get('txBox'))
+        elif tag == P_NVPR:
+            for item in child:
+                if item.tag == P_PH:
+                    record.is_placeholder = True
+                    record.placeholder_type = item.get('type', 'obj')
+                    record.placeholder_idx = int(item.get('idx', 0))
+                elif item.tag == A_VIDEO_FILE:
+                    record.is_movie = True
+
+
+def _read_shape_properties(record, properties):
+    for child in properties:
+        tag = child.tag
+        if tag == A_XFRM:
+            _read_xfrm(record, child)
+        elif tag == A_PRSTGEOM:
+            record.prst = child.get('prst')
+            av_list = child.find(A_AVLST)
+            if av_list is not None:
+                for guide in av_list.iter(A_GD):
+                    formula = guide.get('fmla', '')
+                    if formula.startswith('val '):
+                        record.adjustments[guide.get('name')] = int(formula[4:])
+        elif tag == A_CUSTGEOM:
+            record.custom_geometry = True
+    if record.tag == P_SP:
+        record.fill = _read_fill(properties)
+
+
+def _read_font(rPr):
+    if rPr is None:
+        return FontRecord()
+    sz = rPr.get('sz')
+    latin = rPr.find(A_LATIN)
+    fill = rPr.find(A_SOLIDFILL)
+    rgb = _rgb(fill) if fill is not None else None
+    return FontRecord(
+        size=Centipoints(int(sz)) if sz else None,
+        name=latin.get('typeface') if latin is not None else None,
+        color=ColorRecord(rgb) if rgb is not None else None,
+    )
+
+
+def _text_of(element):
+    t = element.find(A_T)
+    return (t.text or '') if t is not None else ''
+
+
+def _read_paragraph(p):
+    """段落文本的拼接方式与 python-pptx 相同：换行符 a:br 记为 \\v，域 a:fld 计入文本但不算 run"""
+    parts = []
+    runs = []
+    alignment = None
+    for child in p:
+        tag = child.tag
+        if tag == A_R:
+            text = _text_of(child)
+            parts.append(text)
+            runs.append(RunRecord(text, _read_font(child.find(A_RPR))))
+        elif tag == A_BR:
+            parts.append('\v')
+        elif tag == A_FLD:
+            parts.append(_text_of(child))
+        elif tag == A_PPR:
+            algn = child.get('algn')
+            alignment = PP_ALIGN.from_xml(algn) if algn else None
+    return ParagraphRecord(''.join(parts), alignment, runs)
+
+
+class _PartParser:
+    """单个部件的流式解析器，形状结束时即清理已处理的 XML，内存占用与最大的单个形状相当"""
+
+    def __init__(self, package, partname, rels):
+        self.package = package
+        self.part = PartRecord(partname)
+        self.rels = rels
+
+    def _image(self, blip):
+        rId = blip.get(R_EMBED)
+        rel = self.rels.get(rId)
+        return ImageRecord(self.package, rel[1] if rel else None, rId)
+
+    def _end(self, record, element):
+        tag = element.tag
+        if tag in NV_TAGS:
+            _read_nv_properties(record, element)
+        elif tag in (P_SPPR, P_GRPSPPR):
+            _read_shape_properties(record, element)
+        elif tag == A_T:
+            if element.text and element.text.strip():
+                record.text_present = True
+        elif tag == P_TXBODY and record.tag == P_SP:
+            record.text_frame = TextFrameRecord([_read_paragraph(p) for p in element.iterchildren(A_P)])
+        elif tag == P_BLIPFILL and record.tag == P_PIC and (record.is_placeholder or not record.is_movie):
+            # 视频的 blipFill 是海报帧，python-pptx 的 Movie 没有 image 属性
+            blip = element.find(A_BLIP)
+            if blip is not None:
+                record.image = self._image(blip)
+        elif tag == P_XFRM and record.tag == P_GRAPHIC_FRAME:
+            _read_xfrm(record, element)
+        elif tag == A_GRAPHIC_DATA and record.tag == P_GRAPHIC_FRAME:
+            uri = element.get('uri')
+            if uri == GRAPHIC_DATA_URI_OLEOBJ:
+                ole = element.find(P_OLE_OBJ)
+                embedded = ole is not None and ole.find(P_EMBED) is not None
+                record.graphic_data_type = (
+                    MSO_SHAPE_TYPE.EMBEDDED_OLE_OBJECT if embedded else MSO_SHAPE_TYPE.LINKED_OLE_OBJECT
+                )
+            else:
+                record.graphic_data_type = GRAPHIC_DATA_TYPES.get(uri)
+
+    def parse(self, stream):
+        part = self.part
+        # 正在解析的形状；None 表示不作为形状转换的元素（如 mc:AlternateContent 或 OLE 回退图片中的形状）
+        stack = []
+        for event, element in etree.iterparse(stream, events=('start', 'end'), resolve_entities=False):
+            tag = element.tag
+            if event == 'start':
+                if tag in SHAPE_TAGS:
+                    parent = element.getparent()
+                    convertible = parent is not None and parent.tag in CONTAINER_TAGS and (not stack or stack[-1] is not None)
+                    stack.append(ShapeRecord(tag) if convertible else None)
+                elif tag in ROOT_TAGS:
+                    part.show_master_shapes = element.get('showMasterSp') != '0'
+                elif tag == P_CSLD:
+                    part.name = element.get('name', '')
+                continue
+
+            if tag in SHAPE_TAGS:
+                record = stack.pop()
+                if record is not None and record.finish() is not None:
+                    (stack[-1].shapes if stack else part.shapes).append(record)
+                if not stack:
+                    element.clear()
+                    parent = element.getparent()
+                    while element.getprevious() is not None:
+                        del parent[0]
+            elif stack:
+                if stack[-1] is not None:
+                    self._end(stack[-1], element)
+            elif tag == P_BG:
+                bg_pr = element.find(P_BGPR)
+                if bg_pr is not None:
+                    part.background = BackgroundRecord(_read_fill(bg_pr))
+        return part
+
+
+class OOXMLPresentation:
+    """
+    演示文稿的快速读取结果，提供转换器用到的 slide_width、slide_height 与 slides
+
+    打开时解析全部幻灯片及其引用的版式和母版，图片数据在访问时才读取，
+    因此使用期间 zip 文件保持打开，用完需要 close()
+    """
+
+    def __init__(self, path):
+        self._zip = zipfile.ZipFile(path)
+        self._templates = {}
+        self.slides = []
+        try:
+            self._load()
+        except Exception:
+            self._zip.close()
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._zip.close()
+
+    def read(self, partname):
+        return self._zip.read(partname.lstrip('/'))
+
+    def _rels(self, partname):
+        """部件关系表：rId -> (关系类型, 目标部件名)，外部链接的目标为 None"""
+        directory, filename = posixpath.split(partname)
+        rels_name = posixpath.join(directory, '_rels', f'{filename}.rels').lstrip('/')
+        try:
+            root = etree.fromstring(self._zip.read(rels_name))
+        except KeyError:
+            return {}
+        rels = {}
+        for rel in root:
+            target = rel.get('Target', '')
+            if rel.get('TargetMode') == 'External':
+                target = None
+            elif target.startswith('/'):
+                target = posixpath.normpath(target)
+            else:
+                target = posixpath.normpath(posixpath.join(directory or '/', target))
+            rels[rel.get('Id')] = (rel.get('Type'), target)
+        return rels
+
+    def _related(self, rels, reltype):
+        for rel_type, target in rels.values():
+            if rel_type == reltype and target:
+                return target
+        return None
+
+    def _parse_part(self, partname):
+        rels = self._rels(partname)
+        with self._zip.open(partname.lstrip('/')) as stream:
+            part = _PartParser(self, partname, rels).parse(stream)
+        return part, rels
+
+    def _template(self, partname):
+        template = self._templates.get(partname)
+        if template is None:
+            template, rels = self._parse_part(partname)
+            self._templates[partname] = template
+            master = self._related(rels, RT.SLIDE_MASTER)
+            if master:
+                template.slide_master = self._template(master)
+        return template
+
+    def _load(self):
+        main = self._related(self._rels('/'), RT.OFFICE_DOCUMENT)
+        if not main:
+            raise OOXMLError('找不到演示文稿主部件')
+        rels = self._rels(main)
+        root = etree.fromstring(self._zip.read(main.lstrip('/')))
+        size = root.find(qn('p:sldSz'))
+        self.slide_width = Emu(int(size.get('cx'))) if size is not None else None
+        self.slide_height = Emu(int(size.get('cy'))) if size is not None else None
+
+        slide_ids = root.find(qn('p:sldIdLst'))
+        for slide_id in (slide_ids if slide_ids is not None else ()):
+            rel = rels.get(slide_id.get(R_ID))
+            if not rel or rel[0] != RT.SLIDE or not rel[1]:
+                raise OOXMLError(f"幻灯片关系无效: {slide_id.get(R_ID)}")
+            slide, slide_rels = self._parse_part(rel[1])
+            layout = self._related(slide_rels, RT.SLIDE_LAYOUT)
+            if not layout:
+                raise OOXMLError(f"幻灯片缺少版式: {rel[1]}")
+            slide.slide_layout = self._template(layout)
+            self._inherit_placeholder_geometry(slide)
+            self.slides.append(slide)
+
+    def _inherit_placeholder_geometry(self, slide):
+        """幻灯片占位符未设置位置时继承版式占位符（按 idx），版式占位符再继承母版占位符（按类型）"""
+        layout = slide.slide_layout
+        master = layout.slide_master
+        for shape in slide.shapes:
+            if not shape.is_placeholder or all(getattr(shape, attr) is not None for attr in GEOMETRY_ATTRS):
+                continue
+            base = layout.placeholder(idx=shape.placeholder_idx)
+            if base is None:
+                continue
+            master_base = None
+            if master is not None:
+                ph_type = MASTER_PLACEHOLDER_TYPES.get(base.placeholder_type, base.placeholder_type)
+                master_base = master.placeholder(ph_type=ph_type)
+            for attr in GEOMETRY_ATTRS:
+                if getattr(shape, attr) is None:
+                    value = getattr(base, attr)
+                    if value is None and master_base is not None:
+                        value = getattr(master_base, attr)
+                    setattr(shape, attr, value)
@@ -0,0 +1,139 @@
+"""
+输出文件体积清单
+记录 .sketch 中每个 zip 条目的压缩前后字节数，按页面、图片和元数据分组，
+并列出体积最大的图层和图片，用于定位异常膨胀的输出。
+配置 MAX_BYTES 时超出预算的输出按 DOWNSAMPLE_SIZES 逐级缩小图片后重写
+"""
+
+import json
+import logging
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTPUT = {
+    'MAX_BYTES': None,                      # 输出文件预算，None 表示不限制
+    'DOWNSAMPLE_SIZES': (2048, 1024, 512),  # 超出预算时图片长边依次缩小到的像素数
+    'JPEG_QUALITY': 75,                     # 缩小后不透明图片的 JPEG 质量
+    'TOP_N': 10,                            # 清单中列出的最大图层和图片数
+}
+
+PAGES = 'pages'
+IMAGES = 'images'
+METADATA = 'metadata'
+GROUPS = (PAGES, IMAGES, METADATA)
+
+
+def get_output_settings():
+    """合并默认配置与 settings.CONVERTER_OUTPUT"""
+    config = DEFAULT_OUTPUT.copy()
+    config.update(getattr(settings, 'CONVERTER_OUTPUT', {}))
+    return config
+
+
+def entry_group(name):
+    """zip 条目所属分组：页面、图片，其余（文档、元数据、用户状态、预览图）归入元数据"""
+    if name.startswith('pages/'):
+        return PAGES
+    if name.startswith('images/'):
+        return IMAGES
+    return METADATA
+
+
+def _iter_layers(layer, path):
+    for child in layer.get('layers') or ():
+        child_path = f"{path}/{child.get('name', '')}"
+        yield child, child_path
+        yield from _iter_layers(child, child_path)
+
+
+def largest_layers(pages, top_n):
+    """
+    按序列化字节数列出最大的图层，组只计自身属性，不含子图层
+
+    Returns:
+        list: [{page, path, class, id, bytes, image}]
+    """
+    sizes = []
+    for page in pages:
+        page_name = page.get('name', '')
+        for layer, path in _iter_layers(page, ''):
+            own = {key: value for key, value in layer.items() if key != 'layers'}
+            sizes.append({
+                'page': page_name,
+                'path': path.lstrip('/'),
+                'class': layer.get('_class'),
+                'id': layer.get('do_objectID'),
+                'bytes': len(json.dumps(own, indent=2).encode('utf-8')),
+                'image': (layer.get('image') or {}).get('_ref'),
+            })
+    sizes.sort(key=lambda item: item['bytes'], reverse=True)
+    return sizes[:top_n]
+
+
+def build_manifest(infolist, pages, file_bytes, top_n=10):
+    """
+    生成输出清单
+
+    Args:
+        infolist: 已写入的 zip 条目（ZipFile.infolist()）
+        pages: 页面 JSON 数据
+        file_bytes: 输出文件大小
+        top_n: 列出的最大图层和图片数
+
+    Returns:
+        dict: total, groups, entries, largest_layers, largest_images
+    """
+    groups = {group: {'entries': 0, 'compressed': 0, 'uncompressed': 0} for group in GROUPS}
+    entries = []
+    for info in infolist:
+        group = entry_group(info.filename)
+        entries.append({
+            'name': info.filename,
+            'group': group,
+            'compressed': info.compress_size,
+            'uncompressed': info.file_size,
+        })
+        groups[group]['entries'] += 1
+        groups[group]['compressed'] += info.compress_size
+        groups[group]['uncompressed'] += info.file_size
+
+    image_refs = {}
+    for page in pages:
+        for layer, _ in _iter_layers(page, ''):
+            ref = (layer.get('image') or {}).get('_ref')
+            if ref:
+                image_refs[ref] = image_refs.get(ref, 0) + 1
+    images = sorted(
+        (entry for entry in entries if entry['group'] == IMAGES),
+        key=lambda entry: entry['compressed'], reverse=True,
+    )[:top_n]
+
+    return {
+        'total': {
+            'file_bytes': file_bytes,
+            'entries': len(entries),
+            'compressed': sum(group['compressed'] for group in groups.values()),
+            'uncompressed': sum(group['uncompressed'] for group in groups.values()),
+        },
+        'groups': groups,
+        'entries': entries,
+        'largest_layers': largest_layers(pages, top_n),
+        'largest_images': [dict(entry, layers=image_refs.get(entry['name'], 0)) for entry in images],
+    }
+
+
+def summary(manifest):
+    """单行摘要，用于日志"""
+    groups = ', '.join(
+        f"{group} {data['entries']} 个 {data['compressed']} 字节 (未压缩 {data['uncompressed']})"
+        for group, data in manifest['groups'].items() if data['entries']
+    )
+    text = f"输出 {manifest['total']['file_bytes']} 字节: {groups}"
+    budget = manifest.get('budget')
+    if budget:
+        text += (
+            f"; 预算 {budget['max_bytes']} 字节, 缩小 {budget['images_downsampled']} 张图片"
+            f" ({budget['bytes_before']} -> {budget['bytes_after']}){'' if budget['met'] else ', 仍超出预算'}"
+        )
+    return text
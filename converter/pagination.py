@@ -0,0 +1,8 @@
+from rest_framework.pagination import CursorPagination
+
+class ConversionTaskCursorPagination(CursorPagination):
+    """任务列表游标分页 - 按 created_at 索引定位，避免 OFFSET 扫描"""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-created_at'
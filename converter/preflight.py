@@ -0,0 +1,124 @@
+"""
+上传预检
+只读取 zip 中央目录和 [Content_Types].xml，在入队前拒绝无效文件，
+并给出幻灯片数量、媒体体积和转换成本估算
+"""
+
+import zipfile
+import xml.etree.ElementTree as ET
+
+# OLE 复合文档签名：旧版 .ppt 或加密后的 .pptx 都使用这种容器
+OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+CONTENT_TYPES_PATH = '[Content_Types].xml'
+CONTENT_TYPES_NS = '{http://schemas.openxmlformats.org/package/2006/content-types}'
+
+# 只接受 python-pptx 能打开的主部件类型
+PRESENTATION_CONTENT_TYPES = {
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml',
+    'application/vnd.ms-powerpoint.presentation.macroEnabled.main+xml',
+}
+# 放映文件和模板 python-pptx 无法打开，给出明确的提示
+UNSUPPORTED_CONTENT_TYPES = {
+    'application/vnd.openxmlformats-officedocument.presentationml.slideshow.main+xml': '.ppsx',
+    'application/vnd.openxmlformats-officedocument.presentationml.template.main+xml': '.potx',
+}
+SLIDE_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.presentationml.slide+xml'
+MEDIA_PREFIX = 'ppt/media/'
+
+# [Content_Types].xml 正常只有几 KB，超过上限视为异常文件
+MAX_CONTENT_TYPES_BYTES = 1024 * 1024
+# 解压后总大小上限，防止压缩炸弹
+MAX_UNCOMPRESSED_BYTES = 2 * 1024 * 1024 * 1024
+
+# 成本估算系数（相对单位，约等于单核秒数）
+COST_PER_SLIDE = 0.05
+COST_PER_MEDIA_MB = 0.02
+BASE_COST = 0.2
+
+
+class PreflightError(ValueError):
+    """预检未通过，文件不能被转换"""
+
+
+def estimate_cost(slide_count, media_bytes):
+    """根据幻灯片数量和媒体体积估算转换成本"""
+    return round(BASE_COST + slide_count * COST_PER_SLIDE + media_bytes / (1024 * 1024) * COST_PER_MEDIA_MB, 3)
+
+
+def inspect_presentation(file_obj):
+    """
+    预检演示文稿
+
+    Args:
+        file_obj: 文件路径或可 seek 的二进制文件对象，检查完成后复位到开头
+
+    Returns:
+        dict: slide_count, media_bytes, uncompressed_bytes, estimated_cost
+
+    Raises:
+        PreflightError: 文件不是可转换的 .pptx
+    """
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+        header = file_obj.read(len(OLE_SIGNATURE))
+        file_obj.seek(0)
+    else:
+        with open(file_obj, 'rb') as f:
+            header = f.read(len(OLE_SIGNATURE))
+
+    if header == OLE_SIGNATURE:
+        raise PreflightError('文件为旧版 .ppt 格式或已加密，请在 PowerPoint 中另存为未加密的 .pptx')
+
+    try:
+        with zipfile.ZipFile(file_obj) as ppt_zip:
+            infos = ppt_zip.infolist()
+            names = {info.filename for info in infos}
+            if CONTENT_TYPES_PATH not in names:
+                raise PreflightError('文件缺少 [Content_Types].xml，不是有效的 .pptx')
+
+            media_bytes = 0
+            uncompressed_bytes = 0
+            for info in infos:
+                if info.flag_bits & 0x1:
+                    raise PreflightError('文件包含加密条目，无法转换')
+                uncompressed_bytes += info.file_size
+                if info.filename.startswith(MEDIA_PREFIX):
+                    media_bytes += info.file_size
+
+            if uncompressed_bytes > MAX_UNCOMPRESSED_BYTES:
+                raise PreflightError('文件解压后体积过大')
+            if ppt_zip.getinfo(CONTENT_TYPES_PATH).file_size > MAX_CONTENT_TYPES_BYTES:
+                raise PreflightError('[Content_Types].xml 异常')
+
+            content_types = ET.fromstring(ppt_zip.read(CONTENT_TYPES_PATH))
+    except zipfile.BadZipFile:
+        raise PreflightError('文件已损坏或不是有效的 .pptx')
+    except ET.ParseError:
+        raise PreflightError('[Content_Types].xml 无法解析，文件可能已损坏')
+    finally:
+        if hasattr(file_obj, 'seek'):
+            file_obj.seek(0)
+
+    has_presentation = False
+    slide_count = 0
+    for override in content_types.iter(f'{CONTENT_TYPES_NS}Override'):
+        content_type = override.get('ContentType')
+        part_name = override.get('PartName', '').lstrip('/')
+        if content_type in PRESENTATION_CONTENT_TYPES and part_name in names:
+            has_presentation = True
+        elif content_type in UNSUPPORTED_CONTENT_TYPES and part_name in names:
+            raise PreflightError(f'不支持 {UNSUPPORTED_CONTENT_TYPES[content_type]} 文件，请另存为 .pptx 后上传')
+        elif content_type == SLIDE_CONTENT_TYPE and part_name in names:
+            slide_count += 1
+
+    if not has_presentation:
+        raise PreflightError('文件不是 PowerPoint 演示文稿')
+    if slide_count == 0:
+        raise PreflightError('演示文稿中没有幻灯片')
+
+    return {
+        'slide_count': slide_count,
+        'media_bytes': media_bytes,
+        'uncompressed_bytes': uncompressed_bytes,
+        'estimated_cost': estimate_cost(slide_count, media_bytes),
+    }
@@ -0,0 +1,357 @@
+"""
+预设形状路径
+把 DrawingML 预设几何（a:prstGeom 的 prst）编译为归一化的 Sketch curvePoint 模板。
+模板只与预设名称、调整值（a:avLst）和宽高比有关，同一演示文稿中大量相同的箭头、流程图框共用一份计算结果；
+图层框负责缩放，实例化只是一次缓存查找。
+几何公式按 ECMA-376 presetShapeDefinitions 中的参考线计算，圆弧用三次贝塞尔曲线近似
+"""
+
+import math
+from functools import lru_cache
+from pptx.oxml.ns import qn
+from .ooxml_reader import ShapeRecord
+
+# 调整值的单位：DrawingML 中 100000 表示 100%
+ADJ_UNIT = 100000.0
+# 四分之一圆弧的贝塞尔控制点系数
+KAPPA = 4 * (math.sqrt(2) - 1) / 3
+# 宽高比的缓存精度，尺寸相近的形状共用模板
+ASPECT_PRECISION = 3
+TEMPLATE_CACHE_SIZE = 4096
+
+# 各预设的默认调整值
+DEFAULT_ADJUSTMENTS = {
+    'roundRect': {'adj': 16667},
+    'triangle': {'adj': 50000},
+    'parallelogram': {'adj': 25000},
+    'trapezoid': {'adj': 25000},
+    'hexagon': {'adj': 25000},
+    'octagon': {'adj': 29289},
+    'plus': {'adj': 25000},
+    'star5': {'adj': 19098},
+    'homePlate': {'adj': 50000},
+    'chevron': {'adj': 50000},
+    'rightArrow': {'adj1': 50000, 'adj2': 50000},
+    'leftArrow': {'adj1': 50000, 'adj2': 50000},
+    'upArrow': {'adj1': 50000, 'adj2': 50000},
+    'downArrow': {'adj1': 50000, 'adj2': 50000},
+    'leftRightArrow': {'adj1': 50000, 'adj2': 50000},
+    'wedgeRectCallout': {'adj1': -20833, 'adj2': 62500},
+}
+
+
+def _pin(low, value, high):
+    return max(low, min(value, high))
+
+
+class _Path:
+    """按绝对坐标构建路径，最后按宽高归一化"""
+
+    def __init__(self):
+        self.points = []
+
+    def line(self, x, y):
+        self.points.append([(x, y), None, None])
+
+    def corner(self, start, corner, end):
+        """从 start 经圆角到 end，圆角的尖角位置为 corner"""
+        (sx, sy), (cx, cy), (ex, ey) = start, corner, end
+        self.points.append([start, None, (sx + (cx - sx) * KAPPA, sy + (cy - sy) * KAPPA)])
+        self.points.append([end, (ex + (cx - ex) * KAPPA, ey + (cy - ey) * KAPPA), None])
+
+
+def _format(value):
+    return format(round(value, 6) + 0.0, 'g')
+
+
+def _curve_point(point, curve_to, curve_from, width, height):
+    def coord(xy):
+        return "{" + _format(xy[0] / width) + ", " + _format(xy[1] / height) + "}"
+    has_to, has_from = curve_to is not None, curve_from is not None
+    return {
+        "_class": "curvePoint",
+        "cornerRadius": 0,
+        "curveFrom": coord(curve_from if has_from else point),
+        "curveMode": 4 if has_to or has_from else 1,
+        "curveTo": coord(curve_to if has_to else point),
+        "hasCurveFrom": has_from,
+        "hasCurveTo": has_to,
+        "point": coord(point),
+    }
+
+
+def _rect(w, h, adj):
+    path = _Path()
+    for x, y in ((0, 0), (w, 0), (w, h), (0, h)):
+        path.line(x, y)
+    return path
+
+
+def _round_rect(w, h, adj):
+    ss = min(w, h)
+    r = ss * _pin(0, adj['adj'], 50000) / ADJ_UNIT
+    if r <= 0:
+        return _rect(w, h, adj)
+    path = _Path()
+    path.corner((0, r), (0, 0), (r, 0))
+    path.corner((w - r, 0), (w, 0), (w, r))
+    path.corner((w, h - r), (w, h), (w - r, h))
+    path.corner((r, h), (0, h), (0, h - r))
+    return path
+
+
+def _ellipse(w, h, adj):
+    path = _Path()
+    kx, ky = w / 2 * KAPPA, h / 2 * KAPPA
+    cx, cy = w / 2, h / 2
+    path.points = [
+        [(cx, 0), (cx - kx, 0), (cx + kx, 0)],
+        [(w, cy), (w, cy - ky), (w, cy + ky)],
+        [(cx, h), (cx + kx, h), (cx - kx, h)],
+        [(0, cy), (0, cy + ky), (0, cy - ky)],
+    ]
+    return path
+
+
+def _polygon(*points):
+    path = _Path()
+    for x, y in points:
+        path.line(x, y)
+    return path
+
+
+def _triangle(w, h, adj):
+    return _polygon((w * _pin(0, adj['adj'], 100000) / ADJ_UNIT, 0), (w, h), (0, h))
+
+
+def _parallelogram(w, h, adj):
+    ss = min(w, h)
+    x = ss * _pin(0, adj['adj'], 100000 * w / ss) / ADJ_UNIT
+    return _polygon((x, 0), (w, 0), (w - x, h), (0, h))
+
+
+def _trapezoid(w, h, adj):
+    ss = min(w, h)
+    x = ss * _pin(0, adj['adj'], 50000 * w / ss) / ADJ_UNIT
+    return _polygon((0, h), (x, 0), (w - x, 0), (w, h))
+
+
+def _hexagon(w, h, adj):
+    ss = min(w, h)
+    x = ss * _pin(0, adj['adj'], 50000 * w / ss) / ADJ_UNIT
+    return _polygon((0, h / 2), (x, 0), (w - x, 0), (w, h / 2), (w - x, h), (x, h))
+
+
+def _octagon(w, h, adj):
+    x = min(w, h) * _pin(0, adj['adj'], 50000) / ADJ_UNIT
+    return _polygon((0, x), (x, 0), (w - x, 0), (w, x), (w, h - x), (w - x, h), (x, h), (0, h - x))
+
+
+def _plus(w, h, adj):
+    d = min(w, h) * _pin(0, adj['adj'], 50000) / ADJ_UNIT
+    return _polygon(
+        (0, d), (d, d), (d, 0), (w - d, 0), (w - d, d), (w, d),
+        (w, h - d), (w - d, h - d), (w - d, h), (d, h), (d, h - d), (0, h - d),
+    )
+
+
+def _pentagon(w, h, adj):
+    points = []
+    for i in range(5):
+        angle = math.radians(-90 + 72 * i)
+        points.append((w / 2 * (1 + math.cos(angle)), h / 2 * (1 + math.sin(angle))))
+    return _polygon(*points)
+
+
+def _star5(w, h, adj):
+    inner = _pin(0, adj['adj'], 50000) / 50000.0
+    points = []
+    for i in range(10):
+        angle = math.radians(-90 + 36 * i)
+        radius = 1 if i % 2 == 0 else inner
+        points.append((w / 2 * (1 + radius * math.cos(angle)), h / 2 * (1 + radius * math.sin(angle))))
+    return _polygon(*points)
+
+
+def _home_plate(w, h, adj):
+    ss = min(w, h)
+    x = w - ss * _pin(0, adj['adj'], 100000 * w / ss) / ADJ_UNIT
+    return _polygon((0, 0), (x, 0), (w, h / 2), (x, h), (0, h))
+
+
+def _chevron(w, h, adj):
+    ss = min(w, h)
+    d = ss * _pin(0, adj['adj'], 100000 * w / ss) / ADJ_UNIT
+    return _polygon((0, 0), (w - d, 0), (w, h / 2), (w - d, h), (0, h), (d, h / 2))
+
+
+def _right_arrow(w, h, adj):
+    ss = min(w, h)
+    head = ss * _pin(0, adj['adj2'], 100000 * w / ss) / ADJ_UNIT
+    half_shaft = h * _pin(0, adj['adj1'], 100000) / (2 * ADJ_UNIT)
+    x, y1, y2 = w - head, h / 2 - half_shaft, h / 2 + half_shaft
+    return _polygon((0, y1), (x, y1), (x, 0), (w, h / 2), (x, h), (x, y2), (0, y2))
+
+
+def _down_arrow(w, h, adj):
+    ss = min(w, h)
+    head = ss * _pin(0, adj['adj2'], 100000 * h / ss) / ADJ_UNIT
+    half_shaft = w * _pin(0, adj['adj1'], 100000) / (2 * ADJ_UNIT)
+    y, x1, x2 = h - head, w / 2 - half_shaft, w / 2 + half_shaft
+    return _polygon((x1, 0), (x2, 0), (x2, y), (w, y), (w / 2, h), (0, y), (x1, y))
+
+
+def _mirrored(builder, flip_x, flip_y):
+    def build(w, h, adj):
+        path = builder(w, h, adj)
+        def mirror(xy):
+            return None if xy is None else (w - xy[0] if flip_x else xy[0], h - xy[1] if flip_y else xy[1])
+        path.points = [[mirror(point), mirror(curve_to), mirror(curve_from)] for point, curve_to, curve_from in path.points]
+        return path
+    return build
+
+
+def _left_right_arrow(w, h, adj):
+    ss = min(w, h)
+    head = ss * _pin(0, adj['adj2'], 50000 * w / ss) / ADJ_UNIT
+    half_shaft = h * _pin(0, adj['adj1'], 100000) / (2 * ADJ_UNIT)
+    y1, y2 = h / 2 - half_shaft, h / 2 + half_shaft
+    return _polygon(
+        (0, h / 2), (head, 0), (head, y1), (w - head, y1), (w - head, 0), (w, h / 2),
+        (w - head, h), (w - head, y2), (head, y2), (head, h),
+    )
+
+
+def _wedge_rect_callout(w, h, adj):
+    """矩形标注：尖角指向 adj1 / adj2 给出的位置，按水平或垂直偏移较大的方向落在对应的边上"""
+    dx = w * adj['adj1'] / ADJ_UNIT
+    dy = h * adj['adj2'] / ADJ_UNIT
+    tip = (w / 2 + dx, h / 2 + dy)
+    vertical = abs(dy) > abs(dx * h / w) if w else True
+    x1, x2 = (w * 7 / 12, w * 10 / 12) if dx > 0 else (w * 2 / 12, w * 5 / 12)
+    y1, y2 = (h * 7 / 12, h * 10 / 12) if dy > 0 else (h * 2 / 12, h * 5 / 12)
+    points = [(0, 0)]
+    if vertical and dy < 0:
+        points += [(x1, 0), tip, (x2, 0)]
+    points.append((w, 0))
+    if not vertical and dx > 0:
+        points += [(w, y1), tip, (w, y2)]
+    points.append((w, h))
+    if vertical and dy > 0:
+        points += [(x2, h), tip, (x1, h)]
+    points.append((0, h))
+    if not vertical and dx <= 0:
+        points += [(0, y2), tip, (0, y1)]
+    return _polygon(*points)
+
+
+def _diamond(w, h, adj):
+    return _polygon((w / 2, 0), (w, h / 2), (w / 2, h), (0, h / 2))
+
+
+def _fixed(builder, **adj):
+    """流程图形状没有调整值，按固定比例复用对应的基本形状"""
+    return lambda w, h, _adj: builder(w, h, adj)
+
+
+# 矩形（rect、flowChartProcess 等）不在表中，由转换器直接生成 rectangle 图层
+BUILDERS = {
+    'roundRect': _round_rect,
+    'ellipse': _ellipse,
+    'triangle': _triangle,
+    'rtTriangle': lambda w, h, adj: _polygon((0, 0), (w, h), (0, h)),
+    'diamond': _diamond,
+    'parallelogram': _parallelogram,
+    'trapezoid': _trapezoid,
+    'pentagon': _pentagon,
+    'hexagon': _hexagon,
+    'octagon': _octagon,
+    'plus': _plus,
+    'star5': _star5,
+    'homePlate': _home_plate,
+    'chevron': _chevron,
+    'rightArrow': _right_arrow,
+    'leftArrow': _mirrored(_right_arrow, True, False),
+    'downArrow': _down_arrow,
+    'upArrow': _mirrored(_down_arrow, False, True),
+    'leftRightArrow': _left_right_arrow,
+    'wedgeRectCallout': _wedge_rect_callout,
+    'flowChartAlternateProcess': _fixed(_round_rect, adj=16667),
+    'flowChartTerminator': _fixed(_round_rect, adj=50000),
+    'flowChartDecision': _diamond,
+    'flowChartConnector': _ellipse,
+    'flowChartInputOutput': lambda w, h, adj: _polygon((w / 5, 0), (w, 0), (w * 4 / 5, h), (0, h)),
+}
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(prst, adjustments, aspect):
+    """
+    编译预设形状的归一化路径模板
+
+    Args:
+        prst: 预设名称
+        adjustments: ((名称, 值), ...)，已合并默认值
+        aspect: 宽高比（已按 ASPECT_PRECISION 取整）
+
+    Returns:
+        tuple: curvePoint 列表，多个图层共享，调用方不得修改；不支持的预设返回 None
+    """
+    builder = BUILDERS.get(prst)
+    if builder is None:
+        return None
+    width, height = aspect, 1.0
+    path = builder(width, height, dict(adjustments))
+    return tuple(
+        _curve_point(point, curve_to, curve_from, width, height)
+        for point, curve_to, curve_from in path.points
+    )
+
+
+def preset_geometry(shape):
+    """读取形状的预设名称与显式调整值，两条解析路径通用；没有预设几何时返回 (None, {})"""
+    if isinstance(shape, ShapeRecord):
+        return shape.prst, shape.adjustments
+    sp_pr = shape._element.find(qn('p:spPr'))
+    prst_geom = sp_pr.find(qn('a:prstGeom')) if sp_pr is not None else None
+    if prst_geom is None:
+        return None, {}
+    adjustments = {}
+    for guide in prst_geom.iter(qn('a:gd')):
+        formula = guide.get('fmla', '')
+        if formula.startswith('val '):
+            adjustments[guide.get('name')] = int(formula[4:])
+    return prst_geom.get('prst'), adjustments
+
+
+def preset_path(shape, width, height):
+    """
+    形状的归一化路径点
+
+    Returns:
+        tuple | None: curvePoint 模板；矩形、没有预设几何或预设暂不支持时返回 None，由调用方按矩形处理
+    """
+    prst, explicit = preset_geometry(shape)
+    if prst not in BUILDERS or not width or not height:
+        return None
+    adjustments = dict(DEFAULT_ADJUSTMENTS.get(prst, ()))
+    adjustments.update((name, value) for name, value in explicit.items() if name in adjustments)
+    aspect = round(width / height, ASPECT_PRECISION)
+    if not aspect:
+        return None
+    return compile_template(prst, tuple(sorted(adjustments.items())), aspect)
+
+
+# 预热时编译的常见宽高比：正方形、4:3、16:9、2:1 及其竖版
+COMMON_ASPECTS = (1.0, 4 / 3, 3 / 4, 16 / 9, 9 / 16, 2.0, 0.5)
+
+
+def warm_templates(aspects=COMMON_ASPECTS):
+    """按默认调整值预编译全部预设在常见宽高比下的模板，返回模板数；预分叉的工作进程继承这些缓存"""
+    count = 0
+    for prst in BUILDERS:
+        adjustments = tuple(sorted(DEFAULT_ADJUSTMENTS.get(prst, {}).items()))
+        for aspect in aspects:
+            compile_template(prst, adjustments, round(aspect, ASPECT_PRECISION))
+            count += 1
+    return count
@@ -0,0 +1,206 @@
+"""
+Sketch 预览图生成模块
+优先复用 PPTX 内嵌的缩略图，否则对第一个画板做低分辨率栅格化
+"""
+
+import io
+import base64
+import zipfile
+import logging
+from PIL import Image, ImageDraw
+
+logger = logging.getLogger(__name__)
+
+# Sketch 文件内预览图的固定路径
+SKETCH_PREVIEW_PATH = 'previews/preview.png'
+# PPTX 内嵌缩略图路径（PowerPoint 保存时生成）
+PPTX_THUMBNAIL_PATH = 'docProps/thumbnail.jpeg'
+# 预览图最长边像素
+PREVIEW_MAX_SIZE = 512
+# 预览中每段贝塞尔曲线的采样点数
+PATH_CURVE_STEPS = 8
+
+
+def _to_png(image, max_size=PREVIEW_MAX_SIZE):
+    """缩放到预览尺寸并编码为 PNG"""
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    if max(image.size) > max_size:
+        image.thumbnail((max_size, max_size), Image.Resampling.BILINEAR)
+    output = io.BytesIO()
+    image.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def _decode_image_data(image_data):
+    """将 imageDic 中的图片数据还原为字节"""
+    if isinstance(image_data, bytes):
+        return image_data
+    if isinstance(image_data, dict) and image_data.get("type") == "Buffer":
+        return bytes(image_data.get("data", []))
+    if isinstance(image_data, str):
+        if image_data.startswith('data:'):
+            image_data = image_data.split(',', 1)[1]
+        return base64.b64decode(image_data)
+    return None
+
+
+def _color_tuple(color):
+    """Sketch 颜色 (0-1) 转换为 PIL RGB 元组"""
+    return (
+        int(round(color.get("red", 0) * 255)),
+        int(round(color.get("green", 0) * 255)),
+        int(round(color.get("blue", 0) * 255)),
+    )
+
+
+def extract_pptx_thumbnail(ppt_path, max_size=PREVIEW_MAX_SIZE):
+    """
+    读取 PPTX 内嵌缩略图并转为 PNG
+
+    Returns:
+        bytes | None: PNG 数据，不存在时返回 None
+    """
+    try:
+        with zipfile.ZipFile(ppt_path) as ppt_zip:
+            try:
+                thumbnail_data = ppt_zip.read(PPTX_THUMBNAIL_PATH)
+            except KeyError:
+                return None
+        image = Image.open(io.BytesIO(thumbnail_data))
+        return _to_png(image, max_size)
+    except Exception as e:
+        logger.warning(f"读取 PPTX 缩略图失败: {ppt_path} - {e}")
+        return None
+
+
+def extract_sketch_preview(sketch_path):
+    """读取 .sketch 文件中已有的预览图"""
+    try:
+        with zipfile.ZipFile(sketch_path) as sketch_zip:
+            return sketch_zip.read(SKETCH_PREVIEW_PATH)
+    except KeyError:
+        return None
+    except Exception as e:
+        logger.warning(f"读取 Sketch 预览图失败: {sketch_path} - {e}")
+        return None
+
+
+def _draw_layers(canvas, draw, layers, offset_x, offset_y, scale, image_dict):
+    """按 z-order 绘制图片与形状图层，忽略文本和旋转"""
+    for layer in layers:
+        if not layer.get("isVisible", True):
+            continue
+        frame = layer.get("frame") or {}
+        x = offset_x + frame.get("x", 0) * scale
+        y = offset_y + frame.get("y", 0) * scale
+        width = max(1, int(round(frame.get("width", 0) * scale)))
+        height = max(1, int(round(frame.get("height", 0) * scale)))
+        layer_class = layer.get("_class")
+
+        if layer_class == "group":
+            _draw_layers(canvas, draw, layer.get("layers", []), x, y, scale, image_dict)
+        elif layer_class == "bitmap":
+            image_ref = (layer.get("image") or {}).get("_ref")
+            image_bytes = _decode_image_data(image_dict.get(image_ref))
+            if not image_bytes:
+                continue
+            try:
+                bitmap = Image.open(io.BytesIO(image_bytes))
+                # JPEG 可直接按目标尺寸解码，避免完整解码大图
+                bitmap.draft('RGB', (width, height))
+                bitmap = bitmap.convert('RGBA').resize((width, height), Image.Resampling.BILINEAR)
+                canvas.paste(bitmap, (int(round(x)), int(round(y))), bitmap)
+            except Exception:
+                continue
+        elif "path" in layer or layer_class == "rectangle":
+            fills = (layer.get("style") or {}).get("fills") or []
+            fill = next((f for f in fills if f.get("isEnabled", True)), None)
+            if not fill or not fill.get("color"):
+                continue
+            if layer_class == "rectangle":
+                draw.rectangle([x, y, x + width - 1, y + height - 1], fill=_color_tuple(fill["color"]))
+            else:
+                outline = _path_outline(layer.get("path", {}).get("points", []), x, y, width, height)
+                if len(outline) >= 3:
+                    draw.polygon(outline, fill=_color_tuple(fill["color"]))
+
+
+def _parse_point(value):
+    """Sketch 点字符串 "{x, y}" 转为元组"""
+    x, y = value.strip('{}').split(',')
+    return float(x), float(y)
+
+
+def _path_outline(points, x, y, width, height, steps=PATH_CURVE_STEPS):
+    """把归一化路径点展开为画布坐标的折线，贝塞尔段按固定步数采样"""
+    parsed = []
+    for point in points:
+        try:
+            anchor = _parse_point(point["point"])
+            curve_from = _parse_point(point["curveFrom"]) if point.get("hasCurveFrom") else anchor
+            curve_to = _parse_point(point["curveTo"]) if point.get("hasCurveTo") else anchor
+        except (KeyError, ValueError):
+            return []
+        parsed.append((anchor, curve_from, curve_to))
+
+    outline = []
+    for index, (anchor, curve_from, _) in enumerate(parsed):
+        next_anchor, _, next_curve_to = parsed[(index + 1) % len(parsed)]
+        if curve_from == anchor and next_curve_to == next_anchor:
+            samples = [anchor]
+        else:
+            samples = []
+            for step in range(steps):
+                t = step / steps
+                u = 1 - t
+                samples.append(tuple(
+                    u * u * u * anchor[i] + 3 * u * u * t * curve_from[i] + 3 * u * t * t * next_curve_to[i] + t * t * t * next_anchor[i]
+                    for i in range(2)
+                ))
+        outline.extend((x + px * width, y + py * height) for px, py in samples)
+    return outline
+
+
+def render_artboard_preview(artboard, image_dict, max_size=PREVIEW_MAX_SIZE):
+    """
+    低分辨率栅格化画板，仅绘制图片与形状
+
+    Args:
+        artboard: Sketch 画板字典
+        image_dict: imageDic 图片数据
+        max_size: 预览图最长边像素
+
+    Returns:
+        bytes: PNG 数据
+    """
+    frame = artboard.get("frame") or {}
+    artboard_width = frame.get("width") or 1
+    artboard_height = frame.get("height") or 1
+    scale = max_size / max(artboard_width, artboard_height)
+    size = (max(1, int(round(artboard_width * scale))), max(1, int(round(artboard_height * scale))))
+
+    background = _color_tuple(artboard.get("backgroundColor") or {"red": 1, "green": 1, "blue": 1})
+    canvas = Image.new('RGB', size, background)
+    draw = ImageDraw.Draw(canvas)
+    _draw_layers(canvas, draw, artboard.get("layers", []), 0, 0, scale, image_dict or {})
+    return _to_png(canvas, max_size)
+
+
+def generate_preview(ppt_path=None, artboard=None, image_dict=None, max_size=PREVIEW_MAX_SIZE):
+    """
+    生成预览图：优先使用 PPTX 缩略图，其次栅格化第一个画板
+
+    Returns:
+        bytes | None: PNG 数据
+    """
+    if ppt_path:
+        preview = extract_pptx_thumbnail(ppt_path, max_size)
+        if preview:
+            return preview
+    if artboard:
+        try:
+            return render_artboard_preview(artboard, image_dict, max_size)
+        except Exception as e:
+            logger.warning(f"栅格化预览图失败: {e}")
+    return None
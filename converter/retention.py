@@ -0,0 +1,296 @@
+"""
+存储保留与垃圾回收
+按 TTL 与总容量配额清理过期任务，清扫没有任务引用的孤儿文件
+"""
+
+import os
+import time
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ConversionTask, UploadSession
+from .uploads import discard_upload
+
+logger = logging.getLogger(__name__)
+
+# 任务上由本服务管理的文件字段
+TASK_FILE_FIELDS = ('ppt_file', 'sketch_file', 'preview_file')
+# 参与孤儿清扫与容量统计的目录（相对 MEDIA_ROOT）
+MANAGED_DIRS = ('uploads/ppt', 'outputs/sketch', 'outputs/previews')
+# 仍在使用中的任务不参与清理
+ACTIVE_STATUSES = ('pending', 'processing')
+
+DEFAULT_RETENTION = {
+    'TTL_DAYS': 30,                 # 任务保留天数，None 表示不过期
+    'MAX_TOTAL_BYTES': None,        # 托管目录总容量上限，None 表示不限制
+    'ORPHAN_GRACE_SECONDS': 3600,   # 孤儿文件最短存活时间，避免误删正在写入的文件
+    'UPLOAD_SESSION_TTL_HOURS': 24, # 未完成的分块上传会话保留时间
+    'BATCH_SIZE': 100,              # 每批处理的任务数
+    'DELETES_PER_SECOND': 50,       # 文件删除速率上限，0 表示不限速
+    'INTERVAL_SECONDS': 3600,       # 后台循环间隔
+}
+
+
+def get_retention_settings():
+    """合并默认配置与 settings.CONVERTER_RETENTION"""
+    config = DEFAULT_RETENTION.copy()
+    config.update(getattr(settings, 'CONVERTER_RETENTION', {}))
+    return config
+
+
+class DeleteThrottle:
+    """简单的删除限速器，按固定速率分摊文件删除，避免 IO 突发"""
+    
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second else 0
+        self.next_at = 0.0
+    
+    def wait(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        if now < self.next_at:
+            time.sleep(self.next_at - now)
+            now = self.next_at
+        self.next_at = now + self.interval
+
+
+def _new_report():
+    return {
+        'tasks_deleted': 0,
+        'files_deleted': 0,
+        'orphans_deleted': 0,
+        'upload_sessions_expired': 0,
+        'bytes_reclaimed': 0,
+    }
+
+
+def _delete_file(field_file, throttle=None, dry_run=False):
+    """删除单个存储文件，返回释放的字节数"""
+    if not field_file:
+        return 0
+    storage = field_file.storage
+    name = field_file.name
+    try:
+        if not storage.exists(name):
+            return 0
+        size = storage.size(name)
+        if throttle:
+            throttle.wait()
+        if not dry_run:
+            storage.delete(name)
+        return size
+    except OSError as e:
+        logger.warning(f"删除文件失败: {name} - {e}")
+        return 0
+
+
+def _shared_names(task):
+    """任务的文件中仍被其他任务引用的部分（合并转换的任务共享输出文件和预览图）"""
+    names = {getattr(task, field_name).name for field_name in TASK_FILE_FIELDS if getattr(task, field_name)}
+    if not names:
+        return set()
+    shared = set()
+    others = ConversionTask.objects.exclude(pk=task.pk)
+    for field_name in TASK_FILE_FIELDS:
+        shared.update(others.filter(**{f'{field_name}__in': names}).values_list(field_name, flat=True))
+    return shared
+
+
+def delete_task_files(task, throttle=None, dry_run=False, report=None):
+    """删除任务关联的上传文件、输出文件和预览图，跳过仍被其他任务引用的文件"""
+    reclaimed = 0
+    shared = _shared_names(task)
+    for field_name in TASK_FILE_FIELDS:
+        field_file = getattr(task, field_name)
+        if field_file and field_file.name in shared:
+            continue
+        size = _delete_file(field_file, throttle, dry_run)
+        if size and report is not None:
+            report['files_deleted'] += 1
+        reclaimed += size
+    if report is not None:
+        report['bytes_reclaimed'] += reclaimed
+    return reclaimed
+
+
+def _delete_tasks(queryset, config, throttle, dry_run, report, stop_when=None):
+    """分批删除任务及其文件，stop_when 返回 True 时提前结束"""
+    batch_size = config['BATCH_SIZE']
+    last_key = None
+    while True:
+        # pre_delete 信号读取 status 与 coalesced_with，一并加载避免逐行查询
+        batch_qs = queryset.only('id', 'created_at', 'status', 'coalesced_with', *TASK_FILE_FIELDS).order_by('created_at', 'id')
+        if last_key is not None:
+            last_created_at, last_id = last_key
+            batch_qs = batch_qs.filter(
+                Q(created_at__gt=last_created_at) | Q(created_at=last_created_at, id__gt=last_id)
+            )
+        batch = list(batch_qs[:batch_size])
+        if not batch:
+            return
+        for task in batch:
+            if stop_when and stop_when():
+                return
+            # delete() 会清空主键，先记录游标
+            last_key = (task.created_at, task.pk)
+            if not dry_run:
+                # 文件在这里按限速删除并计入报告，post_delete 信号不再重复删除
+                task.skip_file_cleanup = True
+                task.delete()
+            delete_task_files(task, throttle, dry_run, report)
+            report['tasks_deleted'] += 1
+
+
+def expire_tasks(config=None, throttle=None, dry_run=False, report=None):
+    """删除超过保留期的已结束任务"""
+    config = config or get_retention_settings()
+    report = report if report is not None else _new_report()
+    if not config['TTL_DAYS']:
+        return report
+    cutoff = timezone.now() - timedelta(days=config['TTL_DAYS'])
+    queryset = ConversionTask.objects.filter(created_at__lt=cutoff).exclude(status__in=ACTIVE_STATUSES)
+    _delete_tasks(queryset, config, throttle, dry_run, report)
+    return report
+
+
+def managed_storage_usage():
+    """统计托管目录的总字节数"""
+    total = 0
+    for root in MANAGED_DIRS:
+        for path, _ in _iter_files(os.path.join(settings.MEDIA_ROOT, root)):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                continue
+    return total
+
+
+def enforce_quota(config=None, throttle=None, dry_run=False, report=None):
+    """总容量超过配额时，从最旧的已结束任务开始删除"""
+    config = config or get_retention_settings()
+    report = report if report is not None else _new_report()
+    max_bytes = config['MAX_TOTAL_BYTES']
+    if not max_bytes:
+        return report
+    
+    usage = managed_storage_usage()
+    if usage <= max_bytes:
+        return report
+    logger.info(f"存储用量 {usage} 字节超过配额 {max_bytes} 字节，开始清理")
+    
+    reclaimed_before = report['bytes_reclaimed']
+    queryset = ConversionTask.objects.exclude(status__in=ACTIVE_STATUSES)
+    _delete_tasks(
+        queryset, config, throttle, dry_run, report,
+        stop_when=lambda: usage - (report['bytes_reclaimed'] - reclaimed_before) <= max_bytes
+    )
+    return report
+
+
+def _iter_files(directory):
+    """递归遍历目录下的文件，返回 (路径, DirEntry)"""
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from _iter_files(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry
+    except FileNotFoundError:
+        return
+
+
+def _referenced_names():
+    """收集所有任务引用的存储文件名"""
+    names = set()
+    for field_name in TASK_FILE_FIELDS:
+        names.update(
+            ConversionTask.objects.exclude(**{field_name: ''})
+            .exclude(**{f'{field_name}__isnull': True})
+            .values_list(field_name, flat=True)
+            .iterator()
+        )
+    return names
+
+
+def sweep_orphans(config=None, throttle=None, dry_run=False, report=None):
+    """删除托管目录中没有任何任务引用的文件"""
+    config = config or get_retention_settings()
+    report = report if report is not None else _new_report()
+    referenced = _referenced_names()
+    media_root = str(settings.MEDIA_ROOT)
+    cutoff = time.time() - config['ORPHAN_GRACE_SECONDS']
+    
+    for root in MANAGED_DIRS:
+        for path, entry in _iter_files(os.path.join(media_root, root)):
+            name = os.path.relpath(path, media_root).replace(os.sep, '/')
+            if name in referenced:
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > cutoff:
+                    continue
+                if throttle:
+                    throttle.wait()
+                if not dry_run:
+                    os.remove(path)
+            except OSError as e:
+                logger.warning(f"删除孤儿文件失败: {path} - {e}")
+                continue
+            report['orphans_deleted'] += 1
+            report['bytes_reclaimed'] += stat.st_size
+    return report
+
+
+def expire_upload_sessions(config=None, throttle=None, dry_run=False, report=None):
+    """删除长时间未完成的分块上传会话及其临时文件"""
+    config = config or get_retention_settings()
+    report = report if report is not None else _new_report()
+    cutoff = timezone.now() - timedelta(hours=config['UPLOAD_SESSION_TTL_HOURS'])
+    stale_sessions = UploadSession.objects.filter(
+        status__in=['uploading', 'completing', 'failed'], updated_at__lt=cutoff
+    )
+    for session in stale_sessions.iterator():
+        if throttle:
+            throttle.wait()
+        if dry_run:
+            report['bytes_reclaimed'] += session.received_bytes
+        else:
+            report['bytes_reclaimed'] += discard_upload(session)
+            session.delete()
+        report['upload_sessions_expired'] += 1
+    return report
+
+
+def run_retention(dry_run=False):
+    """
+    执行一次完整的保留策略：过期清理、配额清理、孤儿清扫、过期上传会话清理
+    
+    Returns:
+        dict: 删除的任务数、文件数、孤儿文件数、上传会话数与释放的字节数
+    """
+    config = get_retention_settings()
+    throttle = DeleteThrottle(config['DELETES_PER_SECOND'])
+    report = _new_report()
+    started = time.monotonic()
+    
+    expire_tasks(config, throttle, dry_run, report)
+    enforce_quota(config, throttle, dry_run, report)
+    sweep_orphans(config, throttle, dry_run, report)
+    expire_upload_sessions(config, throttle, dry_run, report)
+    
+    report['duration_seconds'] = round(time.monotonic() - started, 3)
+    logger.info(
+        f"存储清理完成: 删除任务 {report['tasks_deleted']} 个, 文件 {report['files_deleted']} 个, "
+        f"孤儿文件 {report['orphans_deleted']} 个, 过期上传 {report['upload_sessions_expired']} 个, 释放 {report['bytes_reclaimed']} 字节"
+    )
+    return report
+
+
+def delete_files_on_commit(task):
+    """事务提交后删除任务文件，避免回滚时文件已丢失"""
+    transaction.on_commit(lambda: delete_task_files(task))
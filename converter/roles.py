@@ -0,0 +1,96 @@
+"""
+进程角色
+- web：只处理 HTTP 请求，导入模型、序列化器和视图，不加载 python-pptx / lxml / Pillow / NumPy，
+  启动快、常驻内存小；转换交给数据库队列（CONVERTER_QUEUE['BACKEND'] = 'database'）
+- worker：从数据库队列领取任务，启动时预加载整套转换依赖，首个任务不承担导入开销
+两种角色启动后都记录启动耗时、RSS 和已加载的转换依赖，python manage.py profile_startup 可对比测量
+"""
+
+import os
+import sys
+import time
+import logging
+import importlib
+
+logger = logging.getLogger(__name__)
+
+WEB = 'web'
+WORKER = 'worker'
+
+# 只有转换才需要的重型依赖
+CONVERSION_MODULES = ('pptx', 'lxml', 'PIL', 'numpy', 'converter.utils')
+
+# worker 启动时预加载的模块：转换器本身及其按需导入的预览与打包模块
+PRELOAD_MODULES = (
+    'pptx', 'lxml.etree', 'PIL.Image', 'numpy',
+    'converter.utils', 'converter.preview', 'converter.json_to_sketch',
+)
+
+
+def loaded_conversion_modules():
+    return [name for name in CONVERSION_MODULES if name in sys.modules]
+
+
+def process_rss(pid):
+    """指定进程的常驻内存字节数，读取不到时返回 None"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def current_rss():
+    """当前进程常驻内存字节数；读取不到 /proc 时退回峰值 RSS"""
+    rss = process_rss('self')
+    if rss is None:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 以字节为单位，Linux 以 KB 为单位
+        rss = peak if sys.platform == 'darwin' else peak * 1024
+    return rss
+
+
+def load_url_conf():
+    """导入 URL 配置及其引用的视图"""
+    from django.urls import get_resolver
+    return get_resolver().url_patterns
+
+
+def preload_conversion_stack():
+    """导入全部转换依赖并预编译常见的预设形状模板，返回耗时（秒）"""
+    # 旧版 python-pptx 在 3.10+ 上依赖 collections.abc 已被导入
+    import collections.abc  # noqa: F401
+
+    started_at = time.perf_counter()
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    from .presets import warm_templates
+    warm_templates()
+    return time.perf_counter() - started_at
+
+
+def startup_report(role, started_at):
+    """
+    记录进程启动情况
+
+    Args:
+        role: WEB 或 WORKER
+        started_at: 入口模块开始执行时的 time.perf_counter()
+
+    Returns:
+        dict: role, seconds, rss_bytes, conversion_modules
+    """
+    report = {
+        'role': role,
+        'seconds': round(time.perf_counter() - started_at, 3),
+        'rss_bytes': current_rss(),
+        'conversion_modules': loaded_conversion_modules(),
+    }
+    logger.info(
+        f"{role} 进程启动: {report['seconds'] * 1000:.0f}ms, RSS {report['rss_bytes'] / 1024 / 1024:.1f}MB, "
+        f"转换依赖 {', '.join(report['conversion_modules']) or '未加载'}"
+    )
+    if role == WEB and report['conversion_modules']:
+        logger.warning(f"web 进程启动时加载了转换依赖: {', '.join(report['conversion_modules'])}")
+    return report
@@ -0,0 +1,277 @@
+"""
+转换任务调度器
+在 convert_ppt_to_sketch_async 之前按优先级、预估成本和客户端公平性排序任务
+"""
+
+import time
+import heapq
+import weakref
+import itertools
+import threading
+import logging
+from django.conf import settings
+from django.utils import timezone
+from .cancellation import CancelToken, get_job_limits
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCHEDULER = {
+    'WORKERS': 2,                 # 转换工作线程总数
+    'RESERVED_SMALL_WORKERS': 1,  # 其中只处理小任务的线程数，保证交互式任务的延迟
+    'SMALL_JOB_COST': 1.0,        # 预估成本不超过该值的任务视为小任务
+    'DEFAULT_COST': 1.0,          # 缺少预检数据时使用的成本
+}
+
+
+# 本进程内的全部调度器：Web 进程的单例与数据库队列工作进程各自的调度器
+_instances = weakref.WeakSet()
+
+
+def get_scheduler_settings():
+    """合并默认配置与 settings.CONVERTER_SCHEDULER"""
+    config = DEFAULT_SCHEDULER.copy()
+    config.update(getattr(settings, 'CONVERTER_SCHEDULER', {}))
+    return config
+
+
+class ConversionScheduler:
+    """
+    进程内转换调度器
+
+    - 显式优先级高的任务总是先执行
+    - 同一优先级内按客户端做加权公平排队：每个客户端的任务按累计成本获得虚拟完成时间，
+      单个客户端的大批量任务不会饿死其他客户端，成本小的任务自然排在前面
+    - 预留的工作线程只处理小任务，大任务占满其余线程时小任务仍能及时执行
+    - 看门狗线程强制执行墙钟 / CPU 时间限制：超时后仍未响应取消的任务立即被标记失败。
+      线程无法被强制结束，它在转换真正返回前仍占用名额，不另起补位线程以免超额占用 CPU 和内存；
+      需要真正回收时由 on_abandon 处理（预分叉进程池中子进程直接退出，由主进程补位）
+
+    Args:
+        runner: 执行任务的函数，缺省为 convert_ppt_to_sketch_async
+        on_abandon: 任务被强制回收并标记失败后以 (task_id, reason) 调用，在看门狗线程中执行
+    """
+
+    def __init__(self, workers=2, reserved_small_workers=1, small_job_cost=1.0, runner=None, on_abandon=None):
+        self.workers = max(1, workers)
+        self.reserved_small_workers = min(max(0, reserved_small_workers), self.workers - 1)
+        self.small_job_cost = small_job_cost
+        self.runner = runner
+        self.on_abandon = on_abandon
+        self._small_queue = []
+        self._large_queue = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._client_finish = {}
+        self._in_flight = {}
+        # 已强制回收、但工作线程仍未返回的任务
+        self._abandoned = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._worker_counter = itertools.count()
+        self._watchdog = None
+        _instances.add(self)
+
+    def _run_job(self, task_id, token):
+        if self.runner:
+            return self.runner(task_id, cancel_token=token)
+        from .utils import convert_ppt_to_sketch_async
+        return convert_ppt_to_sketch_async(task_id, cancel_token=token)
+
+    def _start_worker(self, small_only):
+        """启动一个工作线程，调用方需持有锁"""
+        index = next(self._worker_counter)
+        thread = threading.Thread(
+            target=self._worker_loop,
+            args=(small_only,),
+            name=f"conversion-worker-{index}{'-small' if small_only else ''}",
+            daemon=True,
+        )
+        thread.start()
+        self._threads.append(thread)
+
+    def _ensure_workers(self):
+        """首次提交任务时启动工作线程和看门狗"""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            self._start_worker(small_only=index < self.reserved_small_workers)
+        self._watchdog = threading.Thread(target=self._watchdog_loop, name='conversion-watchdog', daemon=True)
+        self._watchdog.start()
+
+    def submit(self, task_id, cost=None, priority=0, client_id=''):
+        """
+        提交转换任务
+
+        Args:
+            task_id: ConversionTask 主键
+            cost: 预估成本（预检得到的 estimated_cost）
+            priority: 显式优先级，越大越先执行
+            client_id: 客户端标识，用于公平排队
+        """
+        cost = cost if cost else get_scheduler_settings()['DEFAULT_COST']
+        with self._condition:
+            self._ensure_workers()
+            start = max(self._virtual_time, self._client_finish.get(client_id, 0.0))
+            finish = start + cost
+            self._client_finish[client_id] = finish
+            entry = (-priority, finish, next(self._sequence), task_id, cost, start, client_id)
+            queue = self._small_queue if cost <= self.small_job_cost else self._large_queue
+            heapq.heappush(queue, entry)
+            self._condition.notify_all()
+        logger.info(f"任务已入队: {task_id} (成本 {cost}, 优先级 {priority}, 客户端 {client_id or '-'})")
+
+    def _pop_job(self, small_only):
+        """取出下一个任务，调用方需持有锁"""
+        candidates = [self._small_queue]
+        if not small_only:
+            candidates.append(self._large_queue)
+        candidates = [queue for queue in candidates if queue]
+        if not candidates:
+            return None
+        queue = min(candidates, key=lambda q: q[0])
+        entry = heapq.heappop(queue)
+        # 虚拟时间推进到当前服务任务的开始时间
+        self._virtual_time = max(self._virtual_time, entry[5])
+        if not self._small_queue and not self._large_queue:
+            # 队列清空后重置公平性状态，避免虚拟时间无限增长
+            self._virtual_time = 0.0
+            self._client_finish.clear()
+        return entry
+
+    def cancel(self, task_id):
+        """从队列中移除尚未开始的任务，返回是否移除成功"""
+        with self._condition:
+            for queue in (self._small_queue, self._large_queue):
+                for index, entry in enumerate(queue):
+                    if str(entry[3]) == str(task_id):
+                        queue.pop(index)
+                        heapq.heapify(queue)
+                        return True
+        return False
+
+    def _worker_loop(self, small_only):
+        while True:
+            with self._condition:
+                entry = self._pop_job(small_only)
+                while entry is None:
+                    self._condition.wait()
+                    entry = self._pop_job(small_only)
+                task_id, cost = entry[3], entry[4]
+                token = CancelToken.for_task(task_id)
+                self._in_flight[task_id] = {
+                    'cost': cost,
+                    'token': token,
+                    'thread': threading.current_thread(),
+                    'started_at': time.monotonic(),
+                    'cpu_started_at': time.thread_time(),
+                    'small_only': small_only,
+                }
+            try:
+                self._run_job(task_id, token)
+            except Exception as e:
+                logger.error(f"调度任务执行失败 {task_id}: {e}", exc_info=True)
+            finally:
+                with self._condition:
+                    for jobs in (self._in_flight, self._abandoned):
+                        job = jobs.get(task_id)
+                        if job and job['token'] is token:
+                            jobs.pop(task_id, None)
+
+    def _thread_cpu_time(self, thread):
+        """读取指定线程的 CPU 时间，平台不支持时返回 None"""
+        try:
+            return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+        except (AttributeError, OSError, TypeError):
+            return None
+
+    def _abandon(self, task_id, job, reason):
+        """放弃超时任务：令牌标记为已回收，线程返回前仍计入占用，调用方需持有锁"""
+        job['token'].abandoned = True
+        job['token'].cancel(reason)
+        self._in_flight.pop(task_id, None)
+        self._abandoned[task_id] = job
+
+    def _fail_abandoned(self, task_id, reason):
+        """标记被放弃的任务失败并通知 on_abandon，不持有调度器锁"""
+        from .models import ConversionTask
+        from .coalescing import settle_followers
+
+        ConversionTask.objects.filter(pk=task_id, status='processing').update(
+            status='failed', error_message=reason, updated_at=timezone.now()
+        )
+        settle_followers(task_id)
+        logger.error(f"转换任务被强制终止 {task_id}: {reason}")
+        if self.on_abandon:
+            self.on_abandon(task_id, reason)
+
+    def _watchdog_loop(self):
+        while True:
+            time.sleep(1)
+            limits = get_job_limits()
+            grace = limits['HARD_KILL_GRACE_SECONDS']
+            now = time.monotonic()
+            abandoned = []
+            with self._condition:
+                for task_id, job in list(self._in_flight.items()):
+                    token = job['token']
+                    elapsed = now - job['started_at']
+                    cpu_time = self._thread_cpu_time(job['thread'])
+                    cpu_used = cpu_time - job['cpu_started_at'] if cpu_time is not None else None
+                    if limits['WALL_TIMEOUT_SECONDS'] and elapsed > limits['WALL_TIMEOUT_SECONDS']:
+                        token.cancel(f"转换超时: 运行超过 {limits['WALL_TIMEOUT_SECONDS']} 秒")
+                        if elapsed > limits['WALL_TIMEOUT_SECONDS'] + grace:
+                            self._abandon(task_id, job, token.reason)
+                            abandoned.append((task_id, token.reason))
+                    elif limits['CPU_TIMEOUT_SECONDS'] and cpu_used is not None and \
+                            cpu_used > limits['CPU_TIMEOUT_SECONDS'] + grace:
+                        reason = f"转换超时: CPU 时间超过 {limits['CPU_TIMEOUT_SECONDS']} 秒"
+                        self._abandon(task_id, job, reason)
+                        abandoned.append((task_id, reason))
+            # 数据库写入和回调不持有锁，避免阻塞提交和工作线程
+            for task_id, reason in abandoned:
+                try:
+                    self._fail_abandoned(task_id, reason)
+                except Exception as e:
+                    logger.error(f"回收超时任务失败 {task_id}: {e}")
+
+    def stats(self):
+        """队列深度、排队成本和执行中任务数"""
+        with self._condition:
+            queued = self._small_queue + self._large_queue
+            return {
+                'queued': len(queued),
+                'queued_cost': sum(entry[4] for entry in queued),
+                # 已放弃但线程仍在运行的任务同样占用工作线程
+                'in_flight': len(self._in_flight) + len(self._abandoned),
+                'in_flight_cost': sum(job['cost'] for job in (*self._in_flight.values(), *self._abandoned.values())),
+                'abandoned': len(self._abandoned),
+                'workers': self.workers,
+            }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """进程级调度器单例"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            config = get_scheduler_settings()
+            _scheduler = ConversionScheduler(
+                workers=config['WORKERS'],
+                reserved_small_workers=config['RESERVED_SMALL_WORKERS'],
+                small_job_cost=config['SMALL_JOB_COST'],
+            )
+        return _scheduler
+
+
+def process_stats():
+    """本进程全部调度器的排队与执行中任务合计，不创建调度器"""
+    totals = {'queued': 0, 'queued_cost': 0, 'in_flight': 0, 'in_flight_cost': 0}
+    for scheduler in list(_instances):
+        stats = scheduler.stats()
+        for field in totals:
+            totals[field] += stats[field]
+    return totals
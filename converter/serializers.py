@@ -1,5 +1,9 @@
+import os
+import hashlib
 from rest_framework import serializers
-from .models import ConversionTask
+from .models import ConversionTask, UploadSession, ALLOWED_PPT_EXTENSIONS
+from .uploads import get_upload_settings
+from .preflight import inspect_presentation, PreflightError
 
 class ConversionTaskSerializer(serializers.ModelSerializer):
     ppt_filename = serializers.ReadOnlyField()
@@ -10,14 +14,74 @@ class ConversionTaskSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'ppt_file', 'sketch_file', 'status', 
             'created_at', 'updated_at', 'error_message',
-            'ppt_filename', 'sketch_filename'
+            'ppt_filename', 'sketch_filename', 'priority', 'cancel_requested',
+            'slide_count', 'media_bytes', 'estimated_cost', 'coalesced_with'
+        ]
+        read_only_fields = [
+            'id', 'status', 'created_at', 'updated_at', 'sketch_file', 'error_message',
+            'priority', 'cancel_requested', 'slide_count', 'media_bytes', 'estimated_cost',
+            'coalesced_with'
         ]
-        read_only_fields = ['id', 'status', 'created_at', 'updated_at', 'sketch_file', 'error_message']
 
 class ConversionTaskCreateSerializer(serializers.ModelSerializer):
     ppt_filename = serializers.ReadOnlyField()
+    priority = serializers.IntegerField(required=False, min_value=-10, max_value=10)
     
     class Meta:
         model = ConversionTask
-        fields = ['id', 'ppt_file', 'status', 'created_at', 'ppt_filename']
-        read_only_fields = ['id', 'status', 'created_at', 'ppt_filename'] 
\ No newline at end of file
+        fields = [
+            'id', 'ppt_file', 'status', 'created_at', 'ppt_filename', 'priority',
+            'slide_count', 'media_bytes', 'estimated_cost', 'coalesced_with'
+        ]
+        read_only_fields = [
+            'id', 'status', 'created_at', 'ppt_filename',
+            'slide_count', 'media_bytes', 'estimated_cost', 'coalesced_with'
+        ]
+    
+    def validate_ppt_file(self, value):
+        """预检上传文件，只读取 zip 目录和内容类型清单"""
+        try:
+            self._preflight = inspect_presentation(value)
+        except PreflightError as e:
+            raise serializers.ValidationError(str(e))
+        return value
+    
+    def create(self, validated_data):
+        preflight = getattr(self, '_preflight', None)
+        if preflight:
+            validated_data['slide_count'] = preflight['slide_count']
+            validated_data['media_bytes'] = preflight['media_bytes']
+            validated_data['estimated_cost'] = preflight['estimated_cost']
+        # 内容哈希用于合并相同上传的转换
+        hasher = hashlib.sha256()
+        for chunk in validated_data['ppt_file'].chunks():
+            hasher.update(chunk)
+        validated_data['content_hash'] = hasher.hexdigest()
+        return super().create(validated_data)
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size', 'received_bytes', 'status', 'task', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+class UploadSessionCreateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'total_size']
+        read_only_fields = ['id']
+    
+    def validate_filename(self, value):
+        filename = os.path.basename(value)
+        extension = os.path.splitext(filename)[1][1:].lower()
+        if extension not in ALLOWED_PPT_EXTENSIONS:
+            raise serializers.ValidationError(f"不支持的文件类型，仅支持: {', '.join(ALLOWED_PPT_EXTENSIONS)}")
+        return filename
+    
+    def validate_total_size(self, value):
+        max_bytes = get_upload_settings()['max_bytes']
+        if value <= 0:
+            raise serializers.ValidationError('文件大小必须大于 0')
+        if value > max_bytes:
+            raise serializers.ValidationError(f"文件大小不能超过 {max_bytes} 字节")
+        return value
@@ -0,0 +1,126 @@
+"""
+形状分派表
+按 MSO_SHAPE_TYPE 与自选图形类型查表决定形状由哪类处理函数转换，两个转换器共用。
+分类只读取形状 XML，不构造完整文本；每类处理函数的调用次数和耗时单独统计
+"""
+
+import time
+from pptx.enum.shapes import MSO_SHAPE_TYPE
+from pptx.oxml.ns import qn
+from . import metrics
+
+# 处理函数类别
+GROUP = 'group'
+PICTURE = 'picture'
+TEXT = 'text'
+SHAPE = 'shape'
+LABELLED = 'labelled'   # 带文字的自选图形：形状图层 + 文本图层
+
+_TEXT_TAG = qn('a:t')
+
+
+def has_text(shape):
+    """形状是否包含非空白文本，遇到第一个非空文本段即返回"""
+    # 快速路径的形状记录在解析时已经判断过
+    present = getattr(shape, 'text_present', None)
+    if present is not None:
+        return present
+    for element in shape._element.iter(_TEXT_TAG):
+        if element.text and element.text.strip():
+            return True
+    return False
+
+
+def text_or_shape(shape):
+    return TEXT if has_text(shape) else SHAPE
+
+
+def labelled_or_shape(shape):
+    """自选图形的文字画在几何形状之上，两者都要转换"""
+    return LABELLED if has_text(shape) else SHAPE
+
+
+def classify_placeholder(shape):
+    """图片占位符按图片处理，空占位符只在编辑视图中显示提示文字，放映时不可见"""
+    if hasattr(shape, 'image'):
+        return PICTURE
+    return TEXT if has_text(shape) else None
+
+
+def _auto_shape_type(shape):
+    try:
+        return shape.auto_shape_type
+    except (ValueError, NotImplementedError, AttributeError):
+        return None
+
+
+class ShapeHandlerRegistry:
+    """
+    形状分派表
+
+    表项以 (MSO_SHAPE_TYPE, MSO_AUTO_SHAPE_TYPE) 为键，值为处理函数类别或返回类别的分类函数；
+    自选图形类型为 None 的表项匹配该形状类型下的所有形状。
+    转换器通过 handlers 字典把类别映射到自己的处理函数
+    """
+
+    def __init__(self, default=text_or_shape):
+        self._entries = {}
+        self.default = default
+
+    def register(self, shape_type, kind, auto_shape_type=None):
+        """注册表项，kind 可以是类别字符串或 shape -> 类别 的函数"""
+        self._entries[(shape_type, auto_shape_type)] = kind
+
+    def classify(self, shape):
+        """返回形状的处理函数类别，None 表示跳过"""
+        shape_type = shape.shape_type
+        kind = None
+        if shape_type == MSO_SHAPE_TYPE.AUTO_SHAPE:
+            kind = self._entries.get((shape_type, _auto_shape_type(shape)))
+        if kind is None:
+            kind = self._entries.get((shape_type, None), self.default)
+        return kind(shape) if callable(kind) else kind
+
+    def dispatch(self, shape, layer_name, handlers, stats=None):
+        """
+        分类并调用对应的处理函数
+
+        Args:
+            handlers: 类别 -> 处理函数(shape, layer_name)
+            stats: 可选的统计字典，累计每类处理函数的调用次数与耗时（组图层包含子图层耗时）
+
+        Returns:
+            tuple: (类别, 图层)；没有对应处理函数时图层为 None
+        """
+        kind = self.classify(shape)
+        handler = handlers.get(kind)
+        if handler is None:
+            return kind, None
+
+        start = time.perf_counter()
+        try:
+            return kind, handler(shape, layer_name)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.SHAPE_HANDLER_CALLS.inc(kind=kind)
+            metrics.SHAPE_HANDLER_SECONDS.inc(elapsed, kind=kind)
+            if stats is not None:
+                entry = stats.setdefault(kind, [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+
+
+def build_default_registry():
+    registry = ShapeHandlerRegistry()
+    registry.register(MSO_SHAPE_TYPE.GROUP, GROUP)
+    registry.register(MSO_SHAPE_TYPE.PICTURE, PICTURE)
+    registry.register(MSO_SHAPE_TYPE.PLACEHOLDER, classify_placeholder)
+    # 没有文字的文本框可能带有可见的填充，按形状转换
+    registry.register(MSO_SHAPE_TYPE.TEXT_BOX, text_or_shape)
+    registry.register(MSO_SHAPE_TYPE.AUTO_SHAPE, labelled_or_shape)
+    registry.register(MSO_SHAPE_TYPE.FREEFORM, labelled_or_shape)
+    return registry
+
+
+# 两个转换器共用的默认分派表，可通过 register() 扩展
+SHAPE_REGISTRY = build_default_registry()
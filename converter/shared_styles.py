@@ -0,0 +1,123 @@
+"""
+共享样式
+收集整个演示文稿中重复出现的文本样式和填充样式，注册为 document.json 中的共享样式，
+图层通过 sharedStyleID 引用。Sketch 渲染时仍读取图层自身的 style，
+因此图层保留一份与共享样式一致的副本
+"""
+
+import copy
+from .object_ids import ObjectIdFactory
+
+# 至少被多少个图层使用才注册为共享样式
+MIN_SHARED_USES = 2
+
+ALIGNMENT_NAMES = {0: '左对齐', 1: '右对齐', 2: '居中', 3: '两端对齐'}
+
+
+def _color_key(color):
+    return tuple(round(color.get(channel, 0), 4) for channel in ('red', 'green', 'blue', 'alpha'))
+
+
+def _color_hex(color):
+    return ''.join(f"{int(round(color.get(channel, 0) * 255)):02X}" for channel in ('red', 'green', 'blue'))
+
+
+def _base_style():
+    return {"_class": "style", "endMarkerType": 0, "miterLimit": 10, "startMarkerType": 0, "windingRule": 1}
+
+
+def text_style(font_name, font_size, color, alignment):
+    """文本图层样式，与 attributedString 中的属性保持一致"""
+    style = _base_style()
+    style["textStyle"] = {
+        "_class": "textStyle",
+        "verticalAlignment": 0,
+        "encodedAttributes": {
+            "MSAttributedStringFontAttribute": {"_class": "fontDescriptor", "attributes": {"name": font_name, "size": font_size}},
+            "MSAttributedStringColorAttribute": color,
+            "paragraphStyle": {"_class": "paragraphStyle", "alignment": alignment},
+        },
+    }
+    return style
+
+
+def fill_style(color):
+    """纯色填充样式"""
+    style = _base_style()
+    style["fills"] = [{"_class": "fill", "isEnabled": True, "color": color, "fillType": 0}]
+    return style
+
+
+class SharedStyleRegistry:
+    """
+    样式驻留表
+
+    转换过程中登记每个图层的样式键，build() 时把使用次数达到阈值的样式提升为共享样式，
+    并回写图层的 sharedStyleID 与样式副本
+    """
+
+    def __init__(self, min_uses=MIN_SHARED_USES):
+        self.min_uses = min_uses
+        self._text_styles = {}
+        self._layer_styles = {}
+
+    def register_text(self, layer, font_name, font_size, color, alignment):
+        """登记文本图层，并为其设置内联文本样式"""
+        key = (font_name, font_size, _color_key(color), alignment)
+        entry = self._text_styles.get(key)
+        if entry is None:
+            name = f"Text/{font_name}/{font_size:g}pt/{_color_hex(color)}/{ALIGNMENT_NAMES.get(alignment, alignment)}"
+            entry = self._text_styles[key] = {
+                "name": name, "style": text_style(font_name, font_size, color, alignment), "layers": [],
+            }
+        entry["layers"].append(layer)
+        layer["style"] = copy.deepcopy(entry["style"])
+        return layer
+
+    def register_fill(self, layer, color):
+        """登记纯色填充图层，并为其设置内联填充样式"""
+        key = _color_key(color)
+        entry = self._layer_styles.get(key)
+        if entry is None:
+            entry = self._layer_styles[key] = {
+                "name": f"Fill/{_color_hex(color)}", "style": fill_style(color), "layers": [],
+            }
+        entry["layers"].append(layer)
+        layer["style"] = copy.deepcopy(entry["style"])
+        return layer
+
+    def forget(self, layers):
+        """移除已从图层树中删除的图层，它们不再计入使用次数"""
+        removed = {id(layer) for layer in layers}
+        if not removed:
+            return
+        for entries in (self._text_styles, self._layer_styles):
+            for entry in entries.values():
+                entry["layers"] = [layer for layer in entry["layers"] if id(layer) not in removed]
+
+    def _promote(self, entries, ids):
+        shared = []
+        for entry in entries.values():
+            layers = entry["layers"]
+            if len(layers) < self.min_uses:
+                continue
+            shared_id = ids.new(f"shared-style/{entry['name']}")
+            value = copy.deepcopy(entry["style"])
+            value["do_objectID"] = ids.new(f"shared-style-value/{entry['name']}")
+            shared.append({"_class": "sharedStyle", "do_objectID": shared_id, "name": entry["name"], "value": value})
+            for layer in layers:
+                layer["sharedStyleID"] = shared_id
+        return sorted(shared, key=lambda style: style["name"])
+
+    def build(self, ids=None):
+        """
+        生成共享样式
+
+        Args:
+            ids: ObjectIdFactory，缺省使用随机 ID
+
+        Returns:
+            tuple: (layerStyles 对象列表, layerTextStyles 对象列表)
+        """
+        ids = ids or ObjectIdFactory()
+        return self._promote(self._layer_styles, ids), self._promote(self._text_styles, ids)
@@ -0,0 +1,22 @@
+from django.db.models.signals import pre_delete, post_delete
+from django.dispatch import receiver
+from .models import ConversionTask
+from .retention import delete_files_on_commit
+from .cancellation import cancel_running
+from .coalescing import promote_follower
+from .scheduler import get_scheduler
+
+@receiver(pre_delete, sender=ConversionTask)
+def promote_follower_on_delete(sender, instance, **kwargs):
+    """删除仍在转换的主任务前，由合并到它的任务接替转换"""
+    if instance.status in ('pending', 'processing') and not instance.coalesced_with_id:
+        promote_follower(instance.pk)
+
+@receiver(post_delete, sender=ConversionTask)
+def delete_task_files_on_delete(sender, instance, **kwargs):
+    """任务删除后停止其转换并清理上传文件与输出文件"""
+    get_scheduler().cancel(instance.pk)
+    cancel_running(instance.pk, '任务已删除')
+    # 存储清理会自行删除文件（限速并计入报告）
+    if not getattr(instance, 'skip_file_cleanup', False):
+        delete_files_on_commit(instance)
@@ -0,0 +1,102 @@
+"""
+Sketch 符号
+母版与版式上的装饰元素（页脚、Logo、装饰条等）每个只转换一次，生成符号母版放在 Symbols 页面，
+各幻灯片画板通过 symbolInstance 引用
+"""
+
+import uuid
+
+SYMBOLS_PAGE_NAME = 'Symbols'
+# Symbols 页面上符号母版之间的纵向间距
+SYMBOL_SPACING = 100
+
+
+def _common_layer_properties():
+    return {
+        "booleanOperation": -1,
+        "isFixedToViewport": False,
+        "isFlippedHorizontal": False,
+        "isFlippedVertical": False,
+        "isLocked": False,
+        "isVisible": True,
+        "layerListExpandedType": 0,
+        "nameIsFixed": False,
+        "resizingConstraint": 63,
+        "resizingType": 0,
+        "rotation": 0,
+        "shouldBreakMaskChain": False,
+        "exportOptions": {"_class": "exportOptions", "includedLayerIds": [], "layerOptions": 0, "shouldTrim": False, "exportFormats": []},
+        "style": {"_class": "style", "endMarkerType": 0, "miterLimit": 10, "startMarkerType": 0, "windingRule": 1, "borders": [], "fills": [], "shadows": []},
+    }
+
+
+def _new_id():
+    return str(uuid.uuid4()).upper()
+
+
+def create_symbol_master(name, layers, width, height, index, object_id=None, symbol_id=None):
+    """
+    创建符号母版
+
+    Args:
+        name: 符号名称，"/" 分隔的路径在 Sketch 中显示为分组
+        layers: 符号内的图层
+        width, height: 符号尺寸（与幻灯片相同）
+        index: 在 Symbols 页面上的序号，用于纵向排列
+        object_id, symbol_id: 指定 ID，缺省随机生成
+    """
+    symbol = _common_layer_properties()
+    symbol.update({
+        "_class": "symbolMaster",
+        "do_objectID": object_id or _new_id(),
+        "name": name,
+        "frame": {"_class": "rect", "constrainProportions": False, "height": height, "width": width,
+                  "x": 0, "y": index * (height + SYMBOL_SPACING)},
+        "layers": layers,
+        "symbolID": symbol_id or _new_id(),
+        "allowsOverrides": True,
+        "overrideProperties": [],
+        "hasBackgroundColor": False,
+        "backgroundColor": {"_class": "color", "alpha": 1, "blue": 1, "green": 1, "red": 1},
+        "includeBackgroundColorInExport": True,
+        "includeBackgroundColorInInstance": False,
+        "includeInCloudUpload": True,
+        "isFlowHome": False,
+        "resizesContent": False,
+        "hasClippingMask": True,
+        "clippingMaskMode": 0,
+    })
+    return symbol
+
+
+def create_symbol_instance(symbol, name=None, object_id=None):
+    """创建覆盖整个画板的符号实例"""
+    frame = symbol["frame"]
+    instance = _common_layer_properties()
+    instance.update({
+        "_class": "symbolInstance",
+        "do_objectID": object_id or _new_id(),
+        "name": name or symbol["name"],
+        "frame": {"_class": "rect", "constrainProportions": False, "height": frame["height"], "width": frame["width"], "x": 0, "y": 0},
+        "symbolID": symbol["symbolID"],
+        "overrideValues": [],
+        "scale": 1,
+        "horizontalSpacing": 0,
+        "verticalSpacing": 0,
+    })
+    return instance
+
+
+def create_symbols_page(symbols, width, height, object_id=None):
+    """创建存放所有符号母版的 Symbols 页面"""
+    page = _common_layer_properties()
+    page.update({
+        "_class": "page",
+        "do_objectID": object_id or _new_id(),
+        "name": SYMBOLS_PAGE_NAME,
+        "frame": {"_class": "rect", "constrainProportions": False, "height": height, "width": width, "x": 0, "y": 0},
+        "clippingMaskMode": 0,
+        "hasClippingMask": False,
+        "layers": symbols,
+    })
+    return page
@@ -0,0 +1,316 @@
+"""
+数据库任务队列
+多节点部署时不依赖消息中间件，ConversionTask 表本身就是队列：
+- 工作进程用 SELECT ... FOR UPDATE SKIP LOCKED 领取 pending 任务（PostgreSQL），
+  不支持行锁的数据库（SQLite）退化为条件更新，同一任务只会被一个进程领取成功
+- 领取后持有可续期的租约，工作进程定期心跳续租
+- 节点崩溃后租约过期的任务重新入队，超过最大领取次数的任务标记失败
+领取到的任务交给本进程的 ConversionScheduler 执行，沿用其小任务预留线程与超时看门狗
+"""
+
+import os
+import time
+import uuid
+import socket
+import threading
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ConversionTask
+from .cancellation import get_active_token, CANCELLED_MESSAGE, LEASE_LOST_MESSAGE
+from .scheduler import ConversionScheduler, get_scheduler_settings
+from .coalescing import settle_stale_followers
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = {
+    'BACKEND': 'thread',          # thread: 上传进程内调度执行；database: 由 run_conversion_worker 进程领取执行
+    'LEASE_SECONDS': 60,          # 租约时长，心跳中断超过该时间的任务被其他节点接管
+    'HEARTBEAT_SECONDS': 15,      # 续租与回收过期租约的间隔
+    'POLL_SECONDS': 1.0,          # 队列为空时的轮询间隔
+    'MAX_ATTEMPTS': 3,            # 同一任务最多被领取的次数，防止导致进程崩溃的文件反复重试
+    'DRAIN_SECONDS': 30,          # 停止时等待执行中任务结束的时间
+}
+
+
+def get_queue_settings():
+    """合并默认配置与 settings.CONVERTER_QUEUE"""
+    config = DEFAULT_QUEUE.copy()
+    config.update(getattr(settings, 'CONVERTER_QUEUE', {}))
+    return config
+
+
+def uses_database_queue():
+    return get_queue_settings()['BACKEND'] == 'database'
+
+
+def new_worker_id():
+    """主机名、进程号加随机后缀，进程重启后不会沿用旧租约"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def claim_task(worker_id, lease_seconds, small_job_cost=None):
+    """
+    领取一个等待中的任务
+
+    Args:
+        worker_id: 租约持有者标识
+        lease_seconds: 租约时长
+        small_job_cost: 只领取预估成本不超过该值的任务
+
+    Returns:
+        ConversionTask 或 None
+    """
+    # 跟随任务由主任务的结果完成，不参与领取
+    queryset = ConversionTask.objects.filter(status='pending', cancel_requested=False, coalesced_with__isnull=True)
+    if small_job_cost is not None:
+        small = Q(estimated_cost__lte=small_job_cost)
+        if get_scheduler_settings()['DEFAULT_COST'] <= small_job_cost:
+            small |= Q(estimated_cost__isnull=True)
+        queryset = queryset.filter(small)
+
+    with transaction.atomic():
+        task_id = (
+            queryset.select_for_update(skip_locked=True)
+            .order_by('-priority', 'created_at')
+            .values_list('pk', flat=True)
+            .first()
+        )
+        if task_id is None:
+            return None
+        now = timezone.now()
+        # 条件更新保证没有行锁的数据库上也只有一个进程领取成功
+        claimed = ConversionTask.objects.filter(pk=task_id, status='pending').update(
+            status='processing',
+            lease_owner=worker_id,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+    if not claimed:
+        return None
+    return ConversionTask.objects.only('id', 'estimated_cost', 'priority', 'client_id', 'attempts').get(pk=task_id)
+
+
+def renew_leases(worker_id, task_ids, lease_seconds):
+    """为本进程持有的任务续租，返回已失去租约的任务 ID"""
+    if not task_ids:
+        return set()
+    now = timezone.now()
+    owned = ConversionTask.objects.filter(pk__in=task_ids, status='processing', lease_owner=worker_id)
+    owned.update(lease_expires_at=now + timedelta(seconds=lease_seconds), heartbeat_at=now)
+    renewed = {str(pk) for pk in owned.values_list('pk', flat=True)}
+    return {task_id for task_id in task_ids if str(task_id) not in renewed}
+
+
+def release_lease(task_id, worker_id):
+    """任务结束后释放租约"""
+    ConversionTask.objects.filter(pk=task_id, lease_owner=worker_id).update(
+        lease_owner='', lease_expires_at=None
+    )
+
+
+def requeue_expired(max_attempts):
+    """
+    回收租约已过期的任务：已请求取消的标记失败，未超过最大领取次数的重新入队，其余标记失败
+
+    Returns:
+        tuple: (重新入队数, 标记失败数)
+    """
+    now = timezone.now()
+    expired = ConversionTask.objects.filter(status='processing', lease_expires_at__lt=now)
+    released = {'lease_owner': '', 'lease_expires_at': None, 'updated_at': now}
+    failed = expired.filter(cancel_requested=True).update(
+        status='failed', error_message=CANCELLED_MESSAGE, **released
+    )
+    requeued = expired.filter(attempts__lt=max_attempts).update(status='pending', **released)
+    failed += expired.update(
+        status='failed', error_message='转换进程多次异常退出，任务已放弃', **released
+    )
+    if requeued or failed:
+        logger.warning(f"回收过期租约: 重新入队 {requeued} 个, 标记失败 {failed} 个")
+    return requeued, failed
+
+
+def requeue_owned(worker_id):
+    """进程退出前把仍持有租约的任务放回队列，由其他节点立即接手"""
+    now = timezone.now()
+    return ConversionTask.objects.filter(status='processing', lease_owner=worker_id).update(
+        status='pending', lease_owner='', lease_expires_at=None, updated_at=now
+    )
+
+
+def _abandon_local(task_id, reason):
+    """停止本进程内的转换，且不再写回任务状态"""
+    token = get_active_token(task_id)
+    if token:
+        token.abandoned = True
+        token.cancel(reason)
+
+
+class DatabaseQueueWorker:
+    """
+    数据库队列工作进程
+
+    主循环在本地调度器有空闲线程时领取任务；只剩预留线程空闲时只领取小任务。
+    心跳线程为执行中的任务续租，发现租约已被接管的任务立即停止，并回收其他节点的过期租约
+
+    Args:
+        small_only: 只领取小任务（预分叉进程池中预留给小任务的进程）
+        after_job: 每个任务结束后以任务 ID 调用，进程池据此统计并回收工作进程
+        on_abandon: 看门狗强制回收超时任务后调用（见 ConversionScheduler）
+    """
+
+    def __init__(self, worker_id=None, workers=None, runner=None, small_only=False, after_job=None,
+                 on_abandon=None):
+        config = get_queue_settings()
+        scheduler_config = get_scheduler_settings()
+        self.worker_id = worker_id or new_worker_id()
+        self.lease_seconds = config['LEASE_SECONDS']
+        self.heartbeat_seconds = config['HEARTBEAT_SECONDS']
+        self.poll_seconds = config['POLL_SECONDS']
+        self.max_attempts = config['MAX_ATTEMPTS']
+        self.drain_seconds = config['DRAIN_SECONDS']
+        self.runner = runner
+        self.small_only = small_only
+        self.after_job = after_job
+        self.scheduler = ConversionScheduler(
+            workers=workers or scheduler_config['WORKERS'],
+            reserved_small_workers=scheduler_config['RESERVED_SMALL_WORKERS'],
+            small_job_cost=scheduler_config['SMALL_JOB_COST'],
+            runner=self._run_job,
+            on_abandon=on_abandon,
+        )
+        self._stopping = threading.Event()
+        # 本进程已领取、尚未释放租约的任务
+        self._leased = set()
+        self._leased_lock = threading.Lock()
+        self.jobs_claimed = 0
+
+    def _run_job(self, task_id, cancel_token=None):
+        # 令牌轮询数据库时同时检查租约，结果只在仍持有租约时写回
+        if cancel_token is not None:
+            cancel_token.lease_owner = self.worker_id
+        try:
+            if self.runner:
+                return self.runner(task_id, cancel_token=cancel_token)
+            from .utils import convert_ppt_to_sketch_async
+            return convert_ppt_to_sketch_async(task_id, cancel_token=cancel_token)
+        finally:
+            # 租约已被其他节点接管时持有者已变化，这里不会误释放
+            release_lease(task_id, self.worker_id)
+            with self._leased_lock:
+                self._leased.discard(str(task_id))
+            if self.after_job:
+                self.after_job(task_id)
+
+    def _free_capacity(self):
+        """返回 (是否有空闲线程, 是否只剩预留给小任务的线程)"""
+        stats = self.scheduler.stats()
+        busy = stats['queued'] + stats['in_flight']
+        general = self.scheduler.workers - self.scheduler.reserved_small_workers
+        return busy < self.scheduler.workers, busy >= general
+
+    def claim_once(self):
+        """有空闲线程时领取一个任务并提交到本地调度器，返回是否领取成功"""
+        has_capacity, small_only = self._free_capacity()
+        if not has_capacity:
+            return False
+        task = claim_task(
+            self.worker_id, self.lease_seconds,
+            small_job_cost=self.scheduler.small_job_cost if small_only or self.small_only else None,
+        )
+        if task is None:
+            return False
+        with self._leased_lock:
+            self._leased.add(str(task.pk))
+        self.jobs_claimed += 1
+        logger.info(f"领取任务: {task.pk} (第 {task.attempts} 次, 工作进程 {self.worker_id})")
+        self.scheduler.submit(task.pk, cost=task.estimated_cost, priority=task.priority, client_id=task.client_id)
+        return True
+
+    def heartbeat(self):
+        """续租并回收其他节点的过期租约"""
+        with self._leased_lock:
+            leased = set(self._leased)
+        for task_id in renew_leases(self.worker_id, leased, self.lease_seconds):
+            logger.warning(f"任务租约已失效: {task_id}")
+            _abandon_local(task_id, LEASE_LOST_MESSAGE)
+            with self._leased_lock:
+                self._leased.discard(task_id)
+        requeue_expired(self.max_attempts)
+        settle_stale_followers()
+
+    def _heartbeat_loop(self):
+        while not self._stopping.wait(self.heartbeat_seconds):
+            try:
+                self.heartbeat()
+            except Exception as e:
+                logger.error(f"租约心跳失败: {e}", exc_info=True)
+
+    def run(self):
+        """运行到 stop() 被调用"""
+        logger.info(f"数据库队列工作进程启动: {self.worker_id} ({self.scheduler.workers} 个工作线程)")
+        requeue_expired(self.max_attempts)
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name='conversion-lease-heartbeat', daemon=True)
+        heartbeat.start()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    claimed = self.claim_once()
+                except Exception as e:
+                    logger.error(f"领取任务失败: {e}", exc_info=True)
+                    claimed = False
+                if not claimed:
+                    self._stopping.wait(self.poll_seconds)
+        finally:
+            self._drain()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _drain(self):
+        """停止领取后等待执行中的任务结束，超时仍未结束的任务放回队列"""
+        with self._leased_lock:
+            leased = list(self._leased)
+        for task_id in leased:
+            # 还在本地排队的任务直接放回队列
+            if self.scheduler.cancel(task_id):
+                with self._leased_lock:
+                    self._leased.discard(task_id)
+        deadline = time.monotonic() + self.drain_seconds
+        while time.monotonic() < deadline:
+            with self._leased_lock:
+                if not self._leased:
+                    break
+            time.sleep(0.2)
+        with self._leased_lock:
+            remaining = list(self._leased)
+        for task_id in remaining:
+            _abandon_local(task_id, LEASE_LOST_MESSAGE)
+        requeued = requeue_owned(self.worker_id)
+        logger.info(f"数据库队列工作进程退出: {self.worker_id}，放回队列 {requeued} 个任务")
+
+
+def run_worker(workers=None, worker_id=None, write=print):
+    """运行数据库队列工作进程直到收到 SIGTERM / SIGINT，返回领取的任务数"""
+    import signal
+
+    worker = DatabaseQueueWorker(worker_id=worker_id, workers=workers)
+
+    def stop(signum, frame):
+        write(f"收到信号 {signum}，停止领取新任务")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    metrics.start_flusher()
+    write(f"工作进程 {worker.worker_id} 开始领取任务")
+    worker.run()
+    write(f"工作进程 {worker.worker_id} 已退出，共领取 {worker.jobs_claimed} 个任务")
+    return worker.jobs_claimed
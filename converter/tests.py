@@ -1,3 +1,457 @@
-from django.test import TestCase
+# 旧版 python-pptx 在 3.10+ 上依赖 collections.abc 已被导入
+import collections.abc  # noqa: F401
+import io
+import os
+import json
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from pptx import Presentation
+from pptx.enum.shapes import MSO_SHAPE
+from pptx.util import Inches, Pt
+from PIL import Image
+
+from . import metrics
+from .enhanced_converter import EnhancedPPTToSketchConverter
+from .geometry import SlideGeometry
+from .cancellation import CancelToken, ConversionCancelled, LEASE_LOST_MESSAGE
+from .layer_optimizer import LayerTreeOptimizer
+from .models import ConversionTask, UploadSession
+from .preflight import PreflightError, inspect_presentation
+from .task_queue import claim_task, release_lease, renew_leases, requeue_expired
+from .uploads import chunk_path
+from .utils import PPTToSketchConverter, convert_ppt_to_sketch_async
+
+
+def _pptx_bytes():
+    presentation = Presentation()
+    slide = presentation.slides.add_slide(presentation.slide_layouts[6])
+    slide.shapes.add_textbox(Inches(1), Inches(1), Inches(3), Inches(1)).text_frame.text = '租约测试'
+    output = io.BytesIO()
+    presentation.save(output)
+    return output.getvalue()
+
+
+class LeaseTestCase(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.task = ConversionTask.objects.create(status='pending')
+        self.task.ppt_file.save('lease.pptx', ContentFile(_pptx_bytes()))
+
+    def outputs(self):
+        """MEDIA_ROOT 下保存的输出文件"""
+        return [
+            name for folder in ('outputs/sketch', 'outputs/previews')
+            if os.path.isdir(os.path.join(self.media_root, folder))
+            for name in os.listdir(os.path.join(self.media_root, folder))
+        ]
+
+    def expire(self):
+        ConversionTask.objects.filter(pk=self.task.pk).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+
+class LeaseQueueTests(LeaseTestCase):
+    def test_claim_sets_lease(self):
+        claimed = claim_task('worker-a', 60)
+        self.assertEqual(claimed.pk, self.task.pk)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'processing')
+        self.assertEqual(self.task.lease_owner, 'worker-a')
+        self.assertEqual(self.task.attempts, 1)
+        self.assertIsNone(claim_task('worker-b', 60))
+
+    def test_expired_lease_is_requeued_and_reclaimed(self):
+        claim_task('worker-a', 60)
+        self.expire()
+        self.assertEqual(requeue_expired(max_attempts=3), (1, 0))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'pending')
+        self.assertEqual(self.task.lease_owner, '')
+
+        self.assertEqual(claim_task('worker-b', 60).pk, self.task.pk)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.lease_owner, 'worker-b')
+        self.assertEqual(self.task.attempts, 2)
+        # 旧持有者既不能续租，也不能释放新持有者的租约
+        self.assertEqual(renew_leases('worker-a', {str(self.task.pk)}, 60), {str(self.task.pk)})
+        release_lease(self.task.pk, 'worker-a')
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.lease_owner, 'worker-b')
+
+    def test_expired_lease_fails_after_max_attempts(self):
+        claim_task('worker-a', 60)
+        self.expire()
+        self.assertEqual(requeue_expired(max_attempts=1), (0, 1))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'failed')
+
+    def test_token_detects_lost_lease(self):
+        claim_task('worker-a', 60)
+        ConversionTask.objects.filter(pk=self.task.pk).update(lease_owner='worker-b')
+        token = CancelToken(task_id=self.task.pk, lease_owner='worker-a')
+        with self.assertRaises(ConversionCancelled) as raised:
+            token.check()
+        self.assertEqual(raised.exception.reason, LEASE_LOST_MESSAGE)
+        self.assertTrue(token.abandoned)
+
+
+class LeaseFinishTests(LeaseTestCase):
+    def convert(self, worker_id, during=None):
+        """以 worker_id 的租约执行转换，during 在转换结束、写回结果之前调用"""
+        original = PPTToSketchConverter.convert_ppt_to_sketch
+
+        def convert(converter, *args, **kwargs):
+            path = original(converter, *args, **kwargs)
+            if during:
+                during()
+            return path
+
+        # 轮询间隔足够长，模拟令牌最后一次检查之后才发生的接管
+        token = CancelToken(task_id=self.task.pk, poll_interval=3600, lease_owner=worker_id)
+        with mock.patch.object(PPTToSketchConverter, 'convert_ppt_to_sketch', convert):
+            return convert_ppt_to_sketch_async(self.task.pk, cancel_token=token)
+
+    def test_owner_writes_result(self):
+        claim_task('worker-a', 60)
+        self.assertTrue(self.convert('worker-a'))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'completed')
+        self.assertTrue(self.task.sketch_file)
+        self.assertEqual(self.task.lease_owner, 'worker-a')
+
+    def test_stale_finish_is_dropped(self):
+        claim_task('worker-a', 60)
+
+        def reclaimed():
+            # 旧租约过期，任务重新入队并被 worker-b 领取，随后用户请求取消
+            self.expire()
+            requeue_expired(max_attempts=3)
+            claim_task('worker-b', 60)
+            ConversionTask.objects.filter(pk=self.task.pk).update(cancel_requested=True)
+
+        self.assertFalse(self.convert('worker-a', during=reclaimed))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'processing')
+        self.assertEqual(self.task.lease_owner, 'worker-b')
+        self.assertTrue(self.task.cancel_requested)
+        self.assertFalse(self.task.sketch_file)
+        self.assertFalse(self.task.preview_file)
+        self.assertEqual(self.outputs(), [])
+
+    def test_stale_worker_does_not_restart_reclaimed_task(self):
+        claim_task('worker-a', 60)
+        ConversionTask.objects.filter(pk=self.task.pk).update(lease_owner='worker-b')
+        self.assertFalse(self.convert('worker-a'))
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'processing')
+        self.assertEqual(self.task.lease_owner, 'worker-b')
+        self.assertIsNone(self.task.error_message)
+
+
+class MultiprocessMetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        config = override_settings(CONVERTER_METRICS={'MULTIPROCESS_DIR': self.directory})
+        config.enable()
+        self.addCleanup(config.disable)
+
+    def write(self, pid, data):
+        with open(os.path.join(self.directory, f"{pid}.json"), 'w') as f:
+            json.dump({'pid': pid, 'metrics': data}, f)
+
+    def sample(self, output, name):
+        for line in output.splitlines():
+            if line.startswith(name + ' '):
+                return float(line.split()[-1])
+        return None
+
+    def test_render_sums_other_processes(self):
+        before = self.sample(metrics.render(), 'ppt_sketch_slides_processed_total') or 0
+        in_flight = self.sample(metrics.render(), 'ppt_sketch_jobs_in_flight')
+        # 父进程代表存活的工作进程，不存在的进程号代表已回收的子进程
+        self.write(os.getppid(), {
+            metrics.SLIDES_PROCESSED.name: [[[], 5]],
+            metrics.JOBS_IN_FLIGHT.name: [[[], 2]],
+        })
+        self.write(2 ** 22 + 1, {
+            metrics.SLIDES_PROCESSED.name: [[[], 3]],
+            metrics.JOBS_IN_FLIGHT.name: [[[], 4]],
+        })
+        output = metrics.render()
+        self.assertEqual(self.sample(output, 'ppt_sketch_slides_processed_total'), before + 8)
+        self.assertEqual(self.sample(output, 'ppt_sketch_jobs_in_flight'), in_flight + 2)
+
+    def test_snapshot_excludes_database_gauges(self):
+        metrics.SLIDES_PROCESSED.inc()
+        self.assertTrue(metrics.write_snapshot())
+        with open(os.path.join(self.directory, f"{os.getpid()}.json")) as f:
+            data = json.load(f)['metrics']
+        self.assertIn(metrics.SLIDES_PROCESSED.name, data)
+        self.assertNotIn(metrics.TASKS.name, data)
+        # 本进程的快照不会与内存中的值重复计入
+        self.assertEqual(metrics.read_snapshots(self.directory), {})
+
+
+@override_settings(CONVERTER_ADMISSION={'MAX_ACTIVE_PER_CLIENT': 1, 'MIN_FREE_DISK_MB': None})
+class AdmissionTests(TestCase):
+    def test_client_limit_ignores_client_id_header(self):
+        ConversionTask.objects.create(status='pending', client_id='first', client_addr='10.0.0.1')
+        response = self.client.post(
+            reverse('converter:upload-create'), {'filename': 'deck.pptx', 'total_size': 1024},
+            content_type='application/json', REMOTE_ADDR='10.0.0.1', HTTP_X_CLIENT_ID='rotated',
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_malformed_content_length_is_rejected(self):
+        response = self.client.post(reverse('converter:task-list-create'), CONTENT_LENGTH='abc', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 400)
+
+
+class TaskListQueryTests(TestCase):
+    def test_list_api_uses_single_query(self):
+        leader = ConversionTask.objects.create(status='processing', ppt_file='uploads/ppt/leader.pptx')
+        for index in range(5):
+            ConversionTask.objects.create(
+                status='processing', ppt_file=f'uploads/ppt/follower{index}.pptx', coalesced_with=leader,
+            )
+        # 列表投影缺少序列化器用到的列时，每一行都会多一次延迟加载查询
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('converter:task-list-create'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 6)
+
+
+@override_settings(CONVERTER_ADMISSION={'MAX_ACTIVE_PER_CLIENT': None, 'MIN_FREE_DISK_MB': None})
+class UploadCompleteTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        patcher = mock.patch('converter.views.start_conversion')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, data):
+        response = self.client.post(
+            reverse('converter:upload-create'), {'filename': 'deck.pptx', 'total_size': len(data)},
+            content_type='application/json',
+        )
+        session_id = response.json()['id']
+        self.client.put(
+            reverse('converter:upload-detail', args=[session_id]), data,
+            content_type='application/octet-stream', HTTP_CONTENT_RANGE=f'bytes 0-{len(data) - 1}/{len(data)}',
+        )
+        return UploadSession.objects.get(pk=session_id)
+
+    def complete(self, session):
+        return self.client.post(reverse('converter:upload-complete', args=[session.pk]), {}, content_type='application/json')
+
+    def test_double_complete_returns_same_task(self):
+        session = self.upload(_pptx_bytes())
+        first = self.complete(session)
+        second = self.complete(session)
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(ConversionTask.objects.count(), 1)
+
+    def test_concurrent_complete_keeps_claimed_session(self):
+        session = self.upload(_pptx_bytes())
+        # 模拟另一个完成请求已认领会话、正在检查文件
+        UploadSession.objects.filter(pk=session.pk).update(status='completing')
+        response = self.complete(session)
+        self.assertEqual(response.status_code, 409)
+        self.assertTrue(UploadSession.objects.filter(pk=session.pk, status='completing').exists())
+        self.assertTrue(os.path.exists(chunk_path(session)))
+        self.assertEqual(ConversionTask.objects.count(), 0)
+
+    def test_invalid_upload_marks_session_failed(self):
+        session = self.upload(b'not a presentation')
+        response = self.complete(session)
+        self.assertEqual(response.status_code, 400)
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'failed')
+        self.assertFalse(os.path.exists(chunk_path(session)))
+        self.assertEqual(self.complete(session).status_code, 409)
+
+
+class PreflightContentTypeTests(TestCase):
+    def repackage(self, old, new):
+        """替换 [Content_Types].xml 中主部件的内容类型"""
+        source = zipfile.ZipFile(io.BytesIO(_pptx_bytes()))
+        output = io.BytesIO()
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+            for item in source.infolist():
+                data = source.read(item.filename)
+                if item.filename == '[Content_Types].xml':
+                    data = data.replace(old.encode(), new.encode())
+                target.writestr(item, data)
+        return io.BytesIO(output.getvalue())
+
+    def test_slideshow_is_rejected(self):
+        main = 'presentationml.presentation.main+xml'
+        deck = self.repackage(main, 'presentationml.slideshow.main+xml')
+        # python-pptx 同样拒绝打开，预检必须在入队前拦截
+        with self.assertRaises(ValueError):
+            Presentation(deck)
+        deck.seek(0)
+        with self.assertRaises(PreflightError):
+            inspect_presentation(deck)
+        self.assertEqual(inspect_presentation(self.repackage(main, main))['slide_count'], 1)
+
+
+class LayerOptimizerPaintTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def page_layers(self, sketch_path):
+        with zipfile.ZipFile(sketch_path) as archive:
+            page = next(name for name in archive.namelist() if name.startswith('pages/'))
+            artboard = json.loads(archive.read(page))['layers'][0]
+        return {layer['name']: layer for layer in artboard['layers']}
+
+    def test_theme_filled_autoshape_survives_optimization(self):
+        presentation = Presentation()
+        slide = presentation.slides.add_slide(presentation.slide_layouts[6])
+        # 未设置填充的自选图形使用 p:style 中的主题填充
+        slide.shapes.add_shape(MSO_SHAPE.OVAL, Inches(1), Inches(1), Inches(2), Inches(2))
+        outlined = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, Inches(4), Inches(1), Inches(2), Inches(2))
+        outlined.fill.background()
+        path = os.path.join(self.directory, 'theme.pptx')
+        presentation.save(path)
+
+        converter = EnhancedPPTToSketchConverter(optimize_layers=True)
+        layers = self.page_layers(converter.convert_ppt_to_sketch_enhanced(path, self.directory))
+        self.assertEqual(layers['Element_1']['_class'], 'shapePath')
+        self.assertTrue(layers['Element_1']['style']['fills'])
+        # 无填充的形状描边没有被转换，不能按不可见删除
+        self.assertIn('Element_2', layers)
+
+    def test_disabled_paint_is_removed(self):
+        frame = {'x': 0, 'y': 0, 'width': 10, 'height': 10}
+        disabled = {'_class': 'rectangle', 'frame': frame, 'style': {'fills': [{'isEnabled': False, 'fillType': 0}]}}
+        unstyled = {'_class': 'rectangle', 'frame': frame, 'style': {'fills': []}}
+        optimizer = LayerTreeOptimizer()
+        self.assertEqual(optimizer.optimize_layers([disabled, unstyled], 100, 100), [unstyled])
+
+
+class FastPathParityTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def build_deck(self):
+        presentation = Presentation()
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        # 占位符没有 xfrm，几何继承自版式和母版
+        slide.shapes.title.text = '一致性'
+        slide.placeholders[1].text = '正文'
+
+        outer = slide.shapes.add_group_shape()
+        inner = outer.shapes.add_group_shape()
+        inner.shapes.add_shape(MSO_SHAPE.RECTANGLE, Inches(1), Inches(4), Inches(1), Inches(1))
+        inner.shapes.add_shape(MSO_SHAPE.OVAL, Inches(2), Inches(5), Inches(1), Inches(1))
+        outer.shapes.add_shape(MSO_SHAPE.RECTANGLE, Inches(4), Inches(4), Inches(1), Inches(1))
+        # ext 与 chExt 不同即为缩放组：内层水平缩小一半，外层垂直放大 1.5 倍
+        inner._element.grpSpPr.xfrm.ext.cx //= 2
+        outer._element.grpSpPr.xfrm.ext.cy = outer._element.grpSpPr.xfrm.ext.cy * 3 // 2
+
+        image = io.BytesIO()
+        Image.new('RGB', (8, 8), (200, 10, 10)).save(image, 'PNG')
+        image.seek(0)
+        slide.shapes.add_picture(image, Inches(6), Inches(1), Inches(1), Inches(1))
+        table = slide.shapes.add_table(2, 2, Inches(5), Inches(5), Inches(3), Inches(1)).table
+        table.cell(0, 0).text = '表头'
+        table.cell(1, 1).text = '数据'
+
+        path = os.path.join(self.directory, 'parity.pptx')
+        presentation.save(path)
+        return path
+
+    def convert(self, path, fast_path):
+        output_dir = os.path.join(self.directory, 'fast' if fast_path else 'reference')
+        os.makedirs(output_dir)
+        converter = PPTToSketchConverter(deterministic_ids=True, fast_path=fast_path)
+        with open(converter.convert_ppt_to_sketch(path, output_dir), 'rb') as f:
+            return f.read()
+
+    def test_fast_path_matches_python_pptx(self):
+        path = self.build_deck()
+        # 快速路径不能悄悄回退到 python-pptx，否则比较的是同一条路径
+        with mock.patch('converter.utils.Presentation', side_effect=AssertionError('回退到了 python-pptx')):
+            fast = self.convert(path, fast_path=True)
+        self.assertEqual(fast, self.convert(path, fast_path=False))
+
+
+class SlideGeometryTests(TestCase):
+    def setUp(self):
+        presentation = Presentation()
+        self.shapes = presentation.slides.add_slide(presentation.slide_layouts[6]).shapes
+
+    def place(self, shape, x, y, width, height, child_offset=None, child_extent=None):
+        """以点为单位设置 a:off / a:ext，组还设置子坐标空间 a:chOff / a:chExt"""
+        shape.left, shape.top, shape.width, shape.height = Pt(x), Pt(y), Pt(width), Pt(height)
+        if child_extent:
+            xfrm = shape._element.grpSpPr.get_or_add_xfrm()
+            xfrm.chOff.x, xfrm.chOff.y = Pt(child_offset[0]), Pt(child_offset[1])
+            xfrm.chExt.cx, xfrm.chExt.cy = Pt(child_extent[0]), Pt(child_extent[1])
+
+    def assertBox(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected):
+            self.assertAlmostEqual(a, e, places=6)
+
+    def test_scaled_group(self):
+        group = self.shapes.add_group_shape()
+        child = group.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, Pt(1), Pt(1))
+        # 子坐标空间 100x100 映射到 200x100：水平放大 2 倍
+        self.place(group, 100, 100, 200, 100, child_offset=(0, 0), child_extent=(100, 100))
+        self.place(child, 50, 20, 50, 50)
+
+        geometry = SlideGeometry(self.shapes)
+        frame, rotation, flip_h, flip_v = geometry.frame(child)
+        self.assertBox(frame, (100, 20, 100, 50))
+        self.assertEqual((rotation, flip_h, flip_v), (0, False, False))
+        self.assertBox(geometry.bounds(group), (100, 100, 300, 200))
+        self.assertBox(geometry.bounds(child), (200, 120, 300, 170))
+
+    def test_nested_scaled_group_with_rotation_and_flip(self):
+        outer = self.shapes.add_group_shape()
+        inner = outer.shapes.add_group_shape()
+        child = inner.shapes.add_shape(MSO_SHAPE.RECTANGLE, 0, 0, Pt(1), Pt(1))
+        # 外层水平放大 2 倍并顺时针旋转 90 度，内层再水平放大 2 倍并水平翻转
+        self.place(outer, 0, 0, 400, 200, child_offset=(0, 0), child_extent=(200, 200))
+        outer.rotation = 90
+        self.place(inner, 100, 0, 100, 100, child_offset=(0, 0), child_extent=(50, 100))
+        inner._element.grpSpPr.xfrm.set('flipH', '1')
+        self.place(child, 0, 0, 25, 50)
+
+        geometry = SlideGeometry(self.shapes)
+        frame, rotation, flip_h, flip_v = geometry.frame(inner)
+        self.assertBox(frame, (200, 0, 200, 100))
+        self.assertEqual((rotation, flip_h, flip_v), (0, True, False))
+        frame, rotation, flip_h, flip_v = geometry.frame(child)
+        self.assertBox(frame, (0, 0, 100, 50))
+        self.assertEqual(geometry.frame(outer)[1], 90)
+
+        self.assertBox(geometry.bounds(outer), (100, -100, 300, 300))
+        self.assertBox(geometry.bounds(inner), (200, 100, 300, 300))
+        # 翻转把子形状映射到内层组的右侧，再随外层组旋转到下方
+        self.assertBox(geometry.bounds(child), (250, 200, 300, 300))
@@ -0,0 +1,221 @@
+"""
+分块上传存储
+分块按偏移顺序直接追加到磁盘临时文件，同时增量计算 SHA-256，
+整个上传过程内存占用只与单次读取的缓冲区大小有关。
+每个请求先把分块写到自己的暂存文件，在数据库中认领偏移成功后才追加到会话文件，
+同一偏移的并发请求只有一个生效，另一个的数据不会混入文件或哈希
+"""
+
+import os
+import uuid
+import shutil
+import hashlib
+import threading
+import logging
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 分块临时文件目录（相对 MEDIA_ROOT）
+CHUNK_DIR = 'uploads/chunks'
+# 从请求流读取的缓冲区大小
+READ_BUFFER_SIZE = 64 * 1024
+
+
+class UploadOffsetError(Exception):
+    """分块偏移与服务器已接收的字节数不一致"""
+
+    def __init__(self, expected_offset):
+        super().__init__(f"分块偏移不匹配，应从 {expected_offset} 开始")
+        self.expected_offset = expected_offset
+
+
+class UploadHashMismatch(Exception):
+    """客户端提供的校验和与服务器计算结果不一致"""
+
+
+# 进程内的增量哈希状态: session_id -> (已哈希字节数, hasher)
+# 续传请求落到其他进程时会从磁盘重建
+_hashers = {}
+_hashers_lock = threading.Lock()
+
+
+def get_upload_settings():
+    """分块上传相关配置"""
+    return {
+        'chunk_size': getattr(settings, 'CONVERTER_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024),
+        'max_bytes': getattr(settings, 'CONVERTER_UPLOAD_MAX_BYTES', 500 * 1024 * 1024),
+    }
+
+
+def chunk_path(session):
+    """会话对应的磁盘临时文件路径"""
+    return os.path.join(settings.MEDIA_ROOT, CHUNK_DIR, f"{session.id}.part")
+
+
+def _hash_file_prefix(path, length):
+    """从磁盘重建前 length 字节的哈希状态"""
+    hasher = hashlib.sha256()
+    remaining = length
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            block = f.read(min(READ_BUFFER_SIZE, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+    return hasher
+
+
+def _get_hasher(session, path):
+    """取得与已接收偏移一致的哈希状态的副本，认领偏移成功后才发布"""
+    with _hashers_lock:
+        state = _hashers.get(session.id)
+    if state and state[0] == session.received_bytes:
+        return state[1].copy()
+    return _hash_file_prefix(path, session.received_bytes) if session.received_bytes else hashlib.sha256()
+
+
+def _spool_chunk(stream, length, spool, hasher):
+    """
+    把请求流中的分块读到暂存文件，返回读到的字节数。
+    客户端中途断开时返回已读到的部分，由调用方按短读处理
+    """
+    written = 0
+    while written < length:
+        try:
+            block = stream.read(min(READ_BUFFER_SIZE, length - written))
+        except OSError as e:
+            # UnreadablePostError 等连接中断
+            logger.warning(f"读取上传分块中断: {e}")
+            break
+        if not block:
+            break
+        spool.write(block)
+        hasher.update(block)
+        written += len(block)
+    spool.flush()
+    return written
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    将请求流中的分块写入临时文件
+
+    Args:
+        session: UploadSession
+        offset: 分块起始偏移，必须等于已接收字节数
+        stream: 可 read() 的请求流
+        length: 分块长度
+
+    Returns:
+        int: 写入后的已接收字节数。连接中断时已读到的部分仍会保留，客户端可从新的偏移续传
+
+    Raises:
+        UploadOffsetError: 偏移不等于已接收字节数，或同一偏移已被并发请求认领
+    """
+    if offset != session.received_bytes:
+        raise UploadOffsetError(session.received_bytes)
+
+    path = chunk_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    hasher = _get_hasher(session, path)
+    spool_path = f"{path}.{uuid.uuid4().hex}.spool"
+    try:
+        with open(spool_path, 'w+b') as spool:
+            written = _spool_chunk(stream, length, spool, hasher)
+            if not written:
+                session.refresh_from_db(fields=['received_bytes'])
+                return session.received_bytes
+            new_offset = offset + written
+            with transaction.atomic():
+                # 认领偏移：条件更新持有行锁（SQLite 为写锁）直到事务结束，
+                # 只有认领成功的请求会修改会话文件，追加失败时认领随事务回滚
+                _record_offset(session, offset, new_offset)
+                spool.seek(0)
+                with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+                    # 丢弃上次中断时可能残留的、未确认的数据
+                    f.seek(offset)
+                    f.truncate()
+                    shutil.copyfileobj(spool, f, READ_BUFFER_SIZE)
+    finally:
+        try:
+            os.remove(spool_path)
+        except FileNotFoundError:
+            pass
+
+    with _hashers_lock:
+        _hashers[session.id] = (new_offset, hasher)
+    session.received_bytes = new_offset
+    return new_offset
+
+
+def _record_offset(session, old_offset, new_offset):
+    """条件更新已接收字节数，防止并发请求互相覆盖"""
+    from .models import UploadSession
+
+    updated = UploadSession.objects.filter(
+        pk=session.pk, received_bytes=old_offset
+    ).update(received_bytes=new_offset, updated_at=timezone.now())
+    if not updated:
+        session.refresh_from_db(fields=['received_bytes'])
+        raise UploadOffsetError(session.received_bytes)
+
+
+def finalize_upload(session, expected_hash=None):
+    """
+    校验完整性，计算最终哈希并把临时文件移动到上传目录
+
+    Args:
+        session: UploadSession
+        expected_hash: 客户端提供的 SHA-256，不一致时丢弃已上传数据
+
+    Returns:
+        tuple: (存储文件名, SHA-256 十六进制摘要)
+    """
+    path = chunk_path(session)
+    if session.received_bytes != session.total_size or not os.path.exists(path):
+        raise UploadOffsetError(session.received_bytes)
+
+    with _hashers_lock:
+        state = _hashers.pop(session.id, None)
+    if state and state[0] == session.total_size:
+        content_hash = state[1].hexdigest()
+    else:
+        content_hash = _hash_file_prefix(path, session.total_size).hexdigest()
+
+    if expected_hash and expected_hash.lower() != content_hash:
+        reset_upload(session)
+        raise UploadHashMismatch('文件校验和不一致，请重新上传')
+
+    name = default_storage.generate_filename(f"uploads/ppt/{session.filename}")
+    name = default_storage.get_available_name(name)
+    target_path = default_storage.path(name)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    os.replace(path, target_path)
+    return name, content_hash
+
+
+def reset_upload(session):
+    """清空已上传数据，让客户端从头重传"""
+    from .models import UploadSession
+
+    discard_upload(session)
+    UploadSession.objects.filter(pk=session.pk).update(received_bytes=0)
+    session.received_bytes = 0
+
+
+def discard_upload(session):
+    """删除会话临时文件，返回释放的字节数"""
+    with _hashers_lock:
+        _hashers.pop(session.id, None)
+    path = chunk_path(session)
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
@@ -6,9 +6,19 @@ app_name = 'converter'
 urlpatterns = [
     # API 端点
     path('api/tasks/', views.ConversionTaskListCreateView.as_view(), name='task-list-create'),
-    path('api/tasks/<uuid:pk>/', views.ConversionTaskDetailView.as_view(), name='task-detail'),
+    path('api/tasks/<uuid:pk>/', views.task_detail, name='task-detail'),
+    path('api/tasks/<uuid:task_id>/status/', views.task_status, name='task-status'),
     path('api/tasks/<uuid:task_id>/download/', views.download_sketch_file, name='download-sketch'),
+    path('api/tasks/<uuid:task_id>/manifest/', views.task_output_manifest, name='task-manifest'),
+    path('api/tasks/<uuid:task_id>/thumbnail/', views.task_thumbnail, name='task-thumbnail'),
+    path('api/tasks/<uuid:task_id>/cancel/', views.cancel_conversion_task, name='cancel-task'),
     path('api/tasks/<uuid:task_id>/delete/', views.delete_conversion_task, name='delete-task'),
+    path('api/uploads/', views.create_upload_session, name='upload-create'),
+    path('api/uploads/<uuid:session_id>/', views.upload_session_detail, name='upload-detail'),
+    path('api/uploads/<uuid:session_id>/complete/', views.complete_upload_session, name='upload-complete'),
+    
+    # 监控
+    path('metrics', views.metrics_view, name='metrics'),
     
     # 前端页面
     path('', views.index_view, name='index'),
@@ -5,12 +5,27 @@ from pathlib import Path
 from pptx import Presentation
 from pptx.dml.color import RGBColor
 from pptx.enum.text import PP_ALIGN, MSO_ANCHOR
+from pptx.enum.dml import MSO_FILL
 from pptx.enum.shapes import MSO_SHAPE_TYPE
 from PIL import Image
 import uuid
+import time
+import hashlib
 import logging
 import io
 import base64
+from contextlib import contextmanager
+from .cancellation import ConversionCancelled, CancelToken, LEASE_LOST_MESSAGE, register_token, unregister_token
+from . import metrics
+from .shared_styles import SharedStyleRegistry
+from .layer_optimizer import LayerTreeOptimizer
+from .symbols import create_symbol_master, create_symbol_instance, create_symbols_page
+from .object_ids import ObjectIdFactory, file_sha256
+from .shape_handlers import SHAPE_REGISTRY, GROUP, PICTURE, TEXT, SHAPE, LABELLED
+from .ooxml_reader import OOXMLPresentation, PartRecord
+from .geometry import SlideGeometry
+from .presets import preset_path
+from .output_manifest import DEFAULT_OUTPUT, IMAGES, summary as manifest_summary
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +34,49 @@ class PPTToSketchConverter:
     PPT转Sketch转换器 - 简化版，无缩放逻辑
     """
     
-    def __init__(self, verbose=False):
+    def __init__(self, verbose=False, cancel_token=None, deterministic_ids=False, fast_path=False,
+                 optimize_layers=False, output_settings=None):
         """
         初始化转换器
+        
+        Args:
+            verbose: 详细日志
+            cancel_token: 可选的 CancelToken，在幻灯片和形状之间检查取消与超时
+            deterministic_ids: 按源文件哈希和对象路径生成 ID，相同输入得到逐字节相同的输出
+            fast_path: 用 OOXMLPresentation 直接解析 XML，失败时回退到 python-pptx
+            optimize_layers: 序列化前优化图层树，删除不可见、画板外和被完全遮挡的图层，展平平凡组
+            output_settings: 输出预算与清单配置（见 output_manifest.DEFAULT_OUTPUT）
         """
         self.verbose = verbose
+        self.cancel_token = cancel_token
+        self.deterministic_ids = deterministic_ids
+        self.fast_path = fast_path
+        self.optimizer = LayerTreeOptimizer() if optimize_layers else None
+        self.output_settings = {**DEFAULT_OUTPUT, **(output_settings or {})}
+        # 最近一次输出的体积清单
+        self.output_manifest = None
+        self.shape_handlers = {
+            GROUP: self.create_group_layer,
+            PICTURE: self.create_image_layer,
+            TEXT: self.create_text_layer,
+            SHAPE: self.create_shape_layer,
+            LABELLED: self.create_labelled_layer,
+        }
+        # 类别 -> [调用次数, 累计耗时]
+        self.handler_stats = {}
+        self.ids = ObjectIdFactory()
+        # 当前对象 ID 的路径前缀（幻灯片或母版 / 版式）
+        self.id_scope = ''
+        # 当前幻灯片或母版 / 版式的几何计算结果
+        self.geometry = None
         self.image_dict = {}
+        self.styles = SharedStyleRegistry()
+        # 母版 / 版式部件名 -> 符号母版（没有可转换元素时为 None）
+        self.template_symbols = {}
+        self.symbol_masters = []
         self.artboard_width = None
         self.artboard_height = None
+        self.preview_data = None
         
     def log(self, message, level='info'):
         """日志记录"""
@@ -38,6 +88,22 @@ class PPTToSketchConverter:
             else:
                 logger.info(message)
     
+    def object_id(self, name):
+        """当前幻灯片或母版内的对象 ID"""
+        return self.ids.new(f"{self.id_scope}/{name}")
+    
+    def shape_frame(self, shape):
+        """形状相对父组的 ((x, y, width, height), 旋转角, flipH, flipV)"""
+        geometry = self.geometry
+        if geometry is None or shape not in geometry:
+            geometry = SlideGeometry([shape])
+        return geometry.frame(shape)
+
+    def check_cancelled(self):
+        """取消检查点"""
+        if self.cancel_token:
+            self.cancel_token.check()
+    
     def extract_color(self, color_obj):
         """
         提取颜色信息并转换为 Sketch 格式
@@ -128,17 +194,37 @@ class PPTToSketchConverter:
             self.log(f"图片优化失败: {str(e)}", 'warning')
             return image_blob
 
+    def downsample_image(self, image_blob, max_size, quality):
+        """
+        缩小图片以满足输出预算：长边缩到 max_size，带透明度的保留 PNG，其余转 JPEG
+
+        Returns:
+            bytes 或 None: 没有变小或无法解码时返回 None
+        """
+        try:
+            image = Image.open(io.BytesIO(image_blob))
+            if max(image.size) <= max_size and image.format == 'JPEG':
+                return None
+            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+            output = io.BytesIO()
+            if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+                image.save(output, format='PNG', optimize=True)
+            else:
+                image.convert('RGB').save(output, format='JPEG', quality=quality, optimize=True)
+        except Exception as e:
+            self.log(f"图片缩小失败: {str(e)}", 'warning')
+            return None
+        data = output.getvalue()
+        return data if len(data) < len(image_blob) else None
+
     def create_text_layer(self, shape, layer_name):
         """创建文本图层 - 直接坐标映射，让artboard处理裁剪"""
         try:
-            # 直接使用点坐标，无任何缩放
-            left = shape.left.pt if shape.left else 0
-            top = shape.top.pt if shape.top else 0
-            width = shape.width.pt if shape.width else 100
-            height = shape.height.pt if shape.height else 50
-            
+            # 图层框取自本页的几何计算结果：相对父组，已换算组的子坐标空间
+            (left, top, width, height), ppt_rotation, flip_h, flip_v = self.shape_frame(shape)
+
             # 修正旋转角度：PPT和Sketch的坐标系方向相反
-            rotation = -shape.rotation if hasattr(shape, 'rotation') else 0
+            rotation = -ppt_rotation
             
             text_content = ""
             font_name = "Arial"
@@ -176,10 +262,12 @@ class PPTToSketchConverter:
             
             layer = {
                 "_class": "text",
-                "do_objectID": str(uuid.uuid4()),
+                "do_objectID": self.object_id(layer_name),
                 "name": layer_name,
                 "frame": {"_class": "rect", "constrainProportions": False, "height": height, "width": width, "x": left, "y": top},
                 "rotation": rotation,
+                "isFlippedHorizontal": flip_h,
+                "isFlippedVertical": flip_v,
                 "isVisible": True,
                 "isLocked": False,
                 "attributedString": {
@@ -194,10 +282,9 @@ class PPTToSketchConverter:
                             "paragraphStyle": {"_class": "paragraphStyle", "alignment": alignment}
                         }
                     }]
-                },
-                "style": {"_class": "style", "endDecorationType": 0, "miterLimit": 10, "startDecorationType": 0, "windingRule": 1}
+                }
             }
-            return layer
+            return self.styles.register_text(layer, font_name, font_size, text_color, alignment)
         except Exception as e:
             self.log(f"创建文本图层失败: {layer_name} - {e}", 'error')
             return None
@@ -208,30 +295,31 @@ class PPTToSketchConverter:
             if not hasattr(shape, 'image'):
                 return None
 
-            # 直接使用点坐标，无任何缩放
-            left = shape.left.pt if shape.left else 0
-            top = shape.top.pt if shape.top else 0
-            width = shape.width.pt if shape.width else 100
-            height = shape.height.pt if shape.height else 100
+            # 图层框取自本页的几何计算结果：相对父组，已换算组的子坐标空间
+            (left, top, width, height), ppt_rotation, flip_h, flip_v = self.shape_frame(shape)
 
             # 修正旋转角度：PPT和Sketch的坐标系方向相反
-            rotation = -shape.rotation if hasattr(shape, 'rotation') else 0
+            rotation = -ppt_rotation
 
             # 调试输出旋转信息
             if self.verbose and rotation != 0:
-                self.log(f"🔄 图片旋转信息 - 名称: {layer_name}, PPT角度: {shape.rotation}°, Sketch角度: {rotation}°")
+                self.log(f"🔄 图片旋转信息 - 名称: {layer_name}, PPT角度: {ppt_rotation}°, Sketch角度: {rotation}°")
 
-            # 保存图片数据 - 使用用户验证过的格式
+            # 保存图片数据 - 按内容寻址，相同图片只保存一份
             image_data = shape.image.blob
-            image_ref = f"images/{str(uuid.uuid4())}.png"
-            self.image_dict[image_ref] = {"type": "Buffer", "data": list(image_data)}
+            image_ref = f"images/{hashlib.sha1(image_data).hexdigest()}.png"
+            if image_ref not in self.image_dict:
+                self.image_dict[image_ref] = {"type": "Buffer", "data": list(image_data)}
+            metrics.IMAGES_PROCESSED.inc()
             
             layer = {
                 "_class": "bitmap",
-                "do_objectID": str(uuid.uuid4()),
+                "do_objectID": self.object_id(layer_name),
                 "name": layer_name,
                 "frame": {"_class": "rect", "constrainProportions": True, "height": height, "width": width, "x": left, "y": top},
                 "rotation": rotation,  # 修正后的角度值
+                "isFlippedHorizontal": flip_h,
+                "isFlippedVertical": flip_v,
                 "isVisible": True,
                 "isLocked": False,
                 "image": {"_class": "MSJSONFileReference", "_ref_class": "MSImageData", "_ref": image_ref},
@@ -245,67 +333,97 @@ class PPTToSketchConverter:
     def create_shape_layer(self, shape, layer_name):
         """创建形状图层 - 直接坐标映射，让artboard处理裁剪"""
         try:
-            # 直接使用点坐标，无任何缩放
-            left = shape.left.pt if shape.left else 0
-            top = shape.top.pt if shape.top else 0
-            width = shape.width.pt if shape.width else 100
-            height = shape.height.pt if shape.height else 100
+            # 图层框取自本页的几何计算结果：相对父组，已换算组的子坐标空间
+            (left, top, width, height), ppt_rotation, flip_h, flip_v = self.shape_frame(shape)
 
             # 修正旋转角度：PPT和Sketch的坐标系方向相反
-            rotation = -shape.rotation if hasattr(shape, 'rotation') else 0
+            rotation = -ppt_rotation
 
+            # 未设置填充（继承主题）或暂不支持的填充类型使用默认灰色，显式无填充时不填充；
+            # 文本框默认无填充，未设置时同样不填充
             fill_color = self.extract_color((128, 128, 128)) # 默认灰色
-            if hasattr(shape, 'fill') and hasattr(shape.fill, 'fore_color'):
+            fill_type = shape.fill.type if hasattr(shape, 'fill') else None
+            if fill_type == MSO_FILL.SOLID:
                 fill_color = self.extract_color(shape.fill.fore_color)
+            elif fill_type == MSO_FILL.BACKGROUND or (fill_type is None and shape.shape_type == MSO_SHAPE_TYPE.TEXT_BOX):
+                fill_color = None
             
-            path_points = [
-                {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": "{0, 0}", "curveTo": "{0, 0}", "hasCurveFrom": False, "hasCurveTo": False, "point": "{0, 0}"},
-                {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": "{1, 0}", "curveTo": "{1, 0}", "hasCurveFrom": False, "hasCurveTo": False, "point": "{1, 0}"},
-                {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": "{1, 1}", "curveTo": "{1, 1}", "hasCurveFrom": False, "hasCurveTo": False, "point": "{1, 1}"},
-                {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": "{0, 1}", "curveTo": "{0, 1}", "hasCurveFrom": False, "hasCurveTo": False, "point": "{0, 1}"}
-            ]
+            # 预设几何按 (prst, 调整值, 宽高比) 取缓存的归一化路径，矩形和暂不支持的预设使用单位矩形
+            path_points = preset_path(shape, width, height)
+            layer_class = "shapePath"
+            if path_points is None:
+                layer_class = "rectangle"
+                path_points = [
+                    {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": "{0, 0}", "curveTo": "{0, 0}", "hasCurveFrom": False, "hasCurveTo": False, "point": "{0, 0}"},
+                    {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": "{1, 0}", "curveTo": "{1, 0}", "hasCurveFrom": False, "hasCurveTo": False, "point": "{1, 0}"},
+                    {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": "{1, 1}", "curveTo": "{1, 1}", "hasCurveFrom": False, "hasCurveTo": False, "point": "{1, 1}"},
+                    {"_class": "curvePoint", "cornerRadius": 0, "curveFrom": "{0, 1}", "curveTo": "{0, 1}", "hasCurveFrom": False, "hasCurveTo": False, "point": "{0, 1}"}
+                ]
 
             layer = {
-                "_class": "rectangle",
-                "do_objectID": str(uuid.uuid4()),
+                "_class": layer_class,
+                "do_objectID": self.object_id(layer_name),
                 "name": layer_name,
                 "frame": {"_class": "rect", "constrainProportions": False, "height": height, "width": width, "x": left, "y": top},
                 "rotation": rotation,  # 修正后的角度值
+                "isFlippedHorizontal": flip_h,
+                "isFlippedVertical": flip_v,
                 "isVisible": True,
                 "isLocked": False,
-                "path": {"_class": "path", "isClosed": True, "pointRadiusBehaviour": 1, "points": path_points},
-                "style": {
-                    "_class": "style", "endDecorationType": 0, "miterLimit": 10, "startDecorationType": 0, "windingRule": 1,
-                    "fills": [{"_class": "fill", "isEnabled": True, "color": fill_color, "fillType": 0}]
-                }
+                "path": {"_class": "path", "isClosed": True, "pointRadiusBehaviour": 1, "points": list(path_points)},
+                "style": {"_class": "style", "endMarkerType": 0, "miterLimit": 10, "startMarkerType": 0, "windingRule": 1, "fills": []}
             }
+            if fill_color:
+                self.styles.register_fill(layer, fill_color)
             return layer
         except Exception as e:
             self.log(f"创建形状图层失败: {layer_name} - {e}", 'error')
             return None
 
+    def create_labelled_layer(self, shape, layer_name):
+        """创建带文字的自选图形：形状图层在下、文本图层在上，放在与形状同框的组中"""
+        shape_layer = self.create_shape_layer(shape, f"{layer_name}_shape")
+        text_layer = self.create_text_layer(shape, f"{layer_name}_text")
+        if shape_layer is None or text_layer is None:
+            return shape_layer or text_layer
+
+        # 旋转由组承担，翻转只作用于几何形状，文字不随形状镜像
+        frame, rotation = dict(shape_layer["frame"]), shape_layer["rotation"]
+        for child in (shape_layer, text_layer):
+            child["frame"].update(x=0, y=0)
+            child["rotation"] = 0
+        text_layer["isFlippedHorizontal"] = text_layer["isFlippedVertical"] = False
+        return {
+            "_class": "group",
+            "do_objectID": self.object_id(layer_name),
+            "name": layer_name,
+            "frame": frame,
+            "rotation": rotation,
+            "isFlippedHorizontal": False,
+            "isFlippedVertical": False,
+            "isVisible": True,
+            "isLocked": False,
+            "layers": [shape_layer, text_layer],
+            "style": {"_class": "style", "endDecorationType": 0, "miterLimit": 10, "startDecorationType": 0, "windingRule": 1}
+        }
+
     def create_group_layer(self, shape, layer_name):
         """创建组图层 - 修正相对坐标计算"""
         try:
-            # 直接使用点坐标，无任何缩放
-            group_left = shape.left.pt if shape.left else 0
-            group_top = shape.top.pt if shape.top else 0
-            width = shape.width.pt if shape.width else 100
-            height = shape.height.pt if shape.height else 100
+            # 图层框取自本页的几何计算结果：相对父组，已换算组的子坐标空间
+            (left, top, width, height), ppt_rotation, flip_h, flip_v = self.shape_frame(shape)
 
             # 修正旋转角度：PPT和Sketch的坐标系方向相反
-            rotation = -shape.rotation if hasattr(shape, 'rotation') else 0
+            rotation = -ppt_rotation
             
             sub_layers = []
             if hasattr(shape, 'shapes'):
                 # 严格按照PPT内部顺序处理子图层
                 for i, sub_shape in enumerate(shape.shapes):
+                    self.check_cancelled()
+                    # 子图层的坐标在几何计算阶段已换算为相对本组
                     sub_layer = self.process_shape(sub_shape, f"{layer_name}_child_{i}")
                     if sub_layer:
-                        # 正确计算相对于父组的坐标
-                        if 'frame' in sub_layer:
-                            sub_layer['frame']['x'] -= group_left
-                            sub_layer['frame']['y'] -= group_top
                         sub_layers.append(sub_layer)
             
             if not sub_layers:
@@ -314,16 +432,20 @@ class PPTToSketchConverter:
 
             layer = {
                 "_class": "group",
-                "do_objectID": str(uuid.uuid4()),
+                "do_objectID": self.object_id(layer_name),
                 "name": layer_name,
-                "frame": {"_class": "rect", "constrainProportions": False, "height": height, "width": width, "x": group_left, "y": group_top},
+                "frame": {"_class": "rect", "constrainProportions": False, "height": height, "width": width, "x": left, "y": top},
                 "rotation": rotation,  # 修正后的角度值
+                "isFlippedHorizontal": flip_h,
+                "isFlippedVertical": flip_v,
                 "isVisible": True,
                 "isLocked": False,
                 "layers": sub_layers,
                 "style": {"_class": "style", "endDecorationType": 0, "miterLimit": 10, "startDecorationType": 0, "windingRule": 1}
             }
             return layer
+        except ConversionCancelled:
+            raise
         except Exception as e:
             self.log(f"创建组图层失败: {layer_name} - {e}", 'error')
             return None
@@ -332,18 +454,18 @@ class PPTToSketchConverter:
         """提取幻灯片背景信息"""
         try:
             bg_color = None
-            if hasattr(slide, 'background') and hasattr(slide.background, 'fill') and hasattr(slide.background.fill, 'fore_color'):
+            if hasattr(slide, 'background') and slide.background.fill.type == MSO_FILL.SOLID:
                 bg_color = self.extract_color(slide.background.fill.fore_color)
             
             if bg_color:
-                return {
+                layer = {
                     "_class": "rectangle",
-                    "do_objectID": str(uuid.uuid4()),
+                    "do_objectID": self.object_id("Slide Background"),
                     "name": "Slide Background",
                     "frame": {"_class": "rect", "height": self.artboard_height, "width": self.artboard_width, "x": 0, "y": 0},
                     "isLocked": True,
-                    "style": {"_class": "style", "fills": [{"_class": "fill", "isEnabled": True, "color": bg_color, "fillType": 0}]}
                 }
+                return self.styles.register_fill(layer, bg_color)
         except Exception:
             pass # 背景不是纯色，忽略
         return None
@@ -355,35 +477,97 @@ class PPTToSketchConverter:
                 self.log(f"跳过无尺寸的形状: {layer_name}", 'warning')
                 return None
 
-            shape_type = shape.shape_type
+            kind, layer = SHAPE_REGISTRY.dispatch(shape, layer_name, self.shape_handlers, self.handler_stats)
+            return layer
             
-            if shape_type == MSO_SHAPE_TYPE.GROUP:
-                return self.create_group_layer(shape, layer_name)
-            elif shape_type == MSO_SHAPE_TYPE.PICTURE:
-                return self.create_image_layer(shape, layer_name)
-            elif hasattr(shape, 'text_frame') and shape.text_frame.text.strip():
-                return self.create_text_layer(shape, layer_name)
-            else: # 其他所有类型都视为基本形状
-                return self.create_shape_layer(shape, layer_name)
-                
+        except ConversionCancelled:
+            raise
         except Exception as e:
             self.log(f"处理形状失败: {layer_name} - {e}", 'error')
             return None
     
+    def get_template_symbol(self, template, kind):
+        """
+        将母版或版式上的非占位符元素转换为符号母版，每个母版 / 版式只转换一次
+
+        Args:
+            template: SlideMaster 或 SlideLayout
+            kind: 符号名称前缀（Masters / Layouts）
+        """
+        key = _part_name(template)
+        if key in self.template_symbols:
+            return self.template_symbols[key]
+        
+        layers = []
+        slide_scope, self.id_scope = self.id_scope, f"template{key}"
+        slide_geometry = self.geometry
+        try:
+            shapes = list(template.shapes)
+            # 占位符只定义幻灯片内容的位置和格式，实际内容在幻灯片上
+            self.geometry = SlideGeometry(shape for shape in shapes if not shape.is_placeholder)
+            for i, shape in enumerate(shapes):
+                self.check_cancelled()
+                if shape.is_placeholder:
+                    continue
+                layer = self.process_shape(shape, f"{kind}_Layer_{i}")
+                if layer:
+                    layers.append(layer)
+        finally:
+            self.id_scope = slide_scope
+            self.geometry = slide_geometry
+        if self.optimizer:
+            # 符号实例可能被放在带背景的画板上，不合并背景
+            layers = self.optimizer.optimize_layers(layers, self.artboard_width, self.artboard_height)
+        
+        symbol = None
+        if layers:
+            name = f"{kind}/{template.name or key.rsplit('/', 1)[-1].rsplit('.', 1)[0]}"
+            symbol = create_symbol_master(
+                name, layers, self.artboard_width, self.artboard_height, len(self.symbol_masters),
+                object_id=self.ids.new(f"template{key}"), symbol_id=self.ids.new(f"symbol{key}"),
+            )
+            self.symbol_masters.append(symbol)
+            self.log(f"母版元素已转换为符号: {name} ({len(layers)} 个图层)")
+        self.template_symbols[key] = symbol
+        return symbol
+
+    def create_template_instances(self, slide):
+        """为幻灯片创建母版与版式的符号实例，遵循"隐藏背景图形"设置"""
+        if not _shows_master_shapes(slide):
+            return []
+        
+        instances = []
+        layout = slide.slide_layout
+        templates = [(layout, 'Layouts')]
+        if _shows_master_shapes(layout):
+            templates.insert(0, (layout.slide_master, 'Masters'))
+        for template, kind in templates:
+            symbol = self.get_template_symbol(template, kind)
+            if symbol:
+                instances.append(create_symbol_instance(symbol, object_id=self.object_id(symbol["name"])))
+        return instances
+
     def convert_slide_to_artboard(self, slide, slide_index):
         """将PPT幻灯片转换为Sketch画板 - 层级保真"""
         try:
             artboard_name = f"Slide {slide_index + 1}"
             layers = []
+            self.id_scope = f"slide/{slide_index}"
             
             # 1. 添加幻灯片背景色（如果存在）
             slide_bg_layer = self.extract_slide_background(slide)
             if slide_bg_layer:
                 layers.append(slide_bg_layer)
             
+            # 母版和版式上的装饰元素位于幻灯片内容之下
+            layers.extend(self.create_template_instances(slide))
+            
             # 2. 严格按照z-order遍历所有形状
             # python-pptx的slide.shapes本身就是从底层到顶层的顺序
-            for i, shape in enumerate(slide.shapes):
+            shapes = list(slide.shapes)
+            self.geometry = SlideGeometry(shapes)
+            for i, shape in enumerate(shapes):
+                self.check_cancelled()
                 layer = self.process_shape(shape, f"Layer_{i}")
                 if layer:
                     layers.append(layer)
@@ -391,7 +575,7 @@ class PPTToSketchConverter:
             # 创建画板 - 补全所有标准属性
             artboard = {
                 "_class": "artboard",
-                "do_objectID": str(uuid.uuid4()),
+                "do_objectID": self.object_id("artboard"),
                 "name": artboard_name,
                 "frame": {
                     "_class": "rect",
@@ -437,38 +621,82 @@ class PPTToSketchConverter:
                     "shadows": []
                 }
             }
+            if self.optimizer:
+                self.optimizer.optimize_artboard(artboard)
             return artboard
+        except ConversionCancelled:
+            raise
         except Exception as e:
             self.log(f"转换幻灯片失败: {slide_index} - {e}", 'error')
             return None
 
+    @contextmanager
+    def _open_presentation(self, ppt_file_path):
+        """打开演示文稿：快速路径读取失败时回退到 python-pptx"""
+        with metrics.stage_timer('parse'):
+            presentation = None
+            if self.fast_path:
+                try:
+                    presentation = OOXMLPresentation(ppt_file_path)
+                except Exception as e:
+                    self.log(f"快速解析失败，回退到 python-pptx: {e}", 'warning')
+            if presentation is None:
+                presentation = Presentation(ppt_file_path)
+        try:
+            yield presentation
+        finally:
+            if isinstance(presentation, OOXMLPresentation):
+                presentation.close()
+
     def convert_ppt_to_sketch(self, ppt_file_path, output_dir):
         """将PPT文件转换为Sketch格式 - 纯点单位版"""
         try:
             self.log(f"开始转换: {ppt_file_path}")
-            presentation = Presentation(ppt_file_path)
-            
-            # 直接使用点单位属性，避免EMU转换
-            self.artboard_width = presentation.slide_width.pt
-            self.artboard_height = presentation.slide_height.pt
-            self.log(f"画板尺寸: {self.artboard_width:.2f} x {self.artboard_height:.2f} 点")
-
-            artboards = []
-            for i, slide in enumerate(presentation.slides):
-                artboard = self.convert_slide_to_artboard(slide, i)
-                if artboard:
-                    artboards.append(artboard)
+            if self.deterministic_ids:
+                self.ids = ObjectIdFactory(file_sha256(ppt_file_path))
+            with self._open_presentation(ppt_file_path) as presentation:
+                # 直接使用点单位属性，避免EMU转换
+                self.artboard_width = presentation.slide_width.pt
+                self.artboard_height = presentation.slide_height.pt
+                self.log(f"画板尺寸: {self.artboard_width:.2f} x {self.artboard_height:.2f} 点")
+
+                artboards = []
+                with metrics.stage_timer('slides'):
+                    for i, slide in enumerate(presentation.slides):
+                        self.check_cancelled()
+                        artboard = self.convert_slide_to_artboard(slide, i)
+                        if artboard:
+                            artboards.append(artboard)
+                            metrics.SLIDES_PROCESSED.inc()
             
             if not artboards:
                 raise Exception("未能成功转换任何幻灯片")
             
-            sketch_data = self._create_sketch_document(artboards)
-            return self._generate_sketch_file(sketch_data, output_dir)
+            self.check_cancelled()
+            if self.optimizer:
+                self._finish_optimization(artboards)
+            with metrics.stage_timer('document'):
+                sketch_data = self._create_sketch_document(artboards)
+            with metrics.stage_timer('preview'):
+                self.preview_data = self._generate_preview(ppt_file_path, artboards[0])
+            sketch_data["preview"] = self.preview_data
+            if self.handler_stats:
+                self.log("形状处理耗时: " + ", ".join(
+                    f"{kind} {count} 个 {seconds * 1000:.1f}ms" for kind, (count, seconds) in sorted(self.handler_stats.items())
+                ))
+            with metrics.stage_timer('write'):
+                return self._generate_sketch_file(sketch_data, output_dir)
             
         except Exception as e:
             self.log(f"转换过程发生严重错误: {e}", 'error')
             raise e
     
+    def _finish_optimization(self, artboards):
+        """被删除的图层不再计入共享样式，也不再保存只被它们引用的图片"""
+        self.styles.forget(self.optimizer.removed)
+        self.optimizer.prune_images(artboards + self.symbol_masters, self.image_dict, size=lambda image: len(image["data"]))
+        self.log(self.optimizer.summary())
+
     def _create_sketch_document(self, artboards):
         """
         创建Sketch文档结构 - 基于标准文件进行精确重写
@@ -479,7 +707,7 @@ class PPTToSketchConverter:
         page_refs = []
         
         for artboard in artboards:
-            page_id = str(uuid.uuid4())
+            page_id = self.ids.new(f"page/{artboard['do_objectID']}")
             page_data = {
                 "_class": "page",
                 "do_objectID": page_id,
@@ -496,16 +724,25 @@ class PPTToSketchConverter:
             pages_data.append(page_data)
             page_refs.append({"_class": "MSJSONFileReference", "_ref_class": "MSImmutablePage", "_ref": f"pages/{page_id}"})
 
-        # 2. 创建 document.json
+        # 母版与版式生成的符号母版统一放在 Symbols 页面
+        if self.symbol_masters:
+            symbols_page = create_symbols_page(
+                self.symbol_masters, self.artboard_width, self.artboard_height, object_id=self.ids.new("page/symbols")
+            )
+            pages_data.append(symbols_page)
+            page_refs.append({"_class": "MSJSONFileReference", "_ref_class": "MSImmutablePage", "_ref": f"pages/{symbols_page['do_objectID']}"})
+
+        # 2. 创建 document.json，重复的文本样式和填充样式注册为共享样式
+        layer_styles, text_styles = self.styles.build(self.ids)
         document = {
             "_class": "document",
-            "do_objectID": str(uuid.uuid4()),
+            "do_objectID": self.ids.new("document"),
             "assets": {"_class": "assetCollection", "images": [], "colorAssets": [], "exportPresets": [], "gradientAssets": [], "colors": [], "gradients": []},
             "colorSpace": 1,
             "currentPageIndex": 0,
             "foreignLayerStyles": [], "foreignSymbols": [], "foreignTextStyles": [], "foreignSwatches": [],
-            "layerStyles": {"_class": "sharedStyleContainer", "objects": []},
-            "layerTextStyles": {"_class": "sharedTextStyleContainer", "objects": []},
+            "layerStyles": {"_class": "sharedStyleContainer", "objects": layer_styles},
+            "layerTextStyles": {"_class": "sharedTextStyleContainer", "objects": text_styles},
             "pages": page_refs,
             "perDocumentLibraries": [],
             "sharedSwatches": {"_class": "swatchContainer", "objects": []}
@@ -526,7 +763,7 @@ class PPTToSketchConverter:
         for page in pages_data:
             artboard_info = {}
             for layer in page.get("layers", []):
-                if layer.get("_class") == "artboard":
+                if layer.get("_class") in ("artboard", "symbolMaster"):
                     artboard_info[layer["do_objectID"]] = {"name": layer["name"]}
             meta["pagesAndArtboards"][page["do_objectID"]] = {"name": page["name"], "artboards": artboard_info}
 
@@ -544,6 +781,17 @@ class PPTToSketchConverter:
             "imageDic": self.image_dict
         }
     
+    def _generate_preview(self, ppt_file_path, artboard):
+        """生成预览图 - 失败不影响转换结果"""
+        from .preview import generate_preview
+        
+        preview_data = generate_preview(ppt_file_path, artboard, self.image_dict)
+        if preview_data:
+            self.log(f"预览图生成完成: {len(preview_data)} 字节")
+        else:
+            self.log("未能生成预览图", 'warning')
+        return preview_data
+    
     def _generate_sketch_file(self, sketch_data, output_dir):
         """生成Sketch文件 - 使用独立的转换器"""
         from .json_to_sketch import JSONToSketchConverter
@@ -555,8 +803,29 @@ class PPTToSketchConverter:
         sketch_file_path = output_path / sketch_filename
         
         # 使用新的 JSON 到 Sketch 转换器
-        converter = JSONToSketchConverter(verbose=self.verbose)
+        converter = JSONToSketchConverter(verbose=self.verbose, manifest_top_n=self.output_settings['TOP_N'])
         success = converter.to_file(sketch_data, str(sketch_file_path))
+        manifest = converter.manifest
+        
+        max_bytes = self.output_settings['MAX_BYTES']
+        if success and max_bytes:
+            budget = {
+                'max_bytes': max_bytes, 'bytes_before': manifest['total']['file_bytes'],
+                'max_image_size': None, 'images_downsampled': 0,
+            }
+            if budget['bytes_before'] > max_bytes and self._fit_output_budget(sketch_data, manifest, budget):
+                success = converter.to_file(sketch_data, str(sketch_file_path))
+                manifest = converter.manifest
+            budget['bytes_after'] = manifest['total']['file_bytes']
+            budget['met'] = budget['bytes_after'] <= max_bytes
+            if not budget['met']:
+                self.log(f"输出 {budget['bytes_after']} 字节仍超出预算 {max_bytes} 字节", 'warning')
+            manifest['budget'] = budget
+        
+        self.output_manifest = manifest
+        if manifest:
+            metrics.record_output_manifest(manifest)
+            self.log(manifest_summary(manifest))
         
         if success:
             self.log(f"Sketch 文件生成完成: {sketch_file_path}")
@@ -564,16 +833,102 @@ class PPTToSketchConverter:
         else:
             raise Exception("Sketch 文件生成失败")
 
-def convert_ppt_to_sketch_async(task_id):
-    """异步转换任务 - 使用增强版转换器"""
+    def _fit_output_budget(self, sketch_data, manifest, budget):
+        """
+        输出超出预算时按 DOWNSAMPLE_SIZES 逐级缩小图片，直到按清单估算的文件大小不超过预算。
+        每一级都从原图缩小；JPEG / PNG 数据几乎不可再压缩，以新数据长度估算压缩后大小
+
+        Returns:
+            bool: 是否替换了图片（需要重新写入）
+        """
+        image_dic = sketch_data.get("imageDic", {})
+        compressed = {
+            entry['name']: entry['compressed'] for entry in manifest['entries'] if entry['group'] == IMAGES
+        }
+        originals = {
+            name: bytes(image["data"]) for name, image in image_dic.items()
+            if isinstance(image, dict) and name in compressed
+        }
+        replaced = {}
+        for max_size in self.output_settings['DOWNSAMPLE_SIZES']:
+            self.check_cancelled()
+            for name, original in originals.items():
+                data = self.downsample_image(original, max_size, self.output_settings['JPEG_QUALITY'])
+                if data is not None and len(data) < len(replaced.get(name, original)):
+                    replaced[name] = data
+            estimate = budget['bytes_before'] - sum(
+                compressed[name] - len(data) for name, data in replaced.items()
+            )
+            budget['max_image_size'] = max_size
+            self.log(f"输出超出预算: 图片长边缩小到 {max_size}px 后预计 {estimate} 字节")
+            if estimate <= budget['max_bytes']:
+                break
+        for name, data in replaced.items():
+            image_dic[name] = {"type": "Buffer", "data": list(data)}
+        budget['images_downsampled'] = len(replaced)
+        metrics.OUTPUT_IMAGES_DOWNSAMPLED.inc(len(replaced))
+        return bool(replaced)
+
+def _part_name(template):
+    """母版 / 版式的部件名"""
+    if isinstance(template, PartRecord):
+        return template.partname
+    return str(template.part.partname)
+
+def _shows_master_shapes(slide):
+    """showMasterSp="0" 表示隐藏母版（及版式）上的图形"""
+    if isinstance(slide, PartRecord):
+        return slide.show_master_shapes
+    return slide._element.get('showMasterSp') != '0'
+
+def _owned_task(task_id, token):
+    """
+    仍由本次执行持有的任务：处理中，使用数据库队列时租约仍属于本工作进程。
+    结果和失败状态都只按这个条件更新，被回收或被其他节点重新领取的任务不会被旧的执行覆盖
+    """
+    from .models import ConversionTask
+
+    queryset = ConversionTask.objects.filter(pk=task_id, status='processing')
+    if token.lease_owner:
+        queryset = queryset.filter(lease_owner=token.lease_owner)
+    return queryset
+
+
+def convert_ppt_to_sketch_async(task_id, cancel_token=None):
+    """
+    异步转换任务
+    
+    Args:
+        task_id: ConversionTask 主键
+        cancel_token: 可选的 CancelToken，缺省按 CONVERTER_JOB_LIMITS 创建；
+            数据库队列的工作进程设置 lease_owner，只在仍持有租约时写回结果
+    """
     from .models import ConversionTask
+    from .coalescing import settle_followers, ACTIVE_STATUSES
+    from .output_manifest import get_output_settings
+    from django.conf import settings
     from django.core.files import File
+    from django.core.files.base import ContentFile
+    from django.utils import timezone
     
     task = None
+    started_at = time.perf_counter()
+    token = cancel_token or CancelToken.for_task(task_id)
+    register_token(task_id, token)
     try:
         task = ConversionTask.objects.get(id=task_id)
+        if task.cancel_requested:
+            raise ConversionCancelled()
+        token.start()
+        # 只更新状态列，不覆盖取消标记和租约
+        started = ConversionTask.objects.filter(pk=task_id, status__in=ACTIVE_STATUSES)
+        if token.lease_owner:
+            started = started.filter(lease_owner=token.lease_owner)
+        if not started.update(status='processing', updated_at=timezone.now()):
+            token.abandoned = True
+            raise ConversionCancelled(LEASE_LOST_MESSAGE)
         task.status = 'processing'
-        task.save()
+        settle_followers(task.pk)
         
         logger.info(f"开始处理转换任务: {task_id}")
         
@@ -582,7 +937,13 @@ def convert_ppt_to_sketch_async(task_id):
             raise FileNotFoundError(f"PPT 文件不存在: {task.ppt_file.path}")
         
         # 执行转换
-        converter = PPTToSketchConverter(verbose=True)
+        converter = PPTToSketchConverter(
+            verbose=True, cancel_token=token,
+            deterministic_ids=getattr(settings, 'CONVERTER_DETERMINISTIC_IDS', True),
+            fast_path=getattr(settings, 'CONVERTER_FAST_PATH', True),
+            optimize_layers=getattr(settings, 'CONVERTER_OPTIMIZE_LAYERS', True),
+            output_settings=get_output_settings(),
+        )
         output_dir = Path('media/outputs/sketch')
         
         sketch_file_path = converter.convert_ppt_to_sketch(
@@ -590,29 +951,67 @@ def convert_ppt_to_sketch_async(task_id):
             output_dir
         )
         
-        # 保存结果
-        with open(sketch_file_path, 'rb') as f:
-            task.sketch_file.save(
-                os.path.basename(sketch_file_path),
-                File(f),
-                save=True
-            )
-        
+        try:
+            # 保存结果前最后检查一次，被取消或被运行时回收的任务不再写回结果
+            token.check()
+            
+            # 保存结果：先写入文件，再按持有条件只更新结果列；条件不成立说明任务已被回收或接管，丢弃结果
+            with metrics.stage_timer('save'):
+                with open(sketch_file_path, 'rb') as f:
+                    task.sketch_file.save(os.path.basename(sketch_file_path), File(f), save=False)
+                if converter.preview_data:
+                    task.preview_file.save(f"{task.id}.png", ContentFile(converter.preview_data), save=False)
+                completed = _owned_task(task_id, token).update(
+                    status='completed',
+                    sketch_file=task.sketch_file.name,
+                    preview_file=task.preview_file.name if converter.preview_data else None,
+                    sketch_hash=file_sha256(sketch_file_path),
+                    output_manifest=converter.output_manifest,
+                    error_message=None,
+                    updated_at=timezone.now(),
+                )
+            if not completed:
+                for field in (task.sketch_file, task.preview_file):
+                    if field:
+                        field.storage.delete(field.name)
+                token.abandoned = True
+                raise ConversionCancelled(LEASE_LOST_MESSAGE)
+        finally:
+            # 清理临时文件
+            if os.path.exists(sketch_file_path):
+                os.remove(sketch_file_path)
         task.status = 'completed'
-        task.error_message = None # 清除之前的错误信息
-        task.save()
         
-        # 清理临时文件
-        if os.path.exists(sketch_file_path):
-            os.remove(sketch_file_path)
+        metrics.INPUT_BYTES.inc(task.ppt_file.size)
+        metrics.OUTPUT_BYTES.inc(task.sketch_file.size)
+        metrics.CONVERSION_DURATION.observe(time.perf_counter() - started_at, outcome='completed')
         
         logger.info(f"转换任务完成: {task_id}")
         return True
         
+    except ConversionCancelled as e:
+        # 已被运行时回收或已被其他节点接管的任务由回收方负责标记状态
+        if task and not token.abandoned:
+            _owned_task(task_id, token).update(
+                status='failed', error_message=e.reason, updated_at=timezone.now()
+            )
+        metrics.CONVERSION_FAILURES.inc(error_class=type(e).__name__)
+        metrics.CONVERSION_DURATION.observe(time.perf_counter() - started_at, outcome='cancelled')
+        logger.warning(f"转换任务中止 {task_id}: {e.reason}")
+        return False
     except Exception as e:
-        if task:
-            task.status = 'failed'
-            task.error_message = str(e)
-            task.save()
+        if task and not token.abandoned:
+            _owned_task(task_id, token).update(
+                status='failed', error_message=str(e), updated_at=timezone.now()
+            )
+        metrics.CONVERSION_FAILURES.inc(error_class=type(e).__name__)
+        metrics.CONVERSION_DURATION.observe(time.perf_counter() - started_at, outcome='failed')
         logger.error(f"转换任务失败 {task_id}: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        return False
+    finally:
+        unregister_token(task_id, token)
+        if task and not token.abandoned:
+            try:
+                settle_followers(task.pk)
+            except Exception as e:
+                logger.error(f"同步合并任务失败 {task_id}: {e}", exc_info=True)
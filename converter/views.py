@@ -1,70 +1,367 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse, Http404, HttpResponse
-from rest_framework import generics, status
+from django.http import (
+    JsonResponse, Http404, HttpResponse, FileResponse, HttpResponseBadRequest,
+    HttpResponseNotAllowed, StreamingHttpResponse,
+)
+from django.core.files.base import ContentFile
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+from rest_framework import generics, serializers, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from rest_framework.request import Request
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.parsers import MultiPartParser, FormParser
-from .models import ConversionTask
-from .serializers import ConversionTaskSerializer, ConversionTaskCreateSerializer
-from .utils import convert_ppt_to_sketch_async
-import threading
+from .models import ConversionTask, UploadSession
+from .serializers import (
+    ConversionTaskSerializer, ConversionTaskCreateSerializer,
+    UploadSessionSerializer, UploadSessionCreateSerializer,
+)
+from .uploads import (
+    UploadOffsetError, UploadHashMismatch, get_upload_settings,
+    write_chunk, finalize_upload, discard_upload, chunk_path,
+)
+from .preflight import inspect_presentation, PreflightError
+from .pagination import ConversionTaskCursorPagination
+from .scheduler import get_scheduler
+from .coalescing import start_conversion, cancel_follower, settle_followers
+from .object_ids import file_sha256
+from .admission import check_admission
+from .cancellation import cancel_running, CANCELLED_MESSAGE
+from . import metrics
+from asgiref.sync import sync_to_async
+from datetime import datetime, time, timedelta
+import asyncio
 import logging
+import re
 
 logger = logging.getLogger(__name__)
 
+# 缩略图缓存时间（秒）
+THUMBNAIL_MAX_AGE = 24 * 60 * 60
+
+# 已完成的输出文件不会再变化，允许浏览器和 CDN 长期缓存
+OUTPUT_MAX_AGE = 365 * 24 * 60 * 60
+
+# 下载时每次从磁盘读取的块大小
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# 状态长轮询：最长等待时间与数据库检查间隔（秒）
+STATUS_MAX_WAIT = 30
+STATUS_POLL_INTERVAL = 1.0
+STATUS_FIELDS = ('id', 'status', 'error_message', 'cancel_requested', 'updated_at')
+
+# Content-Range: bytes <start>-<end>/<total>
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+# 列表只加载展示所需的列
+TASK_LIST_FIELDS = (
+    'id', 'ppt_file', 'sketch_file', 'status',
+    'created_at', 'updated_at', 'error_message',
+    'priority', 'cancel_requested',
+    'slide_count', 'media_bytes', 'estimated_cost', 'coalesced_with',
+)
+
+def _parse_date_param(value, name, end_of_day=False):
+    """解析日期或日期时间查询参数为带时区的时间点"""
+    parsed_date = parse_date(value)
+    if parsed_date is not None:
+        if end_of_day:
+            parsed_date += timedelta(days=1)
+        parsed = datetime.combine(parsed_date, time.min)
+    else:
+        parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValidationError({name: '日期格式无效，应为 YYYY-MM-DD 或 ISO 8601'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def _filter_tasks(queryset, params):
+    """按状态和创建时间过滤任务列表"""
+    status_param = params.get('status')
+    if status_param:
+        statuses = [value for value in status_param.split(',') if value]
+        valid_statuses = {choice for choice, _ in ConversionTask.STATUS_CHOICES}
+        invalid = [value for value in statuses if value not in valid_statuses]
+        if invalid:
+            raise ValidationError({'status': f"无效的状态: {', '.join(invalid)}"})
+        queryset = queryset.filter(status__in=statuses)
+    
+    # 直接比较 created_at 以便命中索引；日期参数按整天计算
+    created_after = params.get('created_after')
+    if created_after:
+        queryset = queryset.filter(created_at__gte=_parse_date_param(created_after, 'created_after'))
+    
+    created_before = params.get('created_before')
+    if created_before:
+        queryset = queryset.filter(
+            created_at__lt=_parse_date_param(created_before, 'created_before', end_of_day=True)
+        )
+    
+    return queryset
+
+def _client_id(request):
+    """客户端标识：优先使用 X-Client-Id 请求头，否则使用来源 IP。只用于公平排队，客户端可以任意设置"""
+    client_id = request.META.get('HTTP_X_CLIENT_ID') or request.META.get('REMOTE_ADDR') or ''
+    return client_id[:64]
+
+def _client_addr(request):
+    """客户端来源地址，用于每客户端的任务数上限，不受请求头影响"""
+    return (request.META.get('REMOTE_ADDR') or '')[:64]
+
+def _content_length(request):
+    """请求体长度，Content-Length 缺失时为 0，格式错误时返回 400"""
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise ValidationError({'Content-Length': '必须是非负整数'})
+    return length
+
 class ConversionTaskListCreateView(generics.ListCreateAPIView):
     """转换任务列表和创建视图"""
     queryset = ConversionTask.objects.all()
     parser_classes = (MultiPartParser, FormParser)
+    pagination_class = ConversionTaskCursorPagination
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method == 'GET':
+            queryset = _filter_tasks(queryset.only(*TASK_LIST_FIELDS), self.request.query_params)
+        return queryset
     
     def get_serializer_class(self):
         if self.request.method == 'POST':
             return ConversionTaskCreateSerializer
         return ConversionTaskSerializer
     
+    def create(self, request, *args, **kwargs):
+        """解析上传内容之前先做准入检查，过载时不接收文件"""
+        check_admission(_client_addr(request), _content_length(request))
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
-        """创建任务后启动异步转换"""
-        task = serializer.save()
-        
-        # 启动异步转换任务
-        def start_conversion():
-            convert_ppt_to_sketch_async(task.id)
-        
-        conversion_thread = threading.Thread(target=start_conversion)
-        conversion_thread.daemon = True
-        conversion_thread.start()
-        
+        """创建任务后启动异步转换，相同内容正在转换时合并到该任务"""
+        task = serializer.save(client_id=_client_id(self.request), client_addr=_client_addr(self.request))
+        start_conversion(task)
         return task
 
-class ConversionTaskDetailView(generics.RetrieveAPIView):
-    """转换任务详情视图"""
-    queryset = ConversionTask.objects.all()
-    serializer_class = ConversionTaskSerializer
-    lookup_field = 'id'
+# 以下视图为异步视图：在 ASGI 下运行时，等待数据库和磁盘期间不占用工作线程，
+# 大量慢速下载和状态轮询连接只消耗事件循环上的协程
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={'ensure_ascii': False})
+
+async def _aget_task(task_id, *fields):
+    """异步读取任务，不存在时返回 None"""
+    queryset = ConversionTask.objects.filter(id=task_id)
+    if fields:
+        queryset = queryset.only(*fields)
+    return await queryset.afirst()
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+async def task_detail(request, pk):
+    """转换任务详情，支持 If-None-Match / If-Modified-Since 条件请求"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    task = await _aget_task(pk)
+    if task is None:
+        return _json({'error': '任务不存在'}, status=404)
+    
+    # 任务的任何变化都会更新 updated_at；输出哈希区分同一时刻写入的不同结果
+    etag = quote_etag(f"{task.id}-{task.updated_at.timestamp():.6f}-{task.sketch_hash[:16]}")
+    last_modified = int(task.updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _json(ConversionTaskSerializer(task, context={'request': request}).data)
+    _set_validators(response, etag, last_modified)
+    # 任务状态随时可能变化，缓存必须每次重新验证
+    patch_cache_control(response, no_cache=True)
+    return response
+
+async def task_status(request, task_id):
+    """
+    轻量状态查询，支持长轮询
+
+    查询参数:
+        since: 客户端已知的状态，状态不同时立即返回
+        wait: 状态与 since 相同时最多等待的秒数（不超过 STATUS_MAX_WAIT）
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    since = request.GET.get('since')
+    try:
+        wait = min(max(float(request.GET.get('wait', 0)), 0), STATUS_MAX_WAIT)
+    except ValueError:
+        return _json({'error': 'wait 必须是数字'}, status=400)
+    if not isinstance(request, ASGIRequest):
+        # WSGI 下等待会占住一个同步工作进程，直接返回当前状态
+        wait = 0
+    
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        row = await ConversionTask.objects.filter(id=task_id).values(*STATUS_FIELDS).afirst()
+        if row is None:
+            return _json({'error': '任务不存在'}, status=404)
+        if not since or row['status'] != since or loop.time() >= deadline:
+            break
+        await asyncio.sleep(min(STATUS_POLL_INTERVAL, max(deadline - loop.time(), 0)))
+    
+    row['id'] = str(row['id'])
+    row['updated_at'] = row['updated_at'].isoformat()
+    return _json(row)
+
+async def task_output_manifest(request, task_id):
+    """输出文件体积清单：各 zip 条目压缩前后的字节数、分组合计、最大的图层和图片"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    row = await ConversionTask.objects.filter(id=task_id).values('status', 'output_manifest').afirst()
+    if row is None:
+        return _json({'error': '任务不存在'}, status=404)
+    if not row['output_manifest']:
+        error = '转换尚未完成' if row['status'] != 'completed' else '该任务没有输出清单'
+        return _json({'error': error}, status=404)
+    return _json(row['output_manifest'])
+
+async def _stream_file(file_obj, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """在线程池中分块读取文件，事件循环不被磁盘 IO 阻塞"""
+    read = sync_to_async(file_obj.read, thread_sensitive=False)
+    try:
+        while True:
+            chunk = await read(chunk_size)
+            if not chunk:
+                break
+            metrics.DOWNLOAD_BYTES.inc(len(chunk))
+            yield chunk
+    finally:
+        await sync_to_async(file_obj.close, thread_sensitive=False)()
+
+async def download_sketch_file(request, task_id):
+    """下载转换后的 Sketch 文件，以输出文件哈希作为 ETag"""
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    task = await _aget_task(task_id, 'id', 'status', 'sketch_file', 'sketch_hash', 'updated_at')
+    if task is None:
+        return _json({'error': '任务不存在'}, status=404)
+    if not task.sketch_file:
+        return _json({'error': 'Sketch 文件不存在'}, status=404)
+    if task.status != 'completed':
+        return _json({'error': '转换尚未完成'}, status=400)
+    
+    try:
+        if not task.sketch_hash:
+            # 历史任务首次下载时补算哈希，只更新哈希字段，不改变 updated_at
+            task.sketch_hash = await sync_to_async(file_sha256, thread_sensitive=False)(task.sketch_file.path)
+            await ConversionTask.objects.filter(pk=task.pk).aupdate(sketch_hash=task.sketch_hash)
+    except OSError as e:
+        logger.error(f"下载文件时发生错误: {str(e)}")
+        return _json({'error': '下载失败'}, status=500)
+    
+    etag = quote_etag(task.sketch_hash)
+    last_modified = int(task.updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        _set_validators(response, etag, last_modified)
+        patch_cache_control(response, public=True, max_age=OUTPUT_MAX_AGE, immutable=True)
+        return response
+    
+    try:
+        file_obj = await sync_to_async(task.sketch_file.storage.open, thread_sensitive=False)(task.sketch_file.name, 'rb')
+        size = await sync_to_async(task.sketch_file.storage.size, thread_sensitive=False)(task.sketch_file.name)
+    except OSError as e:
+        logger.error(f"下载文件时发生错误: {str(e)}")
+        return _json({'error': '下载失败'}, status=500)
+    
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_stream_file(file_obj), content_type='application/octet-stream')
+        response['Content-Length'] = str(size)
+    else:
+        # WSGI 下异步迭代器会被整体读入内存，改用同步文件响应
+        metrics.DOWNLOAD_BYTES.inc(size)
+        response = FileResponse(file_obj, content_type='application/octet-stream')
+    response['Content-Disposition'] = f'attachment; filename="{task.sketch_filename}"'
+    _set_validators(response, etag, last_modified)
+    patch_cache_control(response, public=True, max_age=OUTPUT_MAX_AGE, immutable=True)
+    return response
+
+def _build_task_preview(task):
+    """为历史任务补生成预览图并缓存到任务上"""
+    from .preview import extract_sketch_preview, extract_pptx_thumbnail
+    
+    preview_data = None
+    if task.sketch_file:
+        preview_data = extract_sketch_preview(task.sketch_file.path)
+    if not preview_data and task.ppt_file:
+        preview_data = extract_pptx_thumbnail(task.ppt_file.path)
+    if not preview_data:
+        return False
+    
+    task.preview_file.save(f"{task.id}.png", ContentFile(preview_data), save=False)
+    # 仅更新预览图字段，不改变 updated_at
+    ConversionTask.objects.filter(pk=task.pk).update(preview_file=task.preview_file.name)
+    return True
 
 @api_view(['GET'])
-def download_sketch_file(request, task_id):
-    """下载转换后的 Sketch 文件"""
+def task_thumbnail(request, task_id):
+    """获取任务预览缩略图"""
+    task = get_object_or_404(ConversionTask, id=task_id)
     try:
-        task = get_object_or_404(ConversionTask, id=task_id)
-        
-        if not task.sketch_file:
-            return Response({'error': 'Sketch 文件不存在'}, status=status.HTTP_404_NOT_FOUND)
+        if not task.preview_file and not _build_task_preview(task):
+            return Response({'error': '预览图不存在'}, status=status.HTTP_404_NOT_FOUND)
         
-        if task.status != 'completed':
-            return Response({'error': '转换尚未完成'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # 构建文件下载响应
-        response = HttpResponse(
-            task.sketch_file.read(),
-            content_type='application/octet-stream'
-        )
-        response['Content-Disposition'] = f'attachment; filename="{task.sketch_filename}"'
+        etag = quote_etag(f"{task.id}-{task.preview_file.name}")
+        last_modified = int(task.updated_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = FileResponse(task.preview_file.open('rb'), content_type='image/png')
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, public=True, max_age=THUMBNAIL_MAX_AGE)
         return response
         
     except Exception as e:
-        logger.error(f"下载文件时发生错误: {str(e)}")
-        return Response({'error': '下载失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logger.error(f"获取预览图时发生错误: {str(e)}")
+        return Response({'error': '获取预览图失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+def cancel_conversion_task(request, task_id):
+    """取消等待中或处理中的转换任务"""
+    task = get_object_or_404(ConversionTask, id=task_id)
+    if task.status in ('completed', 'failed'):
+        return Response({'error': '任务已结束，无法取消'}, status=status.HTTP_409_CONFLICT)
+    
+    if task.coalesced_with_id:
+        # 合并的任务只退出等待，主任务继续为其他上传转换
+        cancel_follower(task)
+        task.refresh_from_db()
+        serializer = ConversionTaskSerializer(task, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+    
+    now = timezone.now()
+    # 数据库标记让其他进程中的转换在下一个检查点停止
+    ConversionTask.objects.filter(pk=task.pk).update(cancel_requested=True, updated_at=now)
+    get_scheduler().cancel(task.id)
+    if not cancel_running(task.id):
+        # 尚未开始的任务直接标记为失败
+        if ConversionTask.objects.filter(pk=task.pk, status='pending').update(
+            status='failed', error_message=CANCELLED_MESSAGE, updated_at=now
+        ):
+            # 合并到该任务的上传改由其中最早的一个重新转换
+            settle_followers(task.pk)
+    
+    task.refresh_from_db()
+    serializer = ConversionTaskSerializer(task, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
 @api_view(['DELETE'])
 def delete_conversion_task(request, task_id):
@@ -77,17 +374,174 @@ def delete_conversion_task(request, task_id):
         logger.error(f"删除任务时发生错误: {str(e)}")
         return Response({'error': '删除失败'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+def create_upload_session(request):
+    """创建分块上传会话"""
+    serializer = UploadSessionCreateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    # 在客户端开始上传分块之前拒绝，不浪费带宽
+    check_admission(_client_addr(request), serializer.validated_data['total_size'])
+    session = serializer.save()
+    data = UploadSessionSerializer(session).data
+    data['chunk_size'] = get_upload_settings()['chunk_size']
+    return Response(data, status=status.HTTP_201_CREATED)
+
+def _parse_chunk_range(request, session):
+    """从 Content-Range 或 offset 参数解析分块的偏移与长度"""
+    content_length = _content_length(request)
+    content_range = request.META.get('HTTP_CONTENT_RANGE')
+    if content_range:
+        match = CONTENT_RANGE_RE.match(content_range.strip())
+        if not match:
+            raise ValidationError({'Content-Range': '格式应为 bytes start-end/total'})
+        start, end, total = match.groups()
+        offset, length = int(start), int(end) - int(start) + 1
+        if total != '*' and int(total) != session.total_size:
+            raise ValidationError({'Content-Range': '文件总大小与会话不一致'})
+        if length != content_length:
+            raise ValidationError({'Content-Range': '分块长度与 Content-Length 不一致'})
+    else:
+        try:
+            offset = int(request.query_params.get('offset', session.received_bytes))
+        except ValueError:
+            raise ValidationError({'offset': '偏移必须是整数'})
+        length = content_length
+    
+    if length <= 0:
+        raise ValidationError({'error': '分块不能为空'})
+    if length > get_upload_settings()['chunk_size']:
+        raise ValidationError({'error': '分块超过允许的最大大小'})
+    if offset + length > session.total_size:
+        raise ValidationError({'error': '分块超出文件总大小'})
+    return offset, length
+
+@api_view(['GET', 'PUT'])
+def upload_session_detail(request, session_id):
+    """查询上传进度（用于续传）或上传一个分块"""
+    session = get_object_or_404(UploadSession, id=session_id)
+    if request.method == 'GET':
+        return Response(UploadSessionSerializer(session).data)
+    
+    if session.status != 'uploading':
+        return Response({'error': '上传会话已结束'}, status=status.HTTP_409_CONFLICT)
+    
+    offset, length = _parse_chunk_range(request, session)
+    try:
+        # 直接读取请求流写入磁盘，不经过解析器缓冲
+        received = write_chunk(session, offset, request.stream, length)
+    except UploadOffsetError as e:
+        return Response({'error': str(e), 'offset': e.expected_offset}, status=status.HTTP_409_CONFLICT)
+    
+    if received < offset + length:
+        return Response({'error': '分块数据不完整', 'offset': received}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(UploadSessionSerializer(session).data)
+
+def _release_session(session, new_status):
+    """释放完成请求对会话的认领"""
+    UploadSession.objects.filter(pk=session.pk, status='completing').update(
+        status=new_status, updated_at=timezone.now()
+    )
+    session.status = new_status
+
+@api_view(['POST'])
+def complete_upload_session(request, session_id):
+    """完成分块上传并创建转换任务"""
+    session = get_object_or_404(UploadSession, id=session_id)
+    if session.status == 'completed' and session.task_id:
+        serializer = ConversionTaskCreateSerializer(session.task, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    
+    priority_field = serializers.IntegerField(min_value=-10, max_value=10)
+    try:
+        priority = priority_field.run_validation(request.data.get('priority', 0))
+    except serializers.ValidationError as e:
+        raise ValidationError({'priority': e.detail})
+    
+    if session.received_bytes != session.total_size:
+        return Response({'error': '文件尚未上传完整', 'offset': session.received_bytes}, status=status.HTTP_409_CONFLICT)
+    
+    # 分块已在磁盘上；被拒绝时会话保留，客户端按 Retry-After 重新提交完成请求即可
+    check_admission(_client_addr(request))
+    
+    # 先认领会话，并发的完成请求只有一个能继续，其余的不会删除正在使用的文件
+    claimed = UploadSession.objects.filter(pk=session.pk, status='uploading').update(
+        status='completing', updated_at=timezone.now()
+    )
+    if not claimed:
+        session.refresh_from_db()
+        if session.status == 'completed' and session.task_id:
+            serializer = ConversionTaskCreateSerializer(session.task, context={'request': request})
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response({'error': '上传会话正在完成或已结束'}, status=status.HTTP_409_CONFLICT)
+    
+    try:
+        preflight = inspect_presentation(chunk_path(session))
+    except (PreflightError, OSError) as e:
+        # 文件无效，丢弃临时数据；会话保留为失败状态，由保留策略清理
+        discard_upload(session)
+        _release_session(session, 'failed')
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        name, content_hash = finalize_upload(session, request.data.get('sha256'))
+    except UploadOffsetError as e:
+        _release_session(session, 'uploading')
+        return Response({'error': '文件尚未上传完整', 'offset': e.expected_offset}, status=status.HTTP_409_CONFLICT)
+    except UploadHashMismatch as e:
+        _release_session(session, 'uploading')
+        return Response({'error': str(e), 'offset': 0}, status=status.HTTP_400_BAD_REQUEST)
+    
+    task = ConversionTask.objects.create(
+        ppt_file=name,
+        priority=priority,
+        client_id=_client_id(request),
+        client_addr=_client_addr(request),
+        content_hash=content_hash,
+        slide_count=preflight['slide_count'],
+        media_bytes=preflight['media_bytes'],
+        estimated_cost=preflight['estimated_cost'],
+    )
+    session.task = task
+    session.status = 'completed'
+    session.save(update_fields=['task', 'status', 'updated_at'])
+    start_conversion(task)
+    
+    serializer = ConversionTaskCreateSerializer(task, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+def metrics_view(request):
+    """Prometheus 指标"""
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
 # 前端视图
 def index_view(request):
     """主页视图"""
     return render(request, 'converter/index.html')
 
 def task_list_view(request):
-    """任务列表页面"""
-    tasks = ConversionTask.objects.all()
-    return render(request, 'converter/task_list.html', {'tasks': tasks})
+    """任务列表页面 - 与 API 共用游标分页和过滤"""
+    try:
+        queryset = _filter_tasks(ConversionTask.objects.only(*TASK_LIST_FIELDS), request.GET)
+        paginator = ConversionTaskCursorPagination()
+        tasks = paginator.paginate_queryset(queryset, Request(request))
+    except ValidationError as e:
+        return HttpResponseBadRequest(str(e.detail))
+    except NotFound:
+        raise Http404('无效的分页游标')
+    
+    return render(request, 'converter/task_list.html', {
+        'tasks': tasks,
+        'status_filter': request.GET.get('status', ''),
+        'status_choices': ConversionTask.STATUS_CHOICES,
+        'next_url': paginator.get_next_link(),
+        'previous_url': paginator.get_previous_link(),
+    })
 
 def task_detail_view(request, task_id):
     """任务详情页面"""
     task = get_object_or_404(ConversionTask, id=task_id)
-    return render(request, 'converter/task_detail.html', {'task': task})
+    return render(request, 'converter/task_detail.html', {
+        'task': task,
+        # 只有 ASGI 下长轮询不占用工作进程
+        'long_poll': isinstance(request, ASGIRequest),
+    })
@@ -0,0 +1,282 @@
+"""
+预分叉转换进程池
+主进程预加载 python-pptx、lxml、Pillow、NumPy 与预设形状模板后冻结 GC 再 fork，
+子进程以写时复制方式共享这些页面，每个任务都没有导入开销。
+子进程各自从数据库队列领取任务（每个进程一个转换线程），完成 MAX_JOBS_PER_CHILD 个任务
+或 RSS 超过 MAX_RSS_MB 后退出，由主进程补充新的子进程，控制大图片缓冲区和 lxml 树造成的内存碎片。
+任务超过硬超时仍未停止时子进程直接退出，卡住的转换线程随进程一起结束。
+主进程汇总每个子进程的任务数、RSS 与运行时长，定期写入日志和 STATS_FILE
+"""
+
+import os
+import gc
+import json
+import time
+import queue
+import signal
+import logging
+import multiprocessing
+from django.conf import settings
+from django.db import connections
+from .roles import current_rss, process_rss, preload_conversion_stack
+from .scheduler import get_scheduler_settings
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL = {
+    'PROCESSES': 2,                 # 子进程数，0 表示在单个进程内用线程执行
+    'MAX_JOBS_PER_CHILD': 100,      # 子进程完成多少个任务后回收
+    'MAX_RSS_MB': 1024,             # 子进程 RSS 超过该值后回收，None 表示不限制
+    'STATS_INTERVAL_SECONDS': 60,   # 汇总统计的间隔
+    'STATS_FILE': None,             # 统计输出的 JSON 文件路径
+}
+
+# 子进程的退出原因
+RECYCLED_JOBS = 'jobs'
+RECYCLED_RSS = 'rss'
+RECYCLED_TIMEOUT = 'timeout'
+
+
+def get_pool_settings():
+    """合并默认配置与 settings.CONVERTER_WORKER_POOL"""
+    config = DEFAULT_POOL.copy()
+    config.update(getattr(settings, 'CONVERTER_WORKER_POOL', {}))
+    return config
+
+
+def _write_metrics():
+    try:
+        metrics.write_snapshot()
+    except Exception as e:
+        logger.error(f"写入指标快照失败: {e}", exc_info=True)
+
+
+def _child_main(index, small_only, max_jobs, max_rss_bytes, events):
+    """子进程入口：领取任务直到达到回收条件或收到 SIGTERM"""
+    from .task_queue import DatabaseQueueWorker, new_worker_id
+
+    # 不复用主进程的数据库连接
+    connections.close_all()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    pid = os.getpid()
+    jobs = 0
+    worker = None
+
+    def after_job(task_id):
+        nonlocal jobs
+        jobs += 1
+        rss = current_rss()
+        events.put(('job', index, pid, jobs, rss))
+        if max_jobs and jobs >= max_jobs:
+            events.put(('recycle', index, pid, RECYCLED_JOBS))
+            worker.stop()
+        elif max_rss_bytes and rss > max_rss_bytes:
+            events.put(('recycle', index, pid, RECYCLED_RSS))
+            worker.stop()
+
+    def on_abandon(task_id, reason):
+        # 线程无法强制结束：任务已标记失败，直接退出子进程，由主进程补位
+        events.put(('recycle', index, pid, RECYCLED_TIMEOUT))
+        _write_metrics()
+        events.close()
+        events.join_thread()
+        os._exit(1)
+
+    worker = DatabaseQueueWorker(
+        worker_id=f"{new_worker_id()}/{index}", workers=1, small_only=small_only,
+        after_job=after_job, on_abandon=on_abandon,
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    worker.run()
+    connections.close_all()
+    # 子进程退出时不执行 atexit，最后一次快照在这里写入
+    _write_metrics()
+
+
+class PreforkWorkerPool:
+    """
+    预分叉进程池
+
+    前 RESERVED_SMALL_WORKERS 个子进程只领取小任务，与线程调度器的预留线程一致
+    """
+
+    def __init__(self, processes=None, max_jobs_per_child=None, max_rss_mb=None, write=None):
+        config = get_pool_settings()
+        self.processes = max(1, processes or config['PROCESSES'] or 1)
+        self.max_jobs_per_child = max_jobs_per_child if max_jobs_per_child is not None else config['MAX_JOBS_PER_CHILD']
+        max_rss_mb = max_rss_mb if max_rss_mb is not None else config['MAX_RSS_MB']
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024 if max_rss_mb else None
+        self.stats_interval = config['STATS_INTERVAL_SECONDS']
+        self.stats_file = config['STATS_FILE']
+        self.reserved_small = min(get_scheduler_settings()['RESERVED_SMALL_WORKERS'], self.processes - 1)
+        self.write = write or logger.info
+        self._context = multiprocessing.get_context('fork')
+        self._events = self._context.Queue()
+        self._children = {}
+        self._stopping = False
+        self.started_at = None
+        self.recycled = {RECYCLED_JOBS: 0, RECYCLED_RSS: 0, RECYCLED_TIMEOUT: 0, 'exited': 0}
+
+    def preload(self):
+        """fork 前预加载转换依赖，并把已有对象移出 GC 跟踪，避免子进程中的回收触发写时复制"""
+        seconds = preload_conversion_stack()
+        gc.collect()
+        gc.freeze()
+        self.write(f"转换依赖预加载完成: {seconds * 1000:.0f}ms, 主进程 RSS {current_rss() / 1024 / 1024:.1f}MB")
+
+    def _spawn(self, index):
+        # 数据库连接不能跨进程共享
+        connections.close_all()
+        small_only = index < self.reserved_small
+        process = self._context.Process(
+            target=_child_main,
+            args=(index, small_only, self.max_jobs_per_child, self.max_rss_bytes, self._events),
+            name=f"conversion-worker-{index}{'-small' if small_only else ''}",
+            daemon=False,
+        )
+        process.start()
+        previous = self._children.get(index)
+        self._children[index] = {
+            'process': process,
+            'pid': process.pid,
+            'small_only': small_only,
+            'started_at': time.monotonic(),
+            'jobs': 0,
+            'rss_bytes': None,
+            'generation': previous['generation'] + 1 if previous else 1,
+            'total_jobs': previous['total_jobs'] if previous else 0,
+            'recycle_reason': None,
+        }
+
+    def _handle_event(self, event):
+        kind, index, pid = event[:3]
+        child = self._children.get(index)
+        if child is None or child['pid'] != pid:
+            return
+        if kind == 'job':
+            child['jobs'], child['rss_bytes'] = event[3], event[4]
+            child['total_jobs'] += 1
+        elif kind == 'recycle':
+            child['recycle_reason'] = event[3]
+
+    def _drain_events(self, timeout=0):
+        """处理子进程上报的事件；回收前先读完，退出原因不会被误判为异常退出"""
+        try:
+            event = self._events.get(timeout=timeout) if timeout else self._events.get_nowait()
+            while True:
+                self._handle_event(event)
+                event = self._events.get_nowait()
+        except (queue.Empty, InterruptedError):
+            pass
+
+    def _reap(self):
+        """回收已退出的子进程并补位"""
+        for index, child in list(self._children.items()):
+            process = child['process']
+            if process.is_alive():
+                continue
+            process.join()
+            self._drain_events()
+            reason = child['recycle_reason'] or 'exited'
+            self.recycled[reason] += 1
+            if reason == 'exited':
+                logger.warning(f"转换子进程 {child['pid']} 异常退出 (exitcode {process.exitcode})")
+            else:
+                self.write(
+                    f"回收转换子进程 {child['pid']}: 已完成 {child['jobs']} 个任务, "
+                    f"RSS {(child['rss_bytes'] or 0) / 1024 / 1024:.1f}MB ({reason})"
+                )
+            if not self._stopping:
+                self._spawn(index)
+
+    def stats(self):
+        """每个子进程的任务数、RSS 与运行时长"""
+        now = time.monotonic()
+        workers = []
+        for index, child in sorted(self._children.items()):
+            rss = process_rss(child['pid']) if child['process'].is_alive() else None
+            workers.append({
+                'index': index,
+                'pid': child['pid'],
+                'small_only': child['small_only'],
+                'generation': child['generation'],
+                'jobs': child['jobs'],
+                'total_jobs': child['total_jobs'],
+                'rss_bytes': rss if rss is not None else child['rss_bytes'],
+                'uptime_seconds': round(now - child['started_at'], 1),
+            })
+        return {
+            'master_pid': os.getpid(),
+            'uptime_seconds': round(now - self.started_at, 1) if self.started_at else 0,
+            'recycled': dict(self.recycled),
+            'workers': workers,
+        }
+
+    def report_stats(self):
+        stats = self.stats()
+        recycled = stats['recycled']
+        self.write(
+            f"进程池运行 {stats['uptime_seconds']:.0f}s, 回收子进程: 按任务数 {recycled[RECYCLED_JOBS]} 个, "
+            f"按 RSS {recycled[RECYCLED_RSS]} 个, 超时 {recycled[RECYCLED_TIMEOUT]} 个, 异常退出 {recycled['exited']} 个"
+        )
+        for worker in stats['workers']:
+            self.write(
+                f"  子进程 {worker['index']} (pid {worker['pid']}, 第 {worker['generation']} 代"
+                f"{', 小任务' if worker['small_only'] else ''}): {worker['jobs']} 个任务 (累计 {worker['total_jobs']}), "
+                f"RSS {(worker['rss_bytes'] or 0) / 1024 / 1024:.1f}MB, 运行 {worker['uptime_seconds']:.0f}s"
+            )
+        if self.stats_file:
+            temp_path = f"{self.stats_file}.tmp"
+            with open(temp_path, 'w') as f:
+                json.dump(stats, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, self.stats_file)
+        return stats
+
+    def run(self):
+        """启动子进程并持续补位，直到收到 SIGTERM / SIGINT"""
+        def stop(signum, frame):
+            self.write(f"收到信号 {signum}，停止转换子进程")
+            self._stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.report_stats())
+
+        self.preload()
+        # 子进程 fork 后清空继承的指标并各自写入快照（见 metrics.start_flusher）
+        metrics.start_flusher()
+        self.started_at = time.monotonic()
+        for index in range(self.processes):
+            self._spawn(index)
+        self.write(f"预分叉进程池已启动: {self.processes} 个子进程 (其中 {self.reserved_small} 个只处理小任务)")
+
+        next_report_at = time.monotonic() + self.stats_interval
+        while not self._stopping:
+            self._drain_events(timeout=1)
+            self._reap()
+            if self.stats_interval and time.monotonic() >= next_report_at:
+                next_report_at = time.monotonic() + self.stats_interval
+                self.report_stats()
+        self._shutdown()
+
+    def _shutdown(self):
+        """通知子进程排空，超时后强制结束"""
+        from .task_queue import get_queue_settings
+
+        for child in self._children.values():
+            if child['process'].is_alive():
+                child['process'].terminate()
+        deadline = time.monotonic() + get_queue_settings()['DRAIN_SECONDS'] + 5
+        for child in self._children.values():
+            child['process'].join(max(0.0, deadline - time.monotonic()))
+            if child['process'].is_alive():
+                logger.warning(f"转换子进程 {child['pid']} 未按时退出，强制结束")
+                child['process'].kill()
+                child['process'].join()
+        self._drain_events()
+        self.report_stats()
+        self.write("预分叉进程池已退出")
@@ -52,6 +52,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'converter.middleware.RequestMetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'ppt_to_sketch_service.urls'
@@ -137,9 +138,98 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB，超过后写入临时文件而不是驻留内存
 DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50MB
 
+# Chunked upload settings (/api/uploads/)
+CONVERTER_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024   # 单个分块上限
+CONVERTER_UPLOAD_MAX_BYTES = 500 * 1024 * 1024  # 单个文件上限
+
+# Conversion scheduler settings
+CONVERTER_SCHEDULER = {
+    'WORKERS': 2,                 # 转换工作线程总数
+    'RESERVED_SMALL_WORKERS': 1,  # 只处理小任务的线程数
+    'SMALL_JOB_COST': 1.0,        # 小任务的预估成本上限
+    'DEFAULT_COST': 1.0,
+}
+
+# Conversion queue settings
+# BACKEND = 'database' 时上传进程只写入任务，由各节点的 python manage.py run_conversion_worker 领取执行
+CONVERTER_QUEUE = {
+    'BACKEND': os.environ.get('CONVERTER_QUEUE_BACKEND', 'thread'),
+    'LEASE_SECONDS': 60,          # 租约时长
+    'HEARTBEAT_SECONDS': 15,      # 续租间隔
+    'POLL_SECONDS': 1.0,          # 队列为空时的轮询间隔
+    'MAX_ATTEMPTS': 3,            # 同一任务最多被领取的次数
+    'DRAIN_SECONDS': 30,          # 停止时等待执行中任务的时间
+}
+
+# Conversion worker pool settings (python manage.py run_conversion_worker)
+CONVERTER_WORKER_POOL = {
+    'PROCESSES': 2,                 # 预分叉子进程数，0 表示在单个进程内用线程执行
+    'MAX_JOBS_PER_CHILD': 100,      # 子进程完成多少个任务后回收
+    'MAX_RSS_MB': 1024,             # 子进程 RSS 超过该值后回收
+    'STATS_INTERVAL_SECONDS': 60,   # 每个子进程统计的输出间隔
+    'STATS_FILE': None,             # 统计同时写入该 JSON 文件
+}
+
+# 按源文件哈希生成确定性对象 ID，相同输入得到逐字节相同的 .sketch 输出
+CONVERTER_DETERMINISTIC_IDS = True
+
+# 直接流式解析 OOXML，不构建 python-pptx 对象模型；解析失败时自动回退。设为 False 始终使用 python-pptx
+CONVERTER_FAST_PATH = True
+
+# 序列化前优化图层树：删除不可见、画板外和被完全遮挡的图层，展平平凡组，满屏底色并入画板背景
+CONVERTER_OPTIMIZE_LAYERS = True
+
+# 内容哈希与正在转换的任务相同的上传合并到该任务，共享同一次转换的结果
+CONVERTER_COALESCE_UPLOADS = True
+
+# Output size budget: 超出 MAX_BYTES 的输出逐级缩小图片后重写，清单保存在任务上（/api/tasks/<id>/manifest/）
+CONVERTER_OUTPUT = {
+    'MAX_BYTES': None,
+    'DOWNSAMPLE_SIZES': (2048, 1024, 512),
+    'JPEG_QUALITY': 75,
+    'TOP_N': 10,
+}
+
+# Upload admission control: 超过上限时返回 503 / 429 并附带 Retry-After，值为 None 的检查被关闭
+CONVERTER_ADMISSION = {
+    'MAX_QUEUED_TASKS': 500,          # 等待中的任务数上限
+    'MAX_QUEUED_COST': 600.0,         # 等待中任务的预估成本之和上限（约等于单核秒数）
+    'MIN_FREE_DISK_MB': 1024,         # 接收上传后媒体目录所在磁盘至少保留的空间
+    'MAX_ACTIVE_PER_CLIENT': 10,      # 单个客户端等待中和处理中的任务数上限
+    'MIN_RETRY_AFTER_SECONDS': 5,
+    'MAX_RETRY_AFTER_SECONDS': 300,
+    'SNAPSHOT_SECONDS': 1.0,
+}
+
+# Prometheus metrics: 多进程部署（多个 Web 进程、工作进程、预分叉子进程）时设置同一主机上的共享目录，
+# 各进程每 FLUSH_SECONDS 写入一次快照，任一 Web 进程的 /metrics 汇总全部进程
+CONVERTER_METRICS = {
+    'MULTIPROCESS_DIR': os.environ.get('CONVERTER_METRICS_DIR') or None,
+    'FLUSH_SECONDS': 5,
+}
+
+# Conversion job limits (enforced by the scheduler watchdog)
+CONVERTER_JOB_LIMITS = {
+    'WALL_TIMEOUT_SECONDS': 600,     # 单个任务最长运行时间
+    'CPU_TIMEOUT_SECONDS': 300,      # 单个任务最多占用的 CPU 时间
+    'HARD_KILL_GRACE_SECONDS': 30,   # 超时后未响应取消时强制回收的等待时间
+    'CANCEL_POLL_SECONDS': 0.5,
+}
+
+# Storage retention settings (python manage.py run_retention --loop)
+CONVERTER_RETENTION = {
+    'TTL_DAYS': 30,                  # 已结束任务保留天数，None 表示不过期
+    'MAX_TOTAL_BYTES': None,         # 上传与输出目录总容量上限（字节）
+    'ORPHAN_GRACE_SECONDS': 3600,    # 孤儿文件最短存活时间
+    'UPLOAD_SESSION_TTL_HOURS': 24,  # 未完成的分块上传保留时间
+    'BATCH_SIZE': 100,
+    'DELETES_PER_SECOND': 50,
+    'INTERVAL_SECONDS': 3600,
+}
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -0,0 +1,55 @@
+"""
+转换工作进程入口
+
+    python -m ppt_to_sketch_service.worker --workers 4
+
+初始化 Django 后预加载 python-pptx、lxml、Pillow、NumPy 与转换器模块，再从数据库队列领取任务；
+默认以预分叉进程池运行（CONVERTER_WORKER_POOL），--processes 0 时在本进程内用线程执行。
+不加载 URL 配置和视图；Web 进程使用 wsgi.py / asgi.py，不加载转换依赖
+"""
+
+import os
+import sys
+import time
+import argparse
+
+_started_at = time.perf_counter()
+
+
+def setup():
+    """初始化 Django 并预加载转换依赖，返回启动报告"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ppt_to_sketch_service.settings')
+    import django
+    django.setup()
+    from converter.roles import WORKER, preload_conversion_stack, startup_report
+    preload_conversion_stack()
+    return startup_report(WORKER, _started_at)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='从数据库队列领取并执行转换任务')
+    parser.add_argument('--workers', type=int, default=None, help='工作线程数，缺省使用 CONVERTER_SCHEDULER["WORKERS"]')
+    parser.add_argument('--worker-id', default=None, help='租约持有者标识')
+    parser.add_argument('--processes', type=int, default=None, help='预分叉子进程数，0 表示在本进程内用线程执行')
+    parser.add_argument('--max-jobs-per-child', type=int, default=None, help='子进程完成多少个任务后回收')
+    parser.add_argument('--max-rss-mb', type=int, default=None, help='子进程 RSS 超过多少 MB 后回收')
+    args = parser.parse_args(argv)
+
+    report = setup()
+    print(f"worker 进程启动: {report['seconds'] * 1000:.0f}ms, RSS {report['rss_bytes'] / 1024 / 1024:.1f}MB")
+    from converter.worker_pool import PreforkWorkerPool, get_pool_settings
+    processes = args.processes if args.processes is not None else get_pool_settings()['PROCESSES']
+    if processes:
+        PreforkWorkerPool(
+            processes=processes, max_jobs_per_child=args.max_jobs_per_child,
+            max_rss_mb=args.max_rss_mb, write=print,
+        ).run()
+        return 0
+
+    from converter.task_queue import run_worker
+    run_worker(workers=args.workers, worker_id=args.worker_id)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
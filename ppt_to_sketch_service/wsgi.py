@@ -8,9 +8,21 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/wsgi/
 """
 
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
 
+_started_at = time.perf_counter()
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ppt_to_sketch_service.settings')
 
 application = get_wsgi_application()
+
+# Web 角色只加载模型、序列化器和视图；提前导入 URL 配置，首个请求不承担导入开销
+from converter.roles import WEB, load_url_conf, startup_report  # noqa: E402
+from converter import metrics  # noqa: E402
+
+load_url_conf()
+startup_report(WEB, _started_at)
+# 多个 Web 进程与工作进程通过 CONVERTER_METRICS['MULTIPROCESS_DIR'] 汇总指标
+metrics.start_flusher()
@@ -32,11 +32,9 @@ function formatFileSize(bytes) {
 // 验证文件类型
 function validateFileType(file) {
     const allowedTypes = [
-        'application/vnd.ms-powerpoint',
         'application/vnd.openxmlformats-officedocument.presentationml.presentation'
     ];
     return allowedTypes.includes(file.type) || 
-           file.name.toLowerCase().endsWith('.ppt') || 
            file.name.toLowerCase().endsWith('.pptx');
 }
 
@@ -49,7 +47,7 @@ function validateFileSize(file) {
 // 文件上传验证
 function validateFile(file) {
     if (!validateFileType(file)) {
-        showNotification('请选择有效的 PPT 文件（.ppt 或 .pptx）', 'danger');
+        showNotification('请选择有效的 PPT 文件（.pptx）', 'danger');
         return false;
     }
     